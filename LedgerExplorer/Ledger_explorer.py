@@ -3,6 +3,7 @@ import numpy as np
 import csv
 import json
 import re
+import argparse
 from collections import OrderedDict
 from datetime import datetime
 import sys
@@ -10,8 +11,14 @@ import os
 import webbrowser
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, font
-from threading import Thread
+from threading import Thread, Event
+import queue
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import time
+import tracemalloc
+import cProfile
+import functools
+from contextlib import contextmanager
 
 
 DEBUG = True
@@ -108,9 +115,169 @@ class LogTracker:
             gui.scroll_to_end()
 
 
+class StageProfiler:
+    """ 処理段階ごとの経過時間・CPU時間・ピークメモリ・行数を記録するクラス """
+    def __init__(self):
+        self.records = []
+        self._stack = []
+        self.enabled = False
+        self.cprofile_stage = None
+        self.output_dir = "debug_output/profile"
+        if "param_file_path" in globals():
+            with open(param_file_path, "r", encoding="utf-8-sig") as param_file:
+                params = json.load(param_file)
+            self.enabled = 1 == params.get("PROFILE", 0)
+            self.output_dir = params.get("profile_dir", self.output_dir)
+            self.cprofile_stage = params.get("cprofile_stage") or None
+
+    def clear(self):
+        self.records = []
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """
+        with stage_profiler.stage("General Ledger") as record:
+            ...
+            record["rows"] = len(df)
+        """
+        record = {"stage": name, "start": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "rows": rows}
+        if not self.enabled:
+            yield record
+            return
+        # 他の段階の内側で呼ばれた場合は tracemalloc を入れ子で開始せず、外側のピークを退避してからリセットする
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        else:
+            if self._stack:
+                _, peak = tracemalloc.get_traced_memory()
+                self._stack[-1]["_peak"] = max(self._stack[-1]["_peak"], peak)
+            tracemalloc.reset_peak()
+        record["_peak"] = 0
+        self._stack.append(record)
+        profiler = None
+        if self.cprofile_stage == name:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_time"] = round(time.perf_counter() - wall_start, 4)
+            record["cpu_time"] = round(time.process_time() - cpu_start, 4)
+            _, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, record.pop("_peak"))
+            self._stack.pop()
+            record["peak_memory_mb"] = round(peak / (1024 * 1024), 3)
+            if started_tracing:
+                tracemalloc.stop()
+            if profiler:
+                profiler.disable()
+                record["cprofile"] = self.dump_cprofile(profiler, name)
+            self.records.append(record)
+
+    def dump_cprofile(self, profiler, name):
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+        stage_name = re.sub(r"[^0-9A-Za-z_\-]+", "_", name)
+        file_path = os.path.join(self.output_dir, f'{datetime.now().strftime("%m-%d_%H%M%S")}_{stage_name}.prof')
+        profiler.dump_stats(file_path)  # 保存先は段階の記録の cprofile 列に残る（処理時間ウィンドウから書き出す）
+        return file_path
+
+    def export_json(self, file_path):
+        with open(file_path, "w", encoding="utf-8") as json_file:
+            json.dump(self.records, json_file, ensure_ascii=False, indent=2)
+        return file_path
+
+    def export_csv(self, file_path):
+        header = ["stage", "start", "wall_time", "cpu_time", "peak_memory_mb", "rows", "cprofile"]
+        with open(file_path, "w", encoding="utf-8-sig", newline="") as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=header, extrasaction="ignore")
+            writer.writeheader()
+            for record in self.records:
+                writer.writerow(record)
+        return file_path
+
+
+def profile_stage(name, rows=None):
+    """
+    メソッドを StageProfiler の段階として計測するデコレータ
+    rows: 行数を返す関数 rows(self, *args, **kwargs)（実行後に評価される）
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            profiler = globals().get("stage_profiler")
+            if profiler is None:
+                return func(self, *args, **kwargs)
+            with profiler.stage(name) as record:
+                result = func(self, *args, **kwargs)
+                if rows:
+                    try:
+                        record["rows"] = rows(self, *args, **kwargs)
+                    except (TypeError, AttributeError):
+                        record["rows"] = None
+            return result
+        return wrapper
+    return decorator
+
+
+def write_log_text(message):
+    """ GUI 実行時は log_tracker（ログ欄）に、ヘッドレス実行（一括処理）では標準出力に書く """
+    tracker = globals().get("log_tracker")
+    if tracker is None:
+        trace_print(message)
+    else:
+        tracker.write_log_text(message)
+
+
+# 全事業者で共通のテンプレート（HOT010 BS/PL、LHM）のキャッシュ
+# 一括処理ではワーカープロセスごとに 1 回だけ読み込む（init_batch_worker）
+_template_cache = {}  # (path, loader) -> (mtime, data) (per process)
+
+
+def load_template_df(path):
+    return pd.read_csv(path, header=0)
+
+
+def load_lhm_dict(path):
+    LHM_dict = {}
+    with open(path, mode='r', encoding='utf-8-sig') as csv_file:
+        reader = csv.DictReader(csv_file)  # ヘッダー行をキーとして利用
+        for row in reader:
+            LHM_dict[row['id']] = row
+    return LHM_dict
+
+
+def shared_template(path, loader):
+    """
+    loader(path) の結果をプロセス内でキャッシュして返す。ファイルが更新されていれば読み直す。
+    呼び出し側で変更する場合は複製して使うこと。
+    """
+    key = (os.path.abspath(path), loader.__name__)
+    mtime = os.path.getmtime(path)
+    cached = _template_cache.get(key)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, loader(path))
+        _template_cache[key] = cached
+    return cached[1]
+
+
+class LoadCancelled(Exception):
+    """ 処理中ウィンドウの「中止」で処理を打ち切ったときの例外 """
+
+
 class ExecutionMessage:
     """ 処理中メッセージウィンドウを管理するクラス """
     custom_window = None
+    # run() 用: ワーカースレッドとメインスレッドの間のキュー、中止フラグ、進捗表示
+    thread = None
+    result_queue = None
+    cancel_event = None
+    status_label = None
+    progress_bar = None
+    cancel_button = None
     @staticmethod
     def start(root, callback, *args):
         """ メッセージウィンドウを表示し、指定された処理を非同期に実行 """
@@ -128,16 +295,127 @@ class ExecutionMessage:
         # 非同期処理の開始
         root.after(100, lambda: callback(*args))
 
+    @staticmethod
+    def run(root, work, on_done, steps=0, lang="ja", on_abort=None, poll_ms=100):
+        """
+        work(progress, cancel_event) をワーカースレッドで実行し、処理中ウィンドウに進捗と「中止」ボタンを表示する。
+        ワーカースレッドからは Tk を呼ばず、進捗・結果・例外はキューでメインスレッドに渡す。
+          progress(message): 段階ごとの進捗（ログ欄にも書く）。steps > 0 なら進捗バーを 1 段階進める
+          cancel_event: 「中止」で set される。work は段階の区切りで確認して LoadCancelled を投げる
+        完了すると on_done(結果) を、中止・エラーのときはメッセージ表示の後で on_abort() をメインスレッドで呼ぶ。
+        """
+        if ExecutionMessage.thread is not None and ExecutionMessage.thread.is_alive():
+            return False  # 実行中の処理がある間は受け付けない
+        ExecutionMessage.end()
+        en = "en" == lang
+        window = ExecutionMessage.custom_window = tk.Toplevel(root)
+        window.title("Processing" if en else "処理中")
+        root.update_idletasks()
+        x = root.winfo_x() + (root.winfo_width() // 2) - (360 // 2)
+        y = root.winfo_y() + (root.winfo_height() // 2) - (140 // 2)
+        window.geometry(f"360x140+{x}+{y}")
+        ExecutionMessage.status_label = tk.Label(window, text="Processing... please wait." if en else "処理中...しばらくお待ちください。", padx=20, pady=10)
+        ExecutionMessage.status_label.pack()
+        if steps:
+            ExecutionMessage.progress_bar = ttk.Progressbar(window, mode="determinate", maximum=steps, length=300)
+        else:
+            ExecutionMessage.progress_bar = ttk.Progressbar(window, mode="indeterminate", length=300)
+            ExecutionMessage.progress_bar.start(50)
+        ExecutionMessage.progress_bar.pack(padx=20)
+        ExecutionMessage.cancel_button = tk.Button(window, text="Cancel" if en else "中止", command=lambda: ExecutionMessage.cancel(lang))
+        ExecutionMessage.cancel_button.pack(pady=10)
+        window.protocol("WM_DELETE_WINDOW", lambda: ExecutionMessage.cancel(lang))  # 閉じる操作は中止と同じ
+        window.transient(root)
+        # 処理中は他の操作を受け付けない（描画・移動はメインループで続く）
+        try:
+            window.grab_set()
+        except tk.TclError:
+            pass
+
+        result_queue = ExecutionMessage.result_queue = queue.Queue()
+        cancel_event = ExecutionMessage.cancel_event = Event()
+
+        def progress(message):
+            if cancel_event.is_set():
+                raise LoadCancelled(message)
+            result_queue.put(("progress", message))
+
+        def target():
+            try:
+                result_queue.put(("done", work(progress, cancel_event)))
+            except LoadCancelled:
+                result_queue.put(("cancelled", None))
+            except Exception as e:
+                result_queue.put(("error", e))
+
+        ExecutionMessage.thread = Thread(target=target, daemon=True)
+        ExecutionMessage.thread.start()
+        root.after(poll_ms, lambda: ExecutionMessage.poll(root, result_queue, on_done, on_abort, lang, poll_ms))
+        return True
+
+    @staticmethod
+    def poll(root, result_queue, on_done, on_abort, lang, poll_ms):
+        """ メインスレッドでキューを読み、進捗を表示し、結果を on_done に渡す """
+        en = "en" == lang
+        while True:
+            try:
+                kind, payload = result_queue.get_nowait()
+            except queue.Empty:
+                break
+            if "progress" == kind:
+                if ExecutionMessage.status_label:
+                    ExecutionMessage.status_label.config(text=payload)
+                if ExecutionMessage.progress_bar and "determinate" == str(ExecutionMessage.progress_bar.cget("mode")):
+                    ExecutionMessage.progress_bar.step(1)
+                log_tracker.write_log_text(payload)
+                continue
+            ExecutionMessage.end()
+            if "done" == kind:
+                on_done(payload)
+            else:
+                if "cancelled" == kind:
+                    log_tracker.write_log_text("Cancelled" if en else "中止しました")
+                else:
+                    log_tracker.write_log_text(f"ERROR {payload}")
+                    messagebox.showerror("Error" if en else "エラー", str(payload))
+                if on_abort:
+                    on_abort()
+            return
+        root.after(poll_ms, lambda: ExecutionMessage.poll(root, result_queue, on_done, on_abort, lang, poll_ms))
+
+    @staticmethod
+    def cancel(lang="ja"):
+        """ 「中止」: ワーカースレッドが次の区切りで LoadCancelled を投げるまで待つ """
+        if ExecutionMessage.cancel_event is None or ExecutionMessage.cancel_event.is_set():
+            return
+        ExecutionMessage.cancel_event.set()
+        if ExecutionMessage.status_label:
+            ExecutionMessage.status_label.config(text="Cancelling..." if "en" == lang else "中止しています...")
+        if ExecutionMessage.cancel_button:
+            ExecutionMessage.cancel_button.config(state="disabled")
+
     @staticmethod
     def end():
         """ メッセージウィンドウを閉じる """
         if ExecutionMessage.custom_window:
             ExecutionMessage.custom_window.destroy()
             ExecutionMessage.custom_window = None
+            ExecutionMessage.status_label = None
+            ExecutionMessage.progress_bar = None
+            ExecutionMessage.cancel_button = None
+
+
+# TidyData.load の段階（処理中ウィンドウの進捗バーの目盛り）
+LOAD_STAGES = ["CSV to DataFrame", "e-Tax Template", "General Ledger", "Account Dict", "Trial Balance", "BS/PL", "Ledger Views", "END CSV to DataFrame"]
 
 
 class TidyData:
-    def __init__(self):
+    def __init__(self, param_file_path=None):
+        if param_file_path is None:
+            param_file_path = globals()["param_file_path"]
+        self.param_file_path = param_file_path
+        self.progress = None
+        self.cancel_event = None
         self.DEBUG = False
         self.TRACE = False
         self.params = None
@@ -156,10 +434,21 @@ class TidyData:
         self.summary_df = None
         self.bs_data_df = None
         self.pl_data_df = None
+        self.bs_hierarchy_df = None
+        self.pl_hierarchy_df = None
         self.account_dict = None
         # self.account_dict2 = None
         self.bs_dict = None
         self.pl_dict = None
+        # 月・科目別のビュー（build_ledger_views で作成）
+        self.views_lang = None
+        self.journal_view = None
+        self.journal_month_index = None
+        self.ledger_view = None
+        self.ledger_account_index = None
+        self.ledger_account_month_index = None
+        self.summary_view = None
+        self.summary_month_index = None
         # 勘定科目ごとの貸借の増減方向を持つ辞書を定義
         self.account_direction_dict = {
             "資産": "借方増",
@@ -202,83 +491,121 @@ class TidyData:
     def get_amount_rows(self):
         return self.amount_rows
 
-    def replace_name(self, row):
+    def account_name_map(self):
+        """
+        勘定科目番号から e-Tax テンプレートの科目名を引く辞書（bs_template_df を優先し、なければ pl_template_df）
+        """
+        name_map = {}
+        for template_df in [self.pl_template_df, self.bs_template_df]:
+            template_df = template_df.drop_duplicates(subset="Ledger_Account_Number", keep="first")
+            name_map.update(zip(template_df["Ledger_Account_Number"], template_df["Account_Name"]))
+        return name_map
+
+    def replace_names(self, df, name_column, number_column, name_map):
+        """
+        英語表示の場合、英語でない科目名をテンプレートの科目名に列単位で置き換える
+        """
+        if name_column not in df.columns or number_column not in df.columns:
+            return
+        not_english = ~df[name_column].fillna("").astype(str).str.match(self.english_pattern.pattern)
+        replacement = df[number_column].map(name_map)
+        mask = not_english & replacement.notna()
+        if mask.any():
+            df.loc[mask, name_column] = replacement[mask]
+
+    def replace_name(self, df):
         if "en"== self.lang:
-            if not re.search(self.english_pattern, row['Ledger_Account_Name']):
-                # `bs_template_df` から置き換え値を取得
-                # Get replacement values from 'bs_template_df'
-                replacement = self.bs_template_df.loc[
-                        self.bs_template_df['Ledger_Account_Number'] == row['Ledger_Account_Number'], 'Account_Name'
-                    ]
-                if replacement.empty:
-                    # `pl_template_df` から置き換え値を取得
-                    # Get replacement values from 'pl_template_df'
-                    replacement = self.pl_template_df.loc[
-                            self.pl_template_df['Ledger_Account_Number'] == row['Ledger_Account_Number'], 'Account_Name'
-                        ]
-                if not replacement.empty:
-                    row['Ledger_Account_Name'] = replacement.values[0]
-            if 'Counterpart_Account_Name' in row and not re.search(self.english_pattern, row['Counterpart_Account_Name']):
-                # `bs_template_df` から置き換え値を取得
-                # Get replacement values from 'bs_template_df'
-                replacement = self.bs_template_df.loc[
-                    self.bs_template_df['Ledger_Account_Number'] == row['Counterpart_Account_Number'], 'Account_Name'
-                ]
-                if replacement.empty:
-                    # `pl_template_df` から置き換え値を取得
-                    # Get replacement values from 'pl_template_df'
-                    replacement = self.pl_template_df.loc[
-                        self.pl_template_df['Ledger_Account_Number'] == row['Counterpart_Account_Number'], 'Account_Name'
-                    ]
-                if not replacement.empty:
-                    row['Counterpart_Account_Name'] = replacement.values[0]
-        return row
+            name_map = self.account_name_map()
+            self.replace_names(df, "Ledger_Account_Name", "Ledger_Account_Number", name_map)
+            self.replace_names(df, "Counterpart_Account_Name", "Counterpart_Account_Number", name_map)
+        return df
 
     def get_general_ledger_df(self):
-        self.general_ledger_df = self.general_ledger_df.apply(self.replace_name, axis=1)
+        self.ensure_ledger_views()
         return self.general_ledger_df
 
-    def replace_category(self, row):
+    def replace_category(self, df):
         if "en"== self.lang:
-            if 'eTax_Category' in row and not re.search(self.english_pattern, row['eTax_Category']):
-                category = row['eTax_Category']
-                if not re.search(self.english_pattern, category):
-                    if category and category in self.account_category:
-                        row['eTax_Category'] = self.account_category[category]
-            if 'eTax_Account_Name' in row and not re.search(self.english_pattern, row['eTax_Account_Name']):
-                # `bs_template_df` から置き換え値を取得
-                # Get replacement values from 'bs_template_df'
-                replacement = self.bs_template_df.loc[
-                    self.bs_template_df['Ledger_Account_Number'] == row['Ledger_Account_Number'], 'Account_Name'
-                ]
-                if replacement.empty:
-                    # `pl_template_df` から置き換え値を取得
-                    # Get replacement values from 'pl_template_df'
-                    replacement = self.pl_template_df.loc[
-                        self.pl_template_df['Ledger_Account_Number'] == row['Ledger_Account_Number'], 'Account_Name'
-                    ]
-                if not replacement.empty:
-                    row['eTax_Account_Name'] = replacement.values[0]
-            if 'Ledger_Account_Name' in row and not re.search(self.english_pattern, row['Ledger_Account_Name']):
-                # `bs_template_df` から置き換え値を取得
-                # Get replacement values from 'bs_template_df'
-                replacement = self.bs_template_df.loc[
-                    self.bs_template_df['Ledger_Account_Number'] == row['Ledger_Account_Number'], 'Account_Name'
-                ]
-                if replacement.empty:
-                    # `pl_template_df` から置き換え値を取得
-                    # Get replacement values from 'pl_template_df'
-                    replacement = self.pl_template_df.loc[
-                        self.pl_template_df['Ledger_Account_Number'] == row['Ledger_Account_Number'], 'Account_Name'
-                    ]
-                if not replacement.empty:
-                    row['Ledger_Account_Name'] = replacement.values[0]
-        return row
+            if 'eTax_Category' in df.columns:
+                category = df['eTax_Category'].fillna("").astype(str)
+                not_english = ~category.str.match(self.english_pattern.pattern)
+                replacement = category.map(self.account_category)
+                mask = not_english & replacement.notna()
+                if mask.any():
+                    df.loc[mask, 'eTax_Category'] = replacement[mask]
+            name_map = self.account_name_map()
+            self.replace_names(df, "eTax_Account_Name", "Ledger_Account_Number", name_map)
+            self.replace_names(df, "Ledger_Account_Name", "Ledger_Account_Number", name_map)
+        return df
 
     def get_summary_df(self):
-        self.summary_df = self.summary_df.apply(self.replace_category, axis=1)
+        self.ensure_ledger_views()
         return self.summary_df
 
+    @staticmethod
+    def partition_index(df, keys):
+        """
+        keys で並べ替え済みの DataFrame から {キー: (開始行, 終了行)} を作成する
+        """
+        return {key: (positions[0], positions[-1] + 1) for key, positions in df.groupby(keys, sort=False).indices.items()}
+
+    @profile_stage("build_ledger_views", rows=lambda self: len(self.ledger_view))
+    def build_ledger_views(self):
+        """
+        読み込み時（および表示言語の切替時）に一度だけ、科目名の置換・日付の型変換を済ませ、
+        月別・科目別に並べ替えたビューと行範囲の索引を作成する。
+        表示時は iloc による連続範囲のスライスを返すだけで、全件の走査や複製を行わない。
+        """
+        # 仕訳帳: 月ごとの連続範囲
+        self.journal_view = self.amount_rows.sort_values("Month", kind="stable").reset_index(drop=True)
+        self.journal_month_index = self.partition_index(self.journal_view, "Month")
+        # 総勘定元帳: 科目、月ごとの連続範囲（同じ科目・月の中では日付順を保持）
+        self.replace_name(self.general_ledger_df)
+        transaction_date = pd.to_datetime(self.general_ledger_df["Transaction_Date"], errors="coerce")
+        self.ledger_view = self.general_ledger_df.assign(
+            Transaction_Date_dt=transaction_date,
+            Transaction_Month=transaction_date.dt.to_period("M").astype(str)
+        ).sort_values(["Ledger_Account_Number", "Transaction_Month"], kind="stable").reset_index(drop=True)
+        self.ledger_account_index = self.partition_index(self.ledger_view, "Ledger_Account_Number")
+        self.ledger_account_month_index = self.partition_index(self.ledger_view, ["Ledger_Account_Number", "Transaction_Month"])
+        # 試算表: 月ごとの連続範囲
+        self.replace_category(self.summary_df)
+        self.summary_view = self.summary_df.sort_values("Month", kind="stable").reset_index(drop=True)
+        self.summary_month_index = self.partition_index(self.summary_view, "Month")
+        self.views_lang = self.lang
+
+    def ensure_ledger_views(self):
+        if self.views_lang != self.lang:
+            self.build_ledger_views()
+
+    def get_months(self):
+        self.ensure_ledger_views()
+        return sorted(self.summary_month_index.keys())
+
+    def get_journal(self, month=None):
+        self.ensure_ledger_views()
+        if not month:
+            return self.journal_view
+        start, end = self.journal_month_index.get(month, (0, 0))
+        return self.journal_view.iloc[start:end]
+
+    def get_general_ledger(self, account_number=None, month=None):
+        self.ensure_ledger_views()
+        if account_number:
+            if month:
+                start, end = self.ledger_account_month_index.get((account_number, month), (0, 0))
+            else:
+                start, end = self.ledger_account_index.get(account_number, (0, 0))
+            return self.ledger_view.iloc[start:end]
+        if month:
+            return self.ledger_view[self.ledger_view["Transaction_Month"] == month]
+        return self.ledger_view
+
+    def get_summary(self, month):
+        self.ensure_ledger_views()
+        start, end = self.summary_month_index.get(month, (0, 0))
+        return self.summary_view.iloc[start:end]
+
     def get_account_dict(self):
         account_dict = {}
         for id, d in self.account_dict.items():
@@ -296,11 +623,12 @@ class TidyData:
     def get_month_start(self, date):
         return pd.Timestamp(date.year, date.month, 1)
 
+    @profile_stage("etax_template", rows=lambda self: len(self.bs_template_df) + len(self.pl_template_df))
     def etax_template(self):
         # e-Tax CSV Sheet for BS
         input_BS_path = self.BS_path  # BS Template CSV
         # Load the CSV file and use the first row as the header
-        self.bs_template_df = pd.read_csv(input_BS_path, header=0)
+        self.bs_template_df = shared_template(input_BS_path, load_template_df).copy()
         # カラム名に余分なスペースがある場合の対応
         self.bs_template_df.columns = self.bs_template_df.columns.str.strip()
         # Ensure the Ledger_Account_Number column is present by checking its existence
@@ -344,7 +672,7 @@ class TidyData:
         # e-Tax CSV Sheet for PL
         input_PL_path = self.PL_path  # Replace with your input CSV file path
         # Load the CSV file
-        self.pl_template_df = pd.read_csv(input_PL_path, header=0)
+        self.pl_template_df = shared_template(input_PL_path, load_template_df).copy()
         # カラム名に余分なスペースがある場合の対応
         self.pl_template_df.columns = self.pl_template_df.columns.str.strip()
         # Ensure the Ledger_Account_Number column is present by checking its existence
@@ -385,11 +713,16 @@ class TidyData:
             )
         # Display the modified DataFrame
         self.debug_print(self.pl_template_df.head())
+        # BS/PL テンプレートの親子関係インデックス（bs_pl で毎回作り直さない）
+        self.bs_hierarchy_df = self.template_hierarchy(self.bs_template_df)
+        self.pl_hierarchy_df = self.template_hierarchy(self.pl_template_df)
 
+    @profile_stage("general_ledger", rows=lambda self: len(self.general_ledger_df))
     def general_ledger(self):
         # 伝票単位で処理を行う
         df_temp = pd.DataFrame(self.amount_rows).copy()
         for transaction_id, group in df_temp.groupby(self.columns["伝票"]):
+            self.check_cancelled()
             # グループ内の先頭行の借方金額と貸方金額、摘要文を取得
             first_row = group.iloc[0]
             transction_date = first_row[self.columns["伝票日付"]]
@@ -660,6 +993,7 @@ class TidyData:
         self.debug_print(final_entry.head())
         self.general_ledger_df = final_entry.copy()
 
+    @profile_stage("fill_account_dict", rows=lambda self: len(self.account_dict))
     def fill_account_dict(self):
         # 科目コードと科目名の対応辞書を作成
         account_dict = {
@@ -681,6 +1015,7 @@ class TidyData:
         )
         self.account_dict = OrderedDict(sorted(account_dict.items()))
 
+    @profile_stage("trial_balance_carried_forward", rows=lambda self: len(self.summary_df))
     def trial_balance_carried_forward(self):
         # 借方の金額を集計する
         debit_summary = (
@@ -827,6 +1162,111 @@ class TidyData:
         self.debug_print("\nself.summary_df:")
         self.debug_print(self.summary_df.head())
 
+    @staticmethod
+    def hierarchy_parents(accounts, levels, included=None):
+        """
+        テンプレートの行順とレベルから親科目を求める。
+        各行の親は「それより前に現れた、レベルが一つ上の直近の行」とする（included が False の行は対象外）。
+        レベルごとに前方補完するだけなので、行ごとのループは行わない。
+        """
+        accounts = pd.Series(accounts).reset_index(drop=True)
+        levels = pd.Series(levels).reset_index(drop=True)
+        if included is None:
+            included = pd.Series(True, index=accounts.index)
+        else:
+            included = pd.Series(included).reset_index(drop=True)
+        parents = pd.Series(None, index=accounts.index, dtype=object)
+        for level in sorted(levels[included & (levels > 0)].unique()):
+            # 直前に現れたレベル level の科目を前方補完し、レベル level+1 の行の親とする
+            last_seen = accounts.where(included & (levels == level)).ffill()
+            children = included & (levels == level + 1) & last_seen.notna()
+            parents[children] = last_seen[children]
+        return parents
+
+    def template_hierarchy(self, template_df):
+        """
+        e-Tax テンプレートの親子関係インデックスを作成する（etax_template で一度だけ実行）。
+        科目コードのない行は除き、seq は残った行の行順（従来の連番と同じく 1 から）、
+        Parent は残った行を対象とした親科目。
+        """
+        hierarchy_df = template_df[["Ledger_Account_Number", "Level", "Type", "Category", "Name"]]
+        hierarchy_df = hierarchy_df[hierarchy_df["Ledger_Account_Number"].notna()].reset_index(drop=True)
+        hierarchy_df.insert(0, "seq", np.arange(1, len(hierarchy_df) + 1))
+        hierarchy_df["Parent"] = self.hierarchy_parents(hierarchy_df["Ledger_Account_Number"], hierarchy_df["Level"])
+        return hierarchy_df
+
+    def update_etax_code_mapping(self, hierarchy_df):
+        # テンプレートの行順（seq）と e-Tax の区分・科目名を etax_code_mapping_dict に登録する
+        for account, seq, category, name in zip(
+            hierarchy_df["Ledger_Account_Number"],
+            hierarchy_df["seq"],
+            hierarchy_df["Category"],
+            hierarchy_df["Name"]
+        ):
+            self.etax_code_mapping_dict[account] = {
+                "seq": seq,
+                "Category": self.etax_code_mapping_dict.get(account, {}).get("Category", "Unknown"),
+                "eTax_Category": category if pd.notna(category) else "Unknown",
+                "eTax_Account_Name": name if pd.notna(name) else "Unknown",
+            }
+
+    def map_etax_code(self, codes, field, default="Unknown"):
+        # etax_code_mapping_dict の field を科目コードの列に一括で引き当てる
+        lookup = {code: info.get(field, default) for code, info in self.etax_code_mapping_dict.items()}
+        return codes.map(lookup).where(codes.isin(lookup.keys()), default)
+
+    def rollup_hierarchy(self, nodes, rollup_columns):
+        """
+        親子関係を持つ科目の表 nodes（テンプレート行順）から BS/PL のレコードを作成し、
+        下位レベルから順に正の金額を親へ積み上げる。
+        Level には親科目のレベルを設定する（従来の bs_dict/pl_dict と同じ）。
+        """
+        # T 行、または借方・貸方に金額のある科目のみを対象とする
+        active = nodes[(nodes["Type"] == "T") | (nodes["Total_Debit"] > 0) | (nodes["Total_Credit"] > 0)]
+        level_map = active.set_index("Ledger_Account_Number")["Level"]
+        records = active[active["Parent"].isin(level_map.index)].copy()
+        records["Level"] = records["Parent"].map(level_map).astype(int)
+        records.index = records["Ledger_Account_Number"]
+        if records.empty:
+            return records
+        min_level = records["Level"].min()
+        max_level = records["Level"].max()
+        # max_level から min_level の範囲で、親ごとに一括して集計する
+        for level in range(max_level, min_level, -1):
+            rows = records[(records["Level"] == level) & records["Parent"].notna()]
+            if rows.empty:
+                continue
+            missing = rows["Parent"][~rows["Parent"].isin(records.index)].unique()
+            if len(missing) > 0:
+                # レコードのない親はレベル level-1 の集計用レコードとして追加する
+                added = pd.DataFrame(0, index=pd.Index(missing), columns=records.columns.drop(["Type", "Ledger_Account_Number", "Parent"]))
+                added["Level"] = level - 1
+                added["Type"] = None
+                added["Ledger_Account_Number"] = None
+                added["Parent"] = None
+                records = pd.concat([records, added[records.columns]])
+            sums = rows[rollup_columns].clip(lower=0).groupby(rows["Parent"]).sum()
+            records.loc[sums.index, rollup_columns] += sums
+        return records
+
+    def hierarchy_dict(self, records):
+        # レコードの表を {科目コード: 値の辞書} に変換する（追加した集計用の親には Type 等を持たせない）
+        value_columns = ["Beginning_Balance", "Total_Debit", "Total_Credit", "Ending_Balance"]
+        result = {}
+        for key, row in zip(records.index, records.to_dict(orient="records")):
+            if row["Type"] is None:
+                result[key] = {"Level": row["Level"], "Parent": None, **{column: row[column] for column in value_columns}}
+            else:
+                result[key] = {
+                    "Level": row["Level"],
+                    "Type": row["Type"],
+                    "Ledger_Account_Number": key,
+                    "Parent": row["Parent"],
+                    **{column: row[column] for column in value_columns}
+                }
+        return result
+
+    @profile_stage("bs_pl", rows=lambda self: len(self.bs_dict) + len(self.pl_dict))
     def bs_pl(self):
         # Debit
         debit_summary = (
@@ -848,12 +1288,8 @@ class TidyData:
             inplace=True,
         )
         # Add Category and eTax_Category to debit_summary
-        debit_summary["Category"] = debit_summary["Ledger_Account_Number"].map(
-            lambda code: self.etax_code_mapping_dict.get(code, {}).get("Category", "Unknown")
-        )
-        debit_summary["eTax_Category"] = debit_summary["Ledger_Account_Number"].map(
-            lambda code: self.etax_code_mapping_dict.get(code, {}).get("eTax_Category", "Unknown")
-        )
+        debit_summary["Category"] = self.map_etax_code(debit_summary["Ledger_Account_Number"], "Category")
+        debit_summary["eTax_Category"] = self.map_etax_code(debit_summary["Ledger_Account_Number"], "eTax_Category")
         # Credit
         credit_summary = (
             self.amount_rows.groupby(
@@ -874,12 +1310,8 @@ class TidyData:
             inplace=True,
         )
         # Add Category and eTax_Category to credit_summary
-        credit_summary["Category"] = credit_summary["Ledger_Account_Number"].map(
-            lambda code: self.etax_code_mapping_dict.get(code, {}).get("Category", "Unknown")
-        )
-        credit_summary["eTax_Category"] = credit_summary["Ledger_Account_Number"].map(
-            lambda code: self.etax_code_mapping_dict.get(code, {}).get("eTax_Category", "Unknown")
-        )
+        credit_summary["Category"] = self.map_etax_code(credit_summary["Ledger_Account_Number"], "Category")
+        credit_summary["eTax_Category"] = self.map_etax_code(credit_summary["Ledger_Account_Number"], "eTax_Category")
         # Merge debit_summary and credit_summary on Ledger_Account_Number
         combined_summary = pd.merge(
             debit_summary,
@@ -913,15 +1345,9 @@ class TidyData:
         # Ensure "Beginning_Balance" is of type int64
         beginning_balances_df["Beginning_Balance"] = beginning_balances_df["Beginning_Balance"].astype("int64")
         # Add Category and eTax_Category to beginning_balances_df
-        beginning_balances_df["Category"] = beginning_balances_df["Ledger_Account_Number"].map(
-            lambda code: self.etax_code_mapping_dict.get(code, {}).get("Category", "Unknown")
-        )
-        beginning_balances_df["eTax_Category"] = beginning_balances_df["Ledger_Account_Number"].map(
-            lambda code: self.etax_code_mapping_dict.get(code, {}).get("eTax_Category", "Unknown")
-        )
-        beginning_balances_df["Ledger_Account_Name"] = beginning_balances_df["Ledger_Account_Number"].map(
-            lambda code: self.etax_code_mapping_dict.get(code, {}).get("eTax_Account_Name", "Unknown")
-        )
+        beginning_balances_df["Category"] = self.map_etax_code(beginning_balances_df["Ledger_Account_Number"], "Category")
+        beginning_balances_df["eTax_Category"] = self.map_etax_code(beginning_balances_df["Ledger_Account_Number"], "eTax_Category")
+        beginning_balances_df["Ledger_Account_Name"] = self.map_etax_code(beginning_balances_df["Ledger_Account_Number"], "eTax_Account_Name")
         # Merge the beginning balances into the combined_summary DataFrame
         combined_summary = pd.merge(
             combined_summary,
@@ -933,185 +1359,64 @@ class TidyData:
         combined_summary["Beginning_Balance"] = combined_summary["Beginning_Balance"].fillna(0).astype("int64")
         combined_summary["Total_Debit"] = combined_summary["Total_Debit"].fillna(0).astype("int64")
         combined_summary["Total_Credit"] = combined_summary["Total_Credit"].fillna(0).astype("int64")
+        value_columns = ["Beginning_Balance", "Total_Debit", "Total_Credit", "Ending_Balance"]
         """
         BS
         """
-        # Iterate through self.bs_template_df to populate the dictionary
-        i = 0  # Initialize the sequence counter
-        for _, row in self.bs_template_df.iterrows():
-            ledger_account_number = row["Ledger_Account_Number"]
-            if pd.notna(ledger_account_number):  # Only process rows with valid Ledger_Account_Number
-                i += 1
-                self.etax_code_mapping_dict[ledger_account_number] = {
-                    "seq": i,
-                    "Category": self.etax_code_mapping_dict.get(ledger_account_number, {}).get("Category", "Unknown"),
-                    "eTax_Category": row["Category"] if pd.notna(row["Category"]) else "Unknown",
-                    "eTax_Account_Name": row["Name"] if pd.notna(row["Name"]) else "Unknown",
-                }
+        # テンプレートの行順（seq）と e-Tax の区分・科目名を登録する
+        self.update_etax_code_mapping(self.bs_hierarchy_df)
         # Separate into Balance Sheet and Income Statement items
         balance_sheet_df = combined_summary[combined_summary["Category"].isin(["資産", "負債"])][
             ["Ledger_Account_Number", "Ledger_Account_Name", "Category", "Beginning_Balance", "Total_Debit", "Total_Credit"]
-        ]
+        ].copy()
         # Add the Ending_Balance column based on the Category
-        balance_sheet_df["Ending_Balance"] = balance_sheet_df.apply(
-            lambda row: (
-                row["Beginning_Balance"] + row["Total_Debit"] - row["Total_Credit"]
-                if row["Category"] == "資産"
-                else row["Beginning_Balance"] + row["Total_Credit"] - row["Total_Debit"]
-            ),
-            axis=1
+        balance_sheet_df["Ending_Balance"] = np.where(
+            balance_sheet_df["Category"] == "資産",
+            balance_sheet_df["Beginning_Balance"] + balance_sheet_df["Total_Debit"] - balance_sheet_df["Total_Credit"],
+            balance_sheet_df["Beginning_Balance"] + balance_sheet_df["Total_Credit"] - balance_sheet_df["Total_Debit"]
         )
         # Merge the sheet's Ledger_Account_Number with balance_sheet_df to get balances
         self.bs_data_df = pd.merge(
             self.bs_template_df,
-            balance_sheet_df[["Ledger_Account_Number", "Beginning_Balance", "Total_Debit", "Total_Credit", "Ending_Balance"]],
+            balance_sheet_df[["Ledger_Account_Number"] + value_columns],
             on="Ledger_Account_Number",
             how="left"
         )
         # Keep rows where `type` is "T" or both balances are not NaN
         self.bs_data_df = self.bs_data_df[
             (self.bs_data_df["Type"] == "T") |
-            (~self.bs_data_df[["Beginning_Balance", "Total_Debit", "Total_Credit", "Ending_Balance"]].isna().all(axis=1))
+            (~self.bs_data_df[value_columns].isna().all(axis=1))
         ]
         # Ensure these columns are of type int64, setting NaN to 0
-        columns_to_convert = ["Beginning_Balance", "Total_Debit", "Total_Credit", "Ending_Balance"]
-        for column in columns_to_convert:
-            self.bs_data_df[column] = pd.to_numeric(self.bs_data_df[column], errors="coerce").fillna(0).astype("int64")
+        self.bs_data_df[value_columns] = self.bs_data_df[value_columns].fillna(0).astype("int64")
         # Set Beginning_Balance, Total_Debit, Total_Credit, and Ending_Balance to 0 for rows where Type is "T"
-        self.bs_data_df.loc[self.bs_data_df["Type"] == "T", ["Beginning_Balance", "Total_Debit", "Total_Credit", "Ending_Balance"]] = 0
-        # BSの親子関係を構築する関数
-        def build_bs_parent_child_hierarcy(bs_data_df, level_range=(1, 10), exclude_empty_children=True):
-            # 初期化: 各レベルの最新の要素を保持（レベル範囲を指定）
-            level_list = {lvl: None for lvl in range(level_range[0], level_range[1] + 1)}
-            children_list = {}  # 親要素とその子要素を保持する辞書
-            for _, row in bs_data_df.iterrows():
-                level = row["Level"]
-                account = row["Ledger_Account_Number"]
-                # 現在のレベルに対応する要素を更新
-                level_list[level] = account
-                # 子要素リストを初期化（もし未登録なら）
-                if account not in children_list:
-                    _type = row["Type"]
-                    beginning_balance = 0 if "T"==_type else row["Beginning_Balance"] if not pd.isna(row["Beginning_Balance"]) else 0
-                    total_debit = 0 if "T"==_type else row["Total_Debit"] if not pd.isna(row["Total_Debit"]) else 0
-                    total_credit = 0 if "T"==_type else row["Total_Credit"] if not pd.isna(row["Total_Credit"]) else 0
-                    ending_balance = 0 if "T"==_type else row["Ending_Balance"] if not pd.isna(row["Ending_Balance"]) else 0
-                    children_list[account] = {"Level": level, "Type": _type, "Beginning_Balance": beginning_balance, "Total_Debit": total_debit, "Total_Credit": total_credit, "Ending_Balance": ending_balance, "children": []}
-                # 親要素が存在する場合、その子要素として追加
-                if level > 1 and level_list[level - 1] is not None:
-                    parent = level_list[level - 1]
-                    children_list[parent]["children"].append(account)
-                    children_list[account]["parent"] = parent
-                else:
-                    continue
-            # 空の子要素リストを持つ親要素を除外（オプション）
-            if exclude_empty_children:
-                filtered_list = {k: v for k, v in children_list.items() if "T"==v["Type"] or np.int64(v["Total_Debit"]) > 0 or np.int64(v["Total_Credit"]) > 0}
-            else:
-                filtered_list = children_list
-            return filtered_list
-        # BSの親子関係を構築 統合処理: bs_template_dfを基準にbs_data_dfで上書き
-        # インデックスを基準に高速な検索を可能にする
-        merge_keys = ["Ledger_Account_Number"]
-        # bs_data_df を辞書に変換 (merge_keysをキーとして)
-        self.bs_data_df = self.bs_data_df.groupby("Ledger_Account_Number").sum().reset_index()
-        bs_data_dict = self.bs_data_df.set_index(merge_keys).to_dict(orient="index")
-        # 結果を格納するための DataFrame を初期化
-        bs_result_df = self.bs_template_df.copy()
-        # for ループで self.bs_template_df を処理
-        for index, row in self.bs_template_df.iterrows():
-            key = row["Ledger_Account_Number"]
-            # データ辞書の行を取得
-            bs_data_row = bs_data_dict.get(key, {})
-            # 必要な列を更新
-            for column in ["Beginning_Balance", "Total_Debit", "Total_Credit", "Ending_Balance"]:
-                if column in row and not pd.isna(row[column]):
-                    # 既存の値が存在する場合、値を保持
-                    bs_result_df.at[index, column] = row[column]
-                elif column in bs_data_row:
-                    # bs_data_df の値で上書き
-                    bs_result_df.at[index, column] = bs_data_row[column]
-
-        bs_parent_child_hierarchy = build_bs_parent_child_hierarcy(bs_result_df, level_range=(1, 10), exclude_empty_children=True)
-        # BSの結果を表示
-        self.bs_dict = {}
-        min_level = 10
-        max_level = 0
-        for parent, details in bs_parent_child_hierarchy.items():
-            level = details["Level"]
-            children = details["children"]
-            self.debug_print(f"Level:{level} children:{children}")
-            for child in children:
-                if child in bs_parent_child_hierarchy:
-                    result = bs_parent_child_hierarchy[child]
-                    _type = result["Type"]
-                    beginning_balance = result["Beginning_Balance"]
-                    total_debit = result["Total_Debit"]
-                    total_credit = result["Total_Credit"]
-                    ending_balance = result["Ending_Balance"]
-                    if level > max_level:
-                        max_level = level
-                    if min_level > level:
-                        min_level = level
-                    if "T"==_type or beginning_balance > 0 or total_debit > 0 or total_credit > 0 or ending_balance > 0:
-                        self.debug_print(f"bs_parent_child_hierarchy level: {level}, Ledger_Account_Number: {child} Type:{_type} Parent: {parent}, Beginning_Balance: {beginning_balance} Total_Debit: {total_debit} Total_Credit: {total_credit} Ending_Balance: {ending_balance}")
-                        self.bs_dict[child] = {
-                            "Level": level,
-                            "Type": _type,
-                            "Ledger_Account_Number": child,
-                            "Parent": parent,
-                            "Beginning_Balance": beginning_balance,
-                            "Total_Debit": total_debit,
-                            "Total_Credit": total_credit,
-                            "Ending_Balance": ending_balance
-                        }
-                else:
-                    self.debug_print(f"B/S Ledger_Account_Number {child} not found.")
-        # max_level から min_level の範囲でループ
-        for level in range(max_level, min_level, -1):
-            # target_level に該当する要素を抽出
-            filtered_dict = {key: value for key, value in self.bs_dict.items() if value["Level"] == level}
-            for key, row in filtered_dict.items():
-                parent_key = row["Parent"]
-                if not parent_key in self.bs_dict:
-                    if 'None'==parent_key:
-                        parent_key = "10X000000"
-                    self.bs_dict[parent_key] = {"Level": level-1, "Parent": None, "Beginning_Balance": 0, "Total_Debit": 0, "Total_Credit": 0, "Ending_Balance": 0}
-                parent = self.bs_dict[parent_key]
-                if not parent:
-                    continue
-                beginning_balance = 0 if pd.isna(row["Beginning_Balance"]) else row["Beginning_Balance"]
-                total_debit = 0 if pd.isna(row["Total_Debit"]) else row["Total_Debit"]
-                total_credit = 0 if pd.isna(row["Total_Credit"]) else row["Total_Credit"]
-                ending_balance = 0 if pd.isna(row["Ending_Balance"]) else row["Ending_Balance"]
-                if beginning_balance > 0:
-                    parent["Beginning_Balance"] += np.int64(beginning_balance)
-                if total_debit > 0:
-                    parent["Total_Debit"] += np.int64(total_debit)
-                if total_credit > 0:
-                    parent["Total_Credit"] += np.int64(total_credit)
-                if ending_balance > 0:
-                    parent["Ending_Balance"] += np.int64(ending_balance)
-        # Filter bs_dict to remove entries with Beginning_Balance and Ending_Balance both 0
-        self.bs_dict = {
-            key: value
-            for key, value in self.bs_dict.items()
-            if not (value["Beginning_Balance"] == 0 and value["Ending_Balance"] == 0)
-        }
-        self.bs_dict = {
-            key: {
-                **value,
-                "Ending_Balance": (
-                    value["Beginning_Balance"] + value["Total_Credit"] - value["Total_Debit"]
-                    if key.startswith("10A") and value.get("Type") == "T"
-                    else value["Beginning_Balance"] + value["Total_Debit"] - value["Total_Credit"]
-                    if (key.startswith("10B") or key.startswith("10C")) and value.get("Type") == "T"
-                    else value["Ending_Balance"]
-                )
-            }
-            for key, value in self.bs_dict.items()
-            if not (value["Total_Debit"] == 0 and value["Total_Credit"] == 0)
-        }
+        self.bs_data_df.loc[self.bs_data_df["Type"] == "T", value_columns] = 0
+        # BSの親子関係: テンプレート全行の親子関係インデックスに科目別の金額を結合する
+        self.bs_data_df = self.bs_data_df.groupby("Ledger_Account_Number", sort=False)[value_columns].sum().reset_index()
+        bs_nodes = self.bs_hierarchy_df[["Ledger_Account_Number", "Level", "Type", "Parent", "seq"]].merge(
+            self.bs_data_df, on="Ledger_Account_Number", how="left"
+        )
+        bs_nodes[value_columns] = bs_nodes[value_columns].fillna(0).astype("int64")
+        bs_nodes.loc[bs_nodes["Type"] == "T", value_columns] = 0
+        bs_records = self.rollup_hierarchy(bs_nodes, value_columns)
+        if not bs_records.empty:
+            # Filter to remove entries with Beginning_Balance and Ending_Balance both 0 / Total_Debit and Total_Credit both 0
+            bs_records = bs_records[
+                ~((bs_records["Beginning_Balance"] == 0) & (bs_records["Ending_Balance"] == 0)) &
+                ~((bs_records["Total_Debit"] == 0) & (bs_records["Total_Credit"] == 0))
+            ].copy()
+            # T 行の Ending_Balance を資産(10A)・負債純資産(10B/10C)に応じて再計算する
+            account = bs_records.index.to_series().astype(str)
+            is_total = bs_records["Type"] == "T"
+            asset_total = is_total & account.str.startswith("10A")
+            liability_total = is_total & (account.str.startswith("10B") | account.str.startswith("10C"))
+            bs_records.loc[asset_total, "Ending_Balance"] = (
+                bs_records["Beginning_Balance"] + bs_records["Total_Credit"] - bs_records["Total_Debit"]
+            )[asset_total]
+            bs_records.loc[liability_total, "Ending_Balance"] = (
+                bs_records["Beginning_Balance"] + bs_records["Total_Debit"] - bs_records["Total_Credit"]
+            )[liability_total]
+        self.bs_dict = self.hierarchy_dict(bs_records)
         # Add eTax_Category and eTax_Account_Name based on self.etax_code_mapping_dict
         for key, value in self.bs_dict.items():
             # Retrieve eTax_Category and eTax_Account_Name based on the Ledger_Account_Number (key)
@@ -1135,29 +1440,16 @@ class TidyData:
         """
         PL
         """
-        # Iterate through self.pl_template_df to populate the dictionary
-        i = 0  # Initialize the sequence counter
-        for _, row in self.pl_template_df.iterrows():
-            ledger_account_number = row["Ledger_Account_Number"]
-            if pd.notna(ledger_account_number):  # Only process rows with valid Ledger_Account_Number
-                i += 1
-                self.etax_code_mapping_dict[ledger_account_number] = {
-                    "seq": i,
-                    "Category": self.etax_code_mapping_dict.get(ledger_account_number, {}).get("Category", "Unknown"),
-                    "eTax_Category": row["Category"] if pd.notna(row["Category"]) else "Unknown",
-                    "eTax_Account_Name": row["Name"] if pd.notna(row["Name"]) else "Unknown",
-                }
+        # テンプレートの行順（seq）と e-Tax の区分・科目名を登録する
+        self.update_etax_code_mapping(self.pl_hierarchy_df)
         income_statement_df = combined_summary[combined_summary["Category"].isin(["収益", "費用"])][
             ["Ledger_Account_Number", "Ledger_Account_Name", "Category", "Beginning_Balance", "Total_Debit", "Total_Credit"]
-        ]
+        ].copy()
         # Add the Ending_Balance column based on the Category
-        income_statement_df["Ending_Balance"] = income_statement_df.apply(
-            lambda row: (
-                row["Beginning_Balance"] + row["Total_Credit"] - row["Total_Debit"]  # For revenue (収益)
-                if row["Category"] == "収益"
-                else row["Beginning_Balance"] + row["Total_Debit"] - row["Total_Credit"]  # For expense (費用)
-            ),
-            axis=1
+        income_statement_df["Ending_Balance"] = np.where(
+            income_statement_df["Category"] == "収益",
+            income_statement_df["Beginning_Balance"] + income_statement_df["Total_Credit"] - income_statement_df["Total_Debit"],  # For revenue (収益)
+            income_statement_df["Beginning_Balance"] + income_statement_df["Total_Debit"] - income_statement_df["Total_Credit"]  # For expense (費用)
         )
         if DEBUG:
             save_dataframe_to_csv(self.pl_template_df,'pl_template_df.csv','data/_PCA/dataframe')
@@ -1165,167 +1457,51 @@ class TidyData:
         # Merge the sheet Ledger_Account_Number with the income_statement_df to get balances
         self.pl_data_df = pd.merge(
             self.pl_template_df,
-            income_statement_df[["Ledger_Account_Number", "Beginning_Balance", "Total_Debit", "Total_Credit", "Ending_Balance"]],
+            income_statement_df[["Ledger_Account_Number"] + value_columns],
             on="Ledger_Account_Number",
             how="left"
         )
         # Keep rows where `Type` is "T" or both balances are not NaN
         self.pl_data_df = self.pl_data_df[
             (self.pl_data_df["Type"] == "T") |
-            (~self.pl_data_df[["Beginning_Balance", "Total_Debit", "Total_Credit", "Ending_Balance"]].isna().all(axis=1))
+            (~self.pl_data_df[value_columns].isna().all(axis=1))
         ]
         # Ensure these columns are of type int64, setting NaN to 0
-        columns_to_convert = ["Beginning_Balance", "Total_Debit", "Total_Credit", "Ending_Balance"]
-        for column in columns_to_convert:
-            self.pl_data_df[column] = pd.to_numeric(self.pl_data_df[column], errors="coerce").fillna(0).astype("int64")
+        self.pl_data_df[value_columns] = self.pl_data_df[value_columns].fillna(0).astype("int64")
         # Set Beginning_Balance, Total_Debit, Total_Credit, and Ending_Balance to 0 for rows where Type is "T"
-        self.pl_data_df.loc[self.pl_data_df["Type"] == "T", ["Beginning_Balance", "Total_Debit", "Total_Credit", "Ending_Balance"]] = 0
+        self.pl_data_df.loc[self.pl_data_df["Type"] == "T", value_columns] = 0
         if DEBUG:
             save_dataframe_to_csv(self.pl_data_df,'pl_data_df.csv','data/_PCA/dataframe')
-
-        # BSの親子関係を構築する関数
-        def build_pl_parent_child_hierarcy(pl_result_df, level_range=(1, 10), exclude_empty_children=True):
-            # 初期化: 各レベルの最新の要素を保持（レベル範囲を指定）
-            level_list = {lvl: None for lvl in range(level_range[0], level_range[1] + 1)}
-            children_list = {}  # 親要素とその子要素を保持する辞書
-            for _, row in pl_result_df.iterrows():
-                level = row["Level"]
-                account = row["Ledger_Account_Number"]
-                _type = row["Type"]
-                # 現在のレベルに対応する要素を更新
-                level_list[level] = account
-                # 子要素リストを初期化（もし未登録なら）
-                if account not in children_list:
-                    total_debit = 0 if "T"==_type else row["Total_Debit"] if not pd.isna(row["Total_Debit"]) else 0
-                    total_credit = 0 if "T"==_type else row["Total_Credit"] if not pd.isna(row["Total_Credit"]) else 0
-                    ending_balance = 0 if "T"==_type else row["Ending_Balance"] if not pd.isna(row["Ending_Balance"]) else 0
-                    children_list[account] = {"Level": level, "Type": _type, "Total_Debit": total_debit, "Total_Credit": total_credit, "Ending_Balance": ending_balance, "children": []}
-                # 親要素が存在する場合、その子要素として追加
-                if level > 1 and level_list[level - 1] is not None:
-                    parent = level_list[level - 1]
-                    children_list[parent]["children"].append(account)
-                    children_list[account]["parent"] = parent
-                else:
-                    continue
-            # Debit/Credtとも0の要素を除外
-            if exclude_empty_children:
-                filtered_list = {k: v for k, v in children_list.items() if "T"==v["Type"] or np.int64(v["Total_Debit"]) > 0 or np.int64(v["Total_Credit"]) > 0}
-            else:
-                filtered_list = children_list
-            return filtered_list
-
-        # PLの親子関係を構築 統合処理: pl_template_dfを基準にpl_data_dfで上書き
-        # インデックスを基準に高速な検索を可能にする
-        merge_keys = ["Ledger_Account_Number"]
-        # pl_data_df を辞書に変換 (merge_keysをキーとして)
-        pl_data_dict = self.pl_data_df.set_index(merge_keys).to_dict(orient="index")
-        # 結果を格納するための DataFrame を初期化
-        pl_result_df = self.pl_template_df.copy()
-        # for ループで self.pl_template_df を処理
-        for index, row in self.pl_template_df.iterrows():
-            account_number = row["Ledger_Account_Number"]
-            # データ辞書の行を取得
-            pl_data_row = pl_data_dict.get(account_number, {})
-            # 必要な列を更新
-            for column in ["Total_Debit", "Total_Credit", "Ending_Balance"]:
-                if column in row and not pd.isna(row[column]):
-                    # 既存の値が存在する場合、値を保持
-                    pl_result_df.at[index, column] = row[column]
-                elif column in pl_data_row:
-                    # pl_data_df の値で上書き
-                    pl_result_df.at[index, column] = pl_data_row[column]
-
-        pl_parent_child_hierarchy = build_pl_parent_child_hierarcy(self.pl_data_df, level_range=(1, 10), exclude_empty_children=True)
+        # PLの親子関係: 金額のある行と T 行だけでレベルをたどるため、対象行を指定して親を求め直す
+        pl_values = self.pl_data_df.drop_duplicates(subset="Ledger_Account_Number").set_index("Ledger_Account_Number")[value_columns]
+        included = self.pl_hierarchy_df["Ledger_Account_Number"].isin(pl_values.index)
+        pl_nodes = self.pl_hierarchy_df[["Ledger_Account_Number", "Level", "Type", "seq"]].copy()
+        pl_nodes["Parent"] = self.hierarchy_parents(pl_nodes["Ledger_Account_Number"], pl_nodes["Level"], included)
+        pl_nodes = pl_nodes[included].join(pl_values, on="Ledger_Account_Number")
+        # P/L には期首残高を積み上げない
+        pl_nodes["Beginning_Balance"] = 0
         if DEBUG:
+            pl_result_df = self.pl_template_df.merge(pl_values, left_on="Ledger_Account_Number", right_index=True, how="left")
             save_dataframe_to_csv(pl_result_df,'pl_result_df.csv','data/_PCA/dataframe')
-
-        # PLの結果を表示
-        self.pl_dict = {}
-        min_level = 10
-        max_level = 0
-        for parent, details in pl_parent_child_hierarchy.items():
-            level = details["Level"]
-            children = details["children"]
-            self.debug_print(f"Level:{level} children:{children}")
-            for child in children:
-                if child in pl_parent_child_hierarchy:
-                    result = pl_parent_child_hierarchy[child]
-                    _type = result["Type"]
-                    total_debit = result["Total_Debit"]
-                    total_credit = result["Total_Credit"]
-                    ending_balance = result["Ending_Balance"]
-                    if level > max_level:
-                        max_level = level
-                    if min_level > level:
-                        min_level = level
-                    if "T"==_type or total_debit > 0 or total_credit > 0 or ending_balance > 0:
-                        self.debug_print(f"pl_parent_child_hierarchy level: {level}, Ledger_Account_Number: {child} Type:{_type} Parent: {parent}, Beginning_Balance: {beginning_balance} Total_Debit: {total_debit} Total_Credit: {total_credit} Ending_Balance: {ending_balance}")
-                        self.pl_dict[child] = {
-                            "Level": level,
-                            "Type": _type,
-                            "Ledger_Account_Number": child,
-                            "Parent": parent,
-                            "Beginning_Balance": beginning_balance,
-                            "Total_Debit": total_debit,
-                            "Total_Credit": total_credit,
-                            "Ending_Balance": ending_balance
-                        }
-                else:
-                    self.debug_print(f"P/L Ledger_Account_Number {child} not found.")
-
-        # max_level から min_level の範囲でループ
-        for level in range(max_level, min_level, -1):
-            # target_level に該当する要素を抽出
-            filtered_dict = {key: value for key, value in self.pl_dict.items() if value["Level"] == level}
-            for key, row in filtered_dict.items():
-                parent_key = row['Parent']
-                if not parent_key in self.pl_dict:
-                    if 'None'==parent_key:
-                        parent_key = "10X000000"
-                    self.pl_dict[parent_key] = {"Level": level-1, "Parent": None, "Beginning_Balance": 0, "Total_Debit": 0, "Total_Credit": 0, "Ending_Balance": 0}
-                parent = self.pl_dict[row['Parent']]
-                beginning_balance = 0 if pd.isna(row["Beginning_Balance"]) else row["Beginning_Balance"]
-                total_debit = 0 if pd.isna(row["Total_Debit"]) else row["Total_Debit"]
-                if total_debit > 0:
-                    parent["Total_Debit"] += np.int64(total_debit).item()
-                total_credit = 0 if pd.isna(row["Total_Credit"]) else row["Total_Credit"]
-                if total_credit > 0:
-                    parent["Total_Credit"] += np.int64(total_credit).item()
-                ending_balance = 0 if pd.isna(row["Ending_Balance"]) else row["Ending_Balance"]
-                if ending_balance > 0:
-                    parent["Ending_Balance"] += np.int64(ending_balance).item()
-
-        # Filter pl_dict to remove entries with Total_Debit and Total_Credit both 0
-        self.pl_dict = {
-            key: value
-            for key, value in self.pl_dict.items()
-            if not (value["Total_Debit"] == 0 and value["Total_Credit"] == 0)
-        }
-        # Filters out accounts where both Total_Debit and Total_Credit are zero
-        # Recalculates "Ending_Balance" based on account type (10D or 10E) and Type="T"
-        # Preserves all other key-value pairs
-        # Uses dictionary comprehension for efficiency
-        self.pl_dict = {
-            key: {
-                **value,
-                "Ending_Balance": (
-                    value["Total_Credit"] - value["Total_Debit"]
-                    if key.startswith("10D") and value.get("Type") == "T"
-                    else (
-                        value["Total_Debit"] - value["Total_Credit"]
-                        if key.startswith("10E") and value.get("Type") == "T"
-                        else value["Ending_Balance"]
-                    )
-                ),
-            }
-            for key, value in self.pl_dict.items()
-            if not (
-                0 == value["Total_Debit"]
-                and 0 == value["Total_Credit"]
-                and 0 == value["Ending_Balance"]
-            )
-            and value.get("Type") in ["T", "1"]
-        }
+        pl_records = self.rollup_hierarchy(pl_nodes, ["Total_Debit", "Total_Credit", "Ending_Balance"])
+        if not pl_records.empty:
+            # Filters out accounts where both Total_Debit and Total_Credit are zero
+            pl_records = pl_records[
+                ~((pl_records["Total_Debit"] == 0) & (pl_records["Total_Credit"] == 0)) &
+                pl_records["Type"].isin(["T", "1"])
+            ].copy()
+            # Recalculates "Ending_Balance" based on account type (10D or 10E) and Type="T"
+            account = pl_records.index.to_series().astype(str)
+            is_total = pl_records["Type"] == "T"
+            revenue_total = is_total & account.str.startswith("10D")
+            expense_total = is_total & account.str.startswith("10E")
+            pl_records.loc[revenue_total, "Ending_Balance"] = (
+                pl_records["Total_Credit"] - pl_records["Total_Debit"]
+            )[revenue_total]
+            pl_records.loc[expense_total, "Ending_Balance"] = (
+                pl_records["Total_Debit"] - pl_records["Total_Credit"]
+            )[expense_total]
+        self.pl_dict = self.hierarchy_dict(pl_records)
 
         # Add eTax_Category and eTax_Account_Name based on self.etax_code_mapping_dict
         for key, value in self.pl_dict.items():
@@ -1349,6 +1525,7 @@ class TidyData:
         # Replace the original dictionary with the sorted one
         self.pl_dict = sorted_pl_dict
 
+    @profile_stage("code2etax", rows=lambda self: len(self.tidy_gl_df))
     def code2etax(self):
         # account_list.csv を読み込み、変換用の辞書を作成
         account_list_df = pd.read_csv(self.account_path, dtype={"Account_Code": str, "eTax_Account_Code": str})
@@ -1392,9 +1569,47 @@ class TidyData:
         self.beginning_balances = beginning_balances
 
     def csv2dataframe(self, param_file_path):
-        ExecutionMessage.start(root, gui.create_gui, root)
+        """ 読み込みをワーカースレッドで行い、終わったらメインスレッドで GUI を作成する """
+        stage_profiler.clear()
+
+        def on_abort():
+            # 起動時の読み込みを中止した場合は表示するデータがないので終了する
+            if gui.log_text is None:
+                root.destroy()
+
+        ExecutionMessage.run(
+            root,
+            lambda progress, cancel_event: self.load(progress, cancel_event),
+            lambda _: gui.create_gui(root),
+            steps=len(LOAD_STAGES),
+            lang=self.lang,
+            on_abort=on_abort,
+        )
+
+    def report_stage(self, message):
+        """ 段階の開始を知らせる。中止されていれば LoadCancelled を投げる """
+        self.check_cancelled()
+        if self.progress:
+            self.progress(message)
+        else:
+            write_log_text(message)
+
+    def check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise LoadCancelled()
+
+    @profile_stage("csv2dataframe", rows=lambda self, *args: len(self.amount_rows))
+    def load(self, progress=None, cancel_event=None):
+        """
+        仕訳帳、総勘定元帳、試算表、BS/PL を計算する。GUI（root / gui / log_tracker）は使わないので
+        ワーカースレッドや一括処理（run_batch）からもそのまま呼べる。
+        progress(message): LOAD_STAGES の各段階の開始時に呼ぶ（None なら write_log_text）
+        cancel_event: set されていれば段階の区切りで LoadCancelled を投げる
+        """
+        self.progress = progress
+        self.cancel_event = cancel_event
         # 開始、終了、経過時間ラベルを追加
-        log_tracker.write_log_text("CSV to DataFrame")
+        self.report_stage("CSV to DataFrame")
         self.trading_partner_dict = {"supplier":{}, "customer": {}, "bank": {}}
         with open(self.trading_partner_path, mode='r', encoding='utf-8-sig') as csv_file:
             reader = csv.DictReader(csv_file)  # ヘッダー行をキーとして利用
@@ -1407,12 +1622,7 @@ class TidyData:
                     self.trading_partner_dict["customer"][code] = row
                 elif "預金" in category:
                     self.trading_partner_dict["bank"][code] = row
-        self.LHM_dict = {}
-        with open(self.LHM_path, mode='r', encoding='utf-8-sig') as csv_file:
-            reader = csv.DictReader(csv_file)  # ヘッダー行をキーとして利用
-            for row in reader:
-                id = row['id']
-                self.LHM_dict[id] = row
+        self.LHM_dict = dict(shared_template(self.LHM_path, load_lhm_dict))
         self.code2etax()
         df = pd.read_csv(self.file_path, encoding="utf-8-sig", dtype=str) # f tidy data csv
         df.columns = df.columns.str.strip()
@@ -1755,22 +1965,278 @@ class TidyData:
                 .apply(lambda x: "0" if x == 0 else "" if pd.isna(x) else str(int(float(x))))
             )
         self.debug_print(f"\nself.amount_rows \n{self.amount_rows}")
-        log_tracker.write_log_text("e-Tax Template")
+        self.report_stage("e-Tax Template")
         self.etax_template()
-        log_tracker.write_log_text("General Ledger")
+        self.report_stage("General Ledger")
         self.general_ledger()
-        log_tracker.write_log_text("Account Dict")
+        self.report_stage("Account Dict")
         self.fill_account_dict()
-        log_tracker.write_log_text("Trial Balance")
+        self.report_stage("Trial Balance")
         self.trial_balance_carried_forward()
-        log_tracker.write_log_text("BS/PL")
+        self.report_stage("BS/PL")
         self.bs_pl()
         for column in self.amount_rows:
             if pd.api.types.is_numeric_dtype(self.amount_rows[column]):
                 self.amount_rows[column] = self.amount_rows[column].fillna(0)
             else:
                 self.amount_rows[column] = self.amount_rows[column].fillna("")
-        log_tracker.write_log_text("END CSV to DataFrame")
+        self.report_stage("Ledger Views")
+        self.build_ledger_views()
+        self.report_stage("END CSV to DataFrame")
+
+    def results(self):
+        """
+        計算結果を {名前: DataFrame} で返す（仕訳帳、総勘定元帳、試算表、BS、PL）。
+        BS/PL は bs_dict / pl_dict の値（Ledger_Account_Number を含む）を 1 行ずつにしたもの。
+        """
+        return {
+            "journal": self.amount_rows,
+            "general_ledger": self.general_ledger_df,
+            "trial_balance": self.summary_df,
+            "bs": pd.DataFrame(list(self.bs_dict.values())),
+            "pl": pd.DataFrame(list(self.pl_dict.values())),
+        }
+
+
+BATCH_FORMATS = ("csv", "parquet")
+
+
+def check_output_format(output_format):
+    if output_format not in BATCH_FORMATS:
+        raise ValueError(f"Unknown output format {output_format}, use one of {BATCH_FORMATS}")
+    if "parquet" == output_format:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            try:
+                import fastparquet  # noqa: F401
+            except ImportError:
+                raise RuntimeError("Parquet 出力には pyarrow が必要です (pip install pyarrow)")
+
+
+def save_results(results, out_dir, output_format="csv"):
+    """ {名前: DataFrame} を out_dir/<名前>.csv（または .parquet）に保存し、保存したパスのリストを返す """
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for name, df in results.items():
+        if "parquet" == output_format:
+            # 数値と文字列が混在する object 列は Parquet に書けないので文字列型にそろえる
+            df = df.copy()
+            for column in df.columns[df.dtypes == object]:
+                df[column] = df[column].astype("string")
+            file_path = os.path.join(out_dir, f"{name}.parquet")
+            df.to_parquet(file_path, index=False)
+        else:
+            file_path = os.path.join(out_dir, f"{name}.csv")
+            df.to_csv(file_path, index=False, encoding="utf-8-sig")
+        written.append(file_path)
+    return written
+
+
+def template_paths(param_file_path):
+    """ パラメタファイルが参照する共有テンプレート（HOT010 BS/PL、LHM）のパスと読み込み関数 """
+    try:
+        with open(param_file_path, "r", encoding="utf-8-sig") as param_file:
+            params = json.load(param_file)
+    except (OSError, ValueError):
+        return []  # 読めないパラメタファイルは run_entity がエラーとして報告する
+    keys = [("HOT010_3.0_BS_10", load_template_df), ("HOT010_3.0_PL_10", load_template_df), ("LHM_path", load_lhm_dict)]
+    return [(params[key], loader) for key, loader in keys if params.get(key)]
+
+
+def init_batch_worker(templates):
+    # 各プロセスで共有テンプレートを 1 回だけ読み込んでおく
+    for path, loader in templates:
+        if os.path.isfile(path):
+            shared_template(path, loader)
+
+
+def run_entity(param_file_path, out_dir, output_format="csv"):
+    """
+    Worker: 1 事業者分のパラメタファイルで仕訳帳、総勘定元帳、試算表、BS/PL を計算して保存する。
+    例外は呼び出し側に投げず、結果の "error" に入れて返す。
+    一括処理では DEBUG / TRACE を使わない（デバッグ CSV は data/_PCA/dataframe の同じファイル名に
+    書かれるので、並列のワーカーが互いに上書きする）。
+    """
+    global DEBUG, TRACE
+    DEBUG = False
+    TRACE = False
+    start = time.perf_counter()
+    result = {"param_file": param_file_path, "out_dir": out_dir, "status": "ok", "journal_rows": None, "seconds": None, "error": ""}
+    try:
+        tidy_data = TidyData(param_file_path)
+        tidy_data.DEBUG = False
+        tidy_data.TRACE = False
+        tidy_data.load()
+        save_results(tidy_data.results(), out_dir, output_format)
+        result["journal_rows"] = len(tidy_data.amount_rows)
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - start, 2)
+    return result
+
+
+def entity_dirs(param_files, out_dir):
+    """ 事業者ごとの出力ディレクトリ（パラメタファイル名、重複するときは _2, _3 ... を付ける） """
+    dirs = []
+    used = {}
+    for param_file_path in param_files:
+        name = os.path.splitext(os.path.basename(param_file_path))[0]
+        used[name] = used.get(name, 0) + 1
+        if used[name] > 1:
+            name = f"{name}_{used[name]}"
+        dirs.append(os.path.join(out_dir, name))
+    return dirs
+
+
+def run_batch(param_files, out_dir, output_format="csv", workers=None):
+    """
+    複数の事業者（パラメタファイル）をプロセスプールで処理し、終わったものから run_entity の結果を返す。
+    パラメタファイル中の相対パスはカレントディレクトリ基準（GUI と同じ）。
+    """
+    check_output_format(output_format)
+    templates = []
+    for param_file_path in param_files:
+        for template in template_paths(param_file_path):
+            if template not in templates:
+                templates.append(template)
+    jobs = list(zip(param_files, entity_dirs(param_files, out_dir)))
+    if workers == 1 or len(jobs) <= 1:
+        for param_file_path, entity_dir in jobs:
+            yield run_entity(param_file_path, entity_dir, output_format)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_batch_worker, initargs=(templates,)) as pool:
+        futures = [pool.submit(run_entity, param_file_path, entity_dir, output_format) for param_file_path, entity_dir in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def write_batch_summary(results, file_path):
+    header = ["param_file", "out_dir", "status", "journal_rows", "seconds", "error"]
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    with open(file_path, "w", encoding="utf-8-sig", newline="") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=header, extrasaction="ignore")
+        writer.writeheader()
+        for result in sorted(results, key=lambda r: r["out_dir"]):
+            writer.writerow(result)
+    return file_path
+
+
+class VirtualTreeview:
+    """
+    Treeview に表示範囲の行だけを挿入する仮想表示クラス
+    DataFrame は参照のみ保持し、表示範囲の前後 buffer_size 行を含む範囲だけをまとめて整形する。
+    """
+    def __init__(self, tree, scrollbar, formatter, page_size=37, buffer_size=74):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.formatter = formatter  # formatter(df_slice) -> (rows, tags)
+        self.page_size = page_size
+        self.buffer_size = buffer_size
+        self.df = None
+        self.offset = 0
+        self.selected = None  # 選択行の DataFrame 上の位置（表示範囲外に出ても保持する）
+        self.cache_start = 0
+        self.cache_rows = []
+        self.cache_tags = []
+        self.scrollbar.configure(command=self.yview)
+        self.tree.configure(yscrollcommand=lambda first, last: None)
+        self.tree.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(3))
+        # Treeview 標準のキー操作は挿入済みの行で止まるため、表示範囲を動かして選択を移す
+        self.tree.bind("<Up>", lambda event: self.move_selection(-1))
+        self.tree.bind("<Down>", lambda event: self.move_selection(1))
+        self.tree.bind("<Prior>", lambda event: self.move_selection(-self.page_size))
+        self.tree.bind("<Next>", lambda event: self.move_selection(self.page_size))
+        self.tree.bind("<Home>", lambda event: self.select_row(0))
+        self.tree.bind("<End>", lambda event: self.select_row(self.total() - 1))
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+
+    def set_data(self, df):
+        self.df = df
+        self.offset = 0
+        self.selected = None
+        self.cache_rows = []
+        self.cache_tags = []
+        self.render()
+
+    def total(self):
+        return 0 if self.df is None else len(self.df)
+
+    def max_offset(self):
+        return max(0, self.total() - self.page_size)
+
+    def yview(self, *args):
+        if "moveto" == args[0]:
+            offset = int(float(args[1]) * self.total())
+        elif "scroll" == args[0]:
+            step = int(args[1])
+            offset = self.offset + (step * self.page_size if "pages" == args[2] else step)
+        else:
+            return
+        self.move_to(offset)
+
+    def on_mouse_wheel(self, event):
+        # Windows は120単位、macOS は1単位で delta が来る
+        delta = event.delta if abs(event.delta) < 120 else event.delta // 120
+        return self.scroll(-3 * delta)
+
+    def scroll(self, step):
+        self.move_to(self.offset + step)
+        return "break"
+
+    def move_to(self, offset):
+        offset = min(max(0, offset), self.max_offset())
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def on_select(self, event=None):
+        # マウスで選択した行を DataFrame 上の位置で覚える（再描画で選択が消えた時のイベントは無視する）
+        selection = self.tree.selection()
+        if selection:
+            self.selected = self.offset + self.tree.index(selection[0])
+
+    def move_selection(self, step):
+        if self.selected is None:
+            return self.select_row(self.offset)
+        return self.select_row(self.selected + step)
+
+    def select_row(self, index):
+        total = self.total()
+        if not total:
+            return "break"
+        self.selected = min(max(0, index), total - 1)
+        # 選択行が表示範囲に入るように表示開始位置を動かす
+        if self.selected < self.offset:
+            self.offset = self.selected
+        elif self.selected >= self.offset + self.page_size:
+            self.offset = min(self.selected - self.page_size + 1, self.max_offset())
+        self.render()
+        return "break"
+
+    def render(self):
+        total = self.total()
+        end = min(total, self.offset + self.page_size)
+        cache_end = self.cache_start + len(self.cache_rows)
+        if not (self.cache_start <= self.offset and end <= cache_end):
+            # 表示範囲がキャッシュ外であれば前後のバッファを含めて再整形する
+            self.cache_start = max(0, self.offset - self.buffer_size)
+            cache_end = min(total, end + self.buffer_size)
+            self.cache_rows, self.cache_tags = self.formatter(self.df.iloc[self.cache_start:cache_end])
+        self.tree.delete(*self.tree.get_children())
+        for i in range(self.offset - self.cache_start, end - self.cache_start):
+            self.tree.insert("", "end", values=self.cache_rows[i], tags=(self.cache_tags[i],))
+        if self.selected is not None and self.offset <= self.selected < end:
+            item = self.tree.get_children()[self.selected - self.offset]
+            self.tree.selection_set(item)
+            self.tree.focus(item)
+        if total:
+            self.scrollbar.set(self.offset / total, end / total)
+        else:
+            self.scrollbar.set(0, 1)
 
 
 class GUI:
@@ -1779,7 +2245,9 @@ class GUI:
         self.root = root
         self.base_frame = None
         self.previous_selection = None
-        self.original_data = []  # TreeViewの元のデータを保持するリスト
+        self.original_df = None  # TreeViewの元のデータ（未整形のDataFrame）を参照するだけで複製しない
+        self.scrollbars = {}  # frame_number -> 垂直スクロールバー
+        self.virtual_views = {}  # frame_number -> VirtualTreeview
         self.params = None
         self.columns = None
         self.amount_df = None
@@ -1841,6 +2309,8 @@ class GUI:
         self.TRACE = 1 == params["TRACE"]
         self.file_path = params["e-tax_file_path"]
         self.lang = params["lang"]
+        self.virtual_treeview = 1 == params.get("virtual_treeview", 1)
+        self.virtual_buffer = params.get("virtual_buffer", 74)
 
     def debug_print(self, message):
         if self.DEBUG:
@@ -1902,6 +2372,7 @@ class GUI:
             self.view_button.config(text="View Data")
             self.toggle_column_button.config(text="Toggle Code Columns")
             self.save_button.config(text="Save CSV")
+            self.profile_button.config(text="Profile")
             self.toggle_language_button.config(text="日本語/English")
         else:
             self.show_button.config(text="表示")
@@ -1926,6 +2397,7 @@ class GUI:
             self.view_button.config(text="データ参照")
             self.toggle_column_button.config(text="コード列の表示/非表示")
             self.save_button.config(text="CSV保存")
+            self.profile_button.config(text="処理時間")
             self.toggle_language_button.config(text="日本語/English")
         self.update_tree_headings()
 
@@ -2003,8 +2475,7 @@ class GUI:
 
     def show_month(self):
         self.month_title.config(fg="black")
-        summary_df = tidy_data.get_summary_df()
-        months = sorted(summary_df["Month"].unique())
+        months = tidy_data.get_months()
         self.month_combobox["values"] = [""] + months
         self.month_combobox.configure(style="TCombobox")
 
@@ -2023,16 +2494,22 @@ class GUI:
     def search_keyword(self):
         ExecutionMessage.start(root, self.search_keyword_body, None)
 
-    def search_keyword_body(self):
-        def filter_data(original_data, search_term, columns_to_search):
-            """
-            指定されたカラムに基づいてデータをフィルタリングする関数
-            """
-            filtered_data = []
-            for row in original_data:
-                if any(pd.notna(row[col]) and search_term in row[col].lower() for col in columns_to_search):
-                    filtered_data.append(row)
-            return filtered_data
+    def filter_original(self, search_terms, columns_to_search, frame_number):
+        """
+        指定された列位置に基づいて元のDataFrameを列単位でフィルタリングする関数
+        """
+        df = self.original_df
+        display_columns = self.display_columns(frame_number)
+        mask = pd.Series(False, index=df.index)
+        for col in columns_to_search:
+            # Treeview に表示される文字列（format_frame と同じ整形）で照合する
+            text = pd.Series(self.format_column(df, *display_columns[col]), index=df.index).fillna("").astype(str).str.lower()
+            for search_term in search_terms:
+                if search_term:
+                    mask |= text.str.contains(search_term.lower(), regex=False)
+        return df[mask]
+
+    def search_keyword_body(self, event=None):
         search_term = self.search_entry.get().lower()
         frame_number = self.frame_number
         if 0 == frame_number:
@@ -2103,12 +2580,11 @@ class GUI:
         else:
             return
         # 共通関数を呼び出してフィルタリング
-        filtered_data = filter_data(self.original_data, search_term, columns_to_search)
-        filtered_data = filtered_data.drop_duplicates().reset_index(drop=True)
-        for i in result_tree.get_children():
-            result_tree.delete(i)
-        for row in filtered_data:
-            result_tree.insert("", "end", values=self.format_searched_row(row, frame_number))
+        if self.original_df is None:
+            ExecutionMessage.end()
+            return
+        filtered_df = self.filter_original([search_term], columns_to_search, frame_number)
+        self.display_data(filtered_df, result_tree, frame_number)
         ExecutionMessage.end()
 
     def reset_search(self):
@@ -2119,12 +2595,9 @@ class GUI:
             result_tree = self.result_tree1
         else:
             return
-        # TreeViewの内容をクリア
-        for item in result_tree.get_children():
-            result_tree.delete(item)
-        # self.original_dataからデータを挿入
-        for row in self.original_data:
-            result_tree.insert("", "end", values=row)
+        # self.original_dfからデータを再表示
+        if self.original_df is not None:
+            self.display_data(self.original_df, result_tree, frame_number)
 
     def view_data(self, event=None):
         frame_number = self.frame_number
@@ -2192,6 +2665,55 @@ class GUI:
                 else:
                     messagebox.showerror("エラー", f"保存に失敗しました: {str(e)}")
 
+    def show_profile(self):
+        """ 処理段階ごとの計測結果を表示するウィンドウ """
+        window = tk.Toplevel(self.root)
+        window.title("Profile" if self.lang == "en" else "処理時間")
+        columns = ("stage", "wall_time", "cpu_time", "peak_memory_mb", "rows")
+        tree = ttk.Treeview(window, columns=columns, show="headings", height=16)
+        headings = {
+            "stage": "Stage" if self.lang == "en" else "処理段階",
+            "wall_time": "Wall (s)" if self.lang == "en" else "経過時間(秒)",
+            "cpu_time": "CPU (s)" if self.lang == "en" else "CPU時間(秒)",
+            "peak_memory_mb": "Peak (MB)" if self.lang == "en" else "ピークメモリ(MB)",
+            "rows": "Rows" if self.lang == "en" else "行数",
+        }
+        for col in columns:
+            tree.heading(col, text=headings[col])
+            tree.column(col, width=self.width_longname if "stage" == col else self.width_amount, anchor="w" if "stage" == col else "e", stretch=tk.NO)
+        for record in stage_profiler.records:
+            tree.insert("", "end", values=tuple("" if record.get(col) is None else record.get(col) for col in columns))
+        tree.grid(row=0, column=0, columnspan=5, sticky="nsew", padx=4, pady=4)
+        scrollbar = ttk.Scrollbar(window, orient=tk.VERTICAL, command=tree.yview)
+        scrollbar.grid(row=0, column=5, sticky="ns")
+        tree.configure(yscrollcommand=scrollbar.set)
+
+        def export(kind):
+            file_path = filedialog.asksaveasfilename(defaultextension=f".{kind}", filetypes=[(f"{kind.upper()} files", f"*.{kind}")])
+            if not file_path:
+                return
+            if "json" == kind:
+                stage_profiler.export_json(file_path)
+            else:
+                stage_profiler.export_csv(file_path)
+            log_tracker.write_log_text(f"Profile saved to {file_path}" if self.lang == "en" else f"処理時間を {file_path} に保存")
+
+        def set_cprofile_stage():
+            stage = stage_combobox.get()
+            stage_profiler.cprofile_stage = stage or None
+            if self.lang == "en":
+                messagebox.showinfo("Profile", f"cProfile will be saved the next time '{stage}' runs." if stage else "cProfile disabled.")
+            else:
+                messagebox.showinfo("処理時間", f"次回 '{stage}' 実行時に cProfile を保存します。" if stage else "cProfile を無効にしました。")
+
+        tk.Button(window, text="JSON", command=lambda: export("json")).grid(row=1, column=0, padx=4, pady=4, sticky="ew")
+        tk.Button(window, text="CSV", command=lambda: export("csv")).grid(row=1, column=1, padx=4, pady=4, sticky="ew")
+        stages = sorted({record["stage"] for record in stage_profiler.records})
+        stage_combobox = ttk.Combobox(window, values=[""] + stages, width=24)
+        stage_combobox.set(stage_profiler.cprofile_stage or "")
+        stage_combobox.grid(row=1, column=2, columnspan=2, padx=4, pady=4, sticky="ew")
+        tk.Button(window, text="cProfile", command=set_cprofile_stage).grid(row=1, column=4, padx=4, pady=4, sticky="ew")
+
     def on_combobox_select(self, event=None):
         selected_option = self.combobox.get()
         log_tracker.write_log_text(selected_option)
@@ -2234,111 +2756,116 @@ class GUI:
         # self.base_frameの幅と高さをrootのサイズに合わせる
         self.base_frame.config(width=root_width, height=root_height)
 
-    def insert_data(self, filtered_df, result_tree, frame_number):
+    @profile_stage("insert_data", rows=lambda self, filtered_df, *args: len(filtered_df))
+    def insert_data(self, filtered_df, result_tree, frame_number, formatted=None):
+        # 検索・検索解除用に元のDataFrameを参照として保持する（整形済みの複製は持たない）
+        self.original_df = filtered_df
+        self.display_data(filtered_df, result_tree, frame_number, formatted)
+
+    def display_data(self, df, result_tree, frame_number, formatted=None):
         # 複数タグを設定
         result_tree.tag_configure("emphasis", background="gray", foreground="white")
         result_tree.tag_configure("normal", background="white", foreground="black")
-        self.original_data = []
-        for index, row in filtered_df.iterrows():
-            # フォーマット済みのデータを取得
-            formatted_row = self.format_row(row, frame_number)
+        if self.virtual_treeview:
+            # 表示範囲とバッファだけを整形・挿入する仮想表示
+            view = self.virtual_views.get(frame_number)
+            if view is None:
+                view = VirtualTreeview(
+                    result_tree,
+                    self.scrollbars[frame_number],
+                    lambda df_slice: self.format_frame(df_slice, frame_number),
+                    page_size=int(result_tree.cget("height")),
+                    buffer_size=self.virtual_buffer
+                )
+                self.virtual_views[frame_number] = view
+            view.set_data(df)
+            return
+        result_tree.delete(*result_tree.get_children())
+        # formatted: ワーカースレッドで整形済みの (rows, tags)
+        rows, tags = formatted if formatted is not None else self.format_frame(df, frame_number)
+        for i, (formatted_row, tag) in enumerate(zip(rows, tags)):
             # TreeView にデータを挿入
-            tag = "normal"
-            if "Description" in row and "* "==row["Description"][:2]:
-                tag = "emphasis"   
             result_tree.insert("", "end", values=formatted_row, tags=(tag,))
-            # フォーマット済みのデータを保存
-            self.original_data.append(formatted_row)
             # レスポンス性を維持するための更新処理
-            if index % 100 == 0:
+            if i % 100 == 0:
                 result_tree.update_idletasks()  # Update the GUI to keep it responsive
 
     def show_results(self, frame_number, event=None):
         """ 処理を開始し、メッセージウィンドウを表示 """
-        # メッセージウィンドウを表示
-        ExecutionMessage.start(root, self.show_results_body, frame_number)
-
-    def show_results_body(self, frame_number, event=None):
+        # ウィジェットの値はメインスレッドで読み、表示データの作成はワーカースレッドで行う
+        selected_month = self.month_combobox.get()
+        selected_account = self.account_combobox.get()
         if self.lang == "en":
             log_tracker.write_log_text(f"START {self.menu[frame_number]}")
         else:
             log_tracker.write_log_text(f"{self.menu[frame_number]} 開始")
-        self.columns = tidy_data.get_columns()
+        ExecutionMessage.run(
+            root,
+            lambda progress, cancel_event: self.select_results(frame_number, selected_month, selected_account),
+            lambda result: self.show_results_body(frame_number, result),
+            lang=self.lang,
+        )
+
+    def select_results(self, frame_number, selected_month, selected_account):
+        """
+        ワーカースレッドで表示する DataFrame を取り出す（Tk は呼ばない）。
+        仮想表示でない場合は全行の整形もここで済ませる。
+        GUI の状態（self.columns, self.account_dict）はここでは書き換えず、
+        結果として返してメインスレッドの show_results_body で設定する。
+        :return: (filtered_df, 整形済みの (rows, tags) または None, 警告メッセージ (en, ja) または None,
+                  (columns, account_dict))
+        """
+        columns = tidy_data.get_columns()
+        account_dict = self.account_dict
         if 0 == frame_number: # Journal Entry
-            selected_month = self.month_combobox.get()
-            amount_rows = tidy_data.get_amount_rows()
-            self.amount_df = pd.DataFrame(amount_rows).copy()
-            result_tree = self.result_tree0
-            if selected_month:
-                target_month = pd.Period(selected_month)
-                filtered_df = self.amount_df[self.amount_df['Month'] == str(target_month)].copy()
-            else:
-                filtered_df = self.amount_df.copy()
+            filtered_df = tidy_data.get_journal(str(pd.Period(selected_month)) if selected_month else None)
             if filtered_df.empty:
-                if self.lang == "en":
-                    messagebox.showwarning("Warning", "No data found.")
-                else:
-                    messagebox.showwarning("警告", "データが見つかりません。")
-                return
+                return None, None, ("No data found.", "データが見つかりません。"), (columns, account_dict)
         elif 1 == frame_number: # General Ledger
-            selected_account = self.account_combobox.get()
-            selected_month = self.month_combobox.get()
-            account_dict = self.account_dict = tidy_data.get_account_dict()
-            self.general_ledger_df = tidy_data.get_general_ledger_df().copy()
-            # Transaction_Date列をdatetime型に変換してTransaction_Date_dtの列に保存
-            self.general_ledger_df['Transaction_Date_dt'] = pd.to_datetime(self.general_ledger_df['Transaction_Date'])
-            # Transaction_Date列をYYYY-MM形式に変換してTransaction_Monthの列に保存
-            self.general_ledger_df['Transaction_Month'] = self.general_ledger_df['Transaction_Date_dt'].dt.to_period('M').astype(str)
-            result_tree = self.result_tree1
-            if selected_month:
-                filtered_df = self.general_ledger_df[self.general_ledger_df['Transaction_Month'] == selected_month].copy()
-            else:
-                filtered_df = self.general_ledger_df.copy()
+            account_dict = tidy_data.get_account_dict()
             if selected_account:
+                # 科目・月ごとに作成済みのビューから連続範囲を取り出す
                 account_number = next((v for k, v in account_dict.items() if selected_account in k.split(' ', 1)[1]), None)
-                if account_number:
-                    filtered_df = filtered_df[filtered_df["Ledger_Account_Number"] == account_number]
+                filtered_df = tidy_data.get_general_ledger(account_number, selected_month)
             else:
-                if self.lang == "en":
-                    messagebox.showwarning("Warning", "Please select an account name.")
-                else:
-                    messagebox.showwarning("警告", "科目名を選択してください。")
-                return
+                return None, None, ("Please select an account name.", "科目名を選択してください。"), (columns, account_dict)
             if filtered_df.empty:
-                if self.lang == "en":
-                    messagebox.showwarning("Warning", "No data found.")
-                else:
-                    messagebox.showwarning("警告", "データが見つかりません。")
-                return
+                return None, None, ("No data found.", "データが見つかりません。"), (columns, account_dict)
         elif 2 == frame_number: # Trial Balance
-            selected_month = self.month_combobox.get()
             if not selected_month:
-                if self.lang == "en":
-                    messagebox.showwarning("Warning", "Please select a target month.")
-                else:
-                    messagebox.showwarning("警告", "対象月を選択してください。")
-                return
+                return None, None, ("Please select a target month.", "対象月を選択してください。"), (columns, account_dict)
             target_month = pd.Period(selected_month)
-            self.summary_df = tidy_data.get_summary_df().copy()
-            filtered_df = self.summary_df[self.summary_df['Month'] == str(target_month)]
-            result_tree = self.result_tree2
+            filtered_df = tidy_data.get_summary(str(target_month))
         elif 3 == frame_number:  # Balance Sheet (BS)
-            result_tree = self.result_tree3
             # Convert dictionary to DataFrame
             filtered_df = pd.DataFrame.from_dict(tidy_data.bs_dict, orient='index').reset_index()
         elif 4 == frame_number:  # Profit and Loss (PL)
-            result_tree = self.result_tree4
             # Convert dictionary to DataFrame
             filtered_df = pd.DataFrame.from_dict(tidy_data.pl_dict, orient='index').reset_index()
+        formatted = None if self.virtual_treeview else self.format_frame(filtered_df, frame_number, columns)
+        return filtered_df, formatted, None, (columns, account_dict)
+
+    def show_results_body(self, frame_number, result):
+        """ メインスレッド: select_results の結果を Treeview に挿入する """
+        filtered_df, formatted, warning, (columns, account_dict) = result
+        # Tk が参照する状態はメインスレッドでだけ書き換える
+        self.columns = columns
+        self.account_dict = account_dict
+        if warning:
+            if self.lang == "en":
+                messagebox.showwarning("Warning", warning[0])
+            else:
+                messagebox.showwarning("警告", warning[1])
+            return
+        result_tree = [self.result_tree0, self.result_tree1, self.result_tree2, self.result_tree3, self.result_tree4][frame_number]
         # Treeviewの行削除
         for i in result_tree.get_children():
             result_tree.delete(i)
-        self.insert_data(filtered_df, result_tree, frame_number)
+        self.insert_data(filtered_df, result_tree, frame_number, formatted)
         if self.lang == "en":
             log_tracker.write_log_text(f"END {self.menu[frame_number]} listing")
         else:
             log_tracker.write_log_text(f"{self.menu[frame_number]} 表示終了")
-        ExecutionMessage.end()
 
     def update_tree_headings(self):
         if 0 == self.frame_number:
@@ -2512,230 +3039,133 @@ class GUI:
         for col, text in headings.items():
             tree.heading(col, text=text)
 
-    def format_searched_row(self, row, frame_number):
-        if 0 == frame_number:
-            formatted_row = (
-                row[0], # 伝票
-                row[1], # 明細行
-                row[2], # 伝票日付
-                row[3], # 伝票番号
-                row[4], # 摘要文
-                # 借方
-                row[5], # 借方科目コード
-                row[6], # 借方科目名
-                (#'Debit_Amount'
-                    f"{row[7]:,.0f}" if pd.notna(row[7]) and pd.notna(row[7]) and row[6] != 0 and isinstance(row[7], (int, float)) else row[7]
-                ),
-                row[8], # 借方税区分コード
-                row[9], # 借方税区分名
-                (# 借方消費税額
-                    f"{row[10]:,.0f}" if pd.notna(row[10]) and pd.notna(row[10]) and row[10] != 0 and isinstance(row[10], (int, float)) else row[10]
-                ),                # 貸方
-                row[11], # 貸方科目コード
-                row[12], # 貸方科目名
-                (# 'Credit_Amount'
-                    f"{row[13]:,.0f}" if pd.notna(row[13]) and pd.notna(row[13]) and row[13] != 0 and isinstance(row[13], (int, float)) else row[13]
-                ),
-                row[14], # 貸方税区分コード
-                row[15], # 貸方税区分名
-                (# 貸方消費税額
-                    f"{row[16]:,.0f}" if pd.notna(row[16]) and pd.notna(row[16]) and row[16] != 0 and isinstance(row[16], (int, float)) else row[16]
-                ),
-                row[17], # 借方補助科目コード
-                row[18], # 借方補助科目名
-                row[19], # 借方部門コード
-                row[20], # 借方部門名
-                row[21], # 貸方補助科目コード
-                row[22], # 貸方補助科目名
-                row[23], # 貸方部門コード
-                row[24], # 貸方部門名
-            )
-        elif 1 == frame_number:
-            formatted_row = (
-                row[0], # Transaction_Date  # オリジナルの日付列を使用
-                row[1], # Description
-                ( # 'Debit_Amount'
-                    f"{row[2]:,.0f}" if pd.notna(row[2]) and row[2] != 0 and isinstance(row[2], (int, float)) else row[2]
-                ),
-                ( # 'Credit_Amount'
-                    f"{row[3]:,.0f}" if pd.notna(row[3]) and row[3] != 0 and isinstance(row[3], (int, float)) else row[3]
-                ),
-                ( # 'Balance'
-                    f"{row[4]:,.0f}" if pd.notna(row[4]) and row[4] != 0 and isinstance(row[4], (int, float)) else row[4]
-                ),
-                row[5], # Counterpart_Account_Number
-                row[6], # Counterpart_Account_Name
-                row[7], # Subaccount_Code
-                row[8], # Subaccount_Name
-                row[9], # Department_Code
-                row[10], # Department_Name
-                row[11], # Counterpart_Subaccount_Code
-                row[12], # Counterpart_Subaccount_Name
-                row[13], # Counterpart_Department_Code
-            )
-        elif 2 == frame_number:
-            formatted_row = (
-                row[0], # Month
-                row[1], # Ledger_Account_Number
-                row[2], # Ledger_Account_Name
-                row[3], # e-Tax Category
-                ( # 'Beginning_Balance'
-                    f"{row[4]:,.0f}" if pd.notna(row[4]) and row[4] != 0 and isinstance(row[4], (int, float)) else row[4]
-                ),
-                ( # 'Debit_Amount'
-                    f"{row[5]:,.0f}" if pd.notna(row[5]) and row[5] != 0 and isinstance(row[5], (int, float)) else row[5]
-                ),
-                ( # 'Credit_Amount'
-                    f"{row[6]:,.0f}" if pd.notna(row[6]) and row[6] != 0 and isinstance(row[6], (int, float)) else row[6]
-                ),
-                ( # 'Ending_Balance'
-                    f"{float(row[7]):,.0f}" if pd.notna(row[7]) and row[7] != 0 and isinstance(row[7], (int, float)) else row[7]
-                )
-            )
-        else:
-            formatted_row = row
-        return formatted_row
-
-    def format_row(self, row, frame_number):
+    def display_columns(self, frame_number, columns=None):
+        """
+        Treeview の列順に対応する (DataFrameの列名, 金額として整形するか, 金額表示の条件列)
+        columns: ワーカースレッドから呼ぶときの列名辞書（省略時は self.columns）
+        """
+        if columns is None:
+            columns = self.columns
         if 0 == frame_number: # Journal Entry
-            formatted_row = (
-                # 0 ~ 3
-                row[self.columns["伝票"]],
-                row[self.columns["明細行"]],
-                row[self.columns["伝票日付"]],
-                row[self.columns["伝票番号"]],
-                row[self.columns["摘要文"]],
-                # 借方 4 ~ 9
-                row[self.columns["借方科目コード"]],
-                row[self.columns["借方科目名"]],
-                (
-                    f"{row['Debit_Amount']:,.0f}"
-                    if pd.notna(row[self.columns["借方科目コード"]])
-                    and pd.notna(row["Debit_Amount"])
-                    and row["Debit_Amount"] != 0
-                    else ""
-                ),
-                row[self.columns["借方税区分コード"]],
-                row[self.columns["借方税区分名"]],
-                row[self.columns["借方消費税額"]],
-                # 貸方 10 ~ 15
-                row[self.columns["貸方科目コード"]],
-                row[self.columns["貸方科目名"]],
-                (
-                    f"{row['Credit_Amount']:,.0f}"
-                    if pd.notna(row[self.columns["貸方科目コード"]])
-                    and pd.notna(row["Credit_Amount"])
-                    and row["Credit_Amount"] != 0
-                    else ""
-                ),
-                row[self.columns["貸方税区分コード"]],
-                row[self.columns["貸方税区分名"]],
-                row[self.columns["貸方消費税額"]],
-                # 16 ~ 19
-                row[self.columns["借方補助科目コード"]],
-                row[self.columns["借方補助科目名"]],
-                row[self.columns["借方部門コード"]],
-                row[self.columns["借方部門名"]],
-                # 20 ~ 23
-                row[self.columns["貸方補助科目コード"]],
-                row[self.columns["貸方補助科目名"]],
-                row[self.columns["貸方部門コード"]],
-                row[self.columns["貸方部門名"]],
-            )
+            return [
+                # 0 ~ 4
+                (columns["伝票"], False, None),
+                (columns["明細行"], False, None),
+                (columns["伝票日付"], False, None),
+                (columns["伝票番号"], False, None),
+                (columns["摘要文"], False, None),
+                # 借方 5 ~ 10
+                (columns["借方科目コード"], False, None),
+                (columns["借方科目名"], False, None),
+                ("Debit_Amount", True, columns["借方科目コード"]),
+                (columns["借方税区分コード"], False, None),
+                (columns["借方税区分名"], False, None),
+                (columns["借方消費税額"], False, None),
+                # 貸方 11 ~ 16
+                (columns["貸方科目コード"], False, None),
+                (columns["貸方科目名"], False, None),
+                ("Credit_Amount", True, columns["貸方科目コード"]),
+                (columns["貸方税区分コード"], False, None),
+                (columns["貸方税区分名"], False, None),
+                (columns["貸方消費税額"], False, None),
+                # 17 ~ 20
+                (columns["借方補助科目コード"], False, None),
+                (columns["借方補助科目名"], False, None),
+                (columns["借方部門コード"], False, None),
+                (columns["借方部門名"], False, None),
+                # 21 ~ 24
+                (columns["貸方補助科目コード"], False, None),
+                (columns["貸方補助科目名"], False, None),
+                (columns["貸方部門コード"], False, None),
+                (columns["貸方部門名"], False, None),
+            ]
         elif 1 == frame_number: # General Ledger
-            formatted_row = (
+            return [
                 # 0 ~ 4
-                row["Transaction_Date"],  # オリジナルの日付列を使用
-                row["Description"],
-                (
-                    f"{row['Debit_Amount']:,.0f}"
-                    if pd.notna(row["Debit_Amount"])
-                    and row["Debit_Amount"] != 0
-                    else ""
-                ),
-                (
-                    f"{row['Credit_Amount']:,.0f}"
-                    if pd.notna(row["Credit_Amount"])
-                    and row["Credit_Amount"] != 0
-                    else ""
-                ),
-                (
-                    f"{row['Balance']:,.0f}"
-                    if pd.notna(row["Balance"]) and row["Balance"] != 0
-                    else ""
-                ),
+                ("Transaction_Date", False, None),  # オリジナルの日付列を使用
+                ("Description", False, None),
+                ("Debit_Amount", True, None),
+                ("Credit_Amount", True, None),
+                ("Balance", True, None),
                 # 5 ~ 14
-                row["Counterpart_Account_Number"],
-                row["Counterpart_Account_Name"],
-                row["Subaccount_Code"],
-                row["Subaccount_Name"],
-                row["Department_Code"],
-                row["Department_Name"],
-                row["Counterpart_Subaccount_Code"],
-                row["Counterpart_Subaccount_Name"],
-                row["Counterpart_Department_Code"],
-                row["Counterpart_Department_Name"],
-            )
+                ("Counterpart_Account_Number", False, None),
+                ("Counterpart_Account_Name", False, None),
+                ("Subaccount_Code", False, None),
+                ("Subaccount_Name", False, None),
+                ("Department_Code", False, None),
+                ("Department_Name", False, None),
+                ("Counterpart_Subaccount_Code", False, None),
+                ("Counterpart_Subaccount_Name", False, None),
+                ("Counterpart_Department_Code", False, None),
+                ("Counterpart_Department_Name", False, None),
+            ]
         elif 2 == frame_number: # Trial Balance
-            formatted_row = (
-                row["Month"],
-                row["Ledger_Account_Number"],
-                row["Ledger_Account_Name"],
-                row["eTax_Category"],
-                f"{row['Beginning_Balance']:,.0f}"
-                if pd.notna(row["Beginning_Balance"]) and row["Beginning_Balance"] != 0
-                else "",
-                f"{row['Debit_Amount']:,.0f}"
-                if pd.notna(row["Debit_Amount"]) and row["Debit_Amount"] != 0
-                else "",
-                f"{row['Credit_Amount']:,.0f}"
-                if pd.notna(row["Credit_Amount"]) and row["Credit_Amount"] != 0
-                else "",
-                f"{row['Ending_Balance']:,.0f}"
-                if pd.notna(row["Ending_Balance"]) and row["Ending_Balance"] != 0
-                else "",
-            )
+            return [
+                ("Month", False, None),
+                ("Ledger_Account_Number", False, None),
+                ("Ledger_Account_Name", False, None),
+                ("eTax_Category", False, None),
+                ("Beginning_Balance", True, None),
+                ("Debit_Amount", True, None),
+                ("Credit_Amount", True, None),
+                ("Ending_Balance", True, None),
+            ]
         elif 3 == frame_number:  # Balance Sheet
-            formatted_row = (
-                row["seq"],
-                row["Level"],
-                row["Ledger_Account_Number"],
-                row["eTax_Account_Name"],
-                row["eTax_Category"],
-                f"{row['Beginning_Balance']:,.0f}"
-                if pd.notna(row["Beginning_Balance"]) and row["Beginning_Balance"] != 0
-                else "",
-                f"{row['Total_Debit']:,.0f}"
-                if pd.notna(row["Total_Debit"]) and row["Total_Debit"] != 0
-                else "",
-                f"{row['Total_Credit']:,.0f}"
-                if pd.notna(row["Total_Credit"]) and row["Total_Credit"] != 0
-                else "",
-                f"{row['Ending_Balance']:,.0f}"
-                if pd.notna(row["Ending_Balance"]) and row["Ending_Balance"] != 0
-                else "",
-            )
+            return [
+                ("seq", False, None),
+                ("Level", False, None),
+                ("Ledger_Account_Number", False, None),
+                ("eTax_Account_Name", False, None),
+                ("eTax_Category", False, None),
+                ("Beginning_Balance", True, None),
+                ("Total_Debit", True, None),
+                ("Total_Credit", True, None),
+                ("Ending_Balance", True, None),
+            ]
         elif 4 == frame_number:  # Profit and Loss
-            formatted_row = (
-                row["seq"],
-                row["Level"],
-                row["Ledger_Account_Number"],
-                row["eTax_Account_Name"],
-                row["eTax_Category"],
-                # f"{row['Beginning_Balance']:,.0f}"
-                # if pd.notna(row["Beginning_Balance"]) and row["Beginning_Balance"] != 0
-                # else "",
-                f"{row['Total_Debit']:,.0f}"
-                if pd.notna(row["Total_Debit"]) and row["Total_Debit"] != 0
-                else "",
-                f"{row['Total_Credit']:,.0f}"
-                if pd.notna(row["Total_Credit"]) and row["Total_Credit"] != 0
-                else "",
-                f"{row['Ending_Balance']:,.0f}"
-                if pd.notna(row["Ending_Balance"]) and row["Ending_Balance"] != 0
-                else "",
-            )
-        return formatted_row
+            return [
+                ("seq", False, None),
+                ("Level", False, None),
+                ("Ledger_Account_Number", False, None),
+                ("eTax_Account_Name", False, None),
+                ("eTax_Category", False, None),
+                # ("Beginning_Balance", True, None),
+                ("Total_Debit", True, None),
+                ("Total_Credit", True, None),
+                ("Ending_Balance", True, None),
+            ]
+        return []
+
+    def format_frame(self, df, frame_number, columns=None):
+        """
+        DataFrame を列単位でまとめて整形し、Treeview に挿入する行とタグのリストを返す
+        金額列は 0 と NaN を空文字に、それ以外を3桁区切りにする
+        """
+        values = [
+            self.format_column(df, column, is_amount, condition)
+            for column, is_amount, condition in self.display_columns(frame_number, columns)
+        ]
+        rows = list(zip(*values))
+        if "Description" in df.columns:
+            tags = np.where(df["Description"].astype(str).str[:2] == "* ", "emphasis", "normal").tolist()
+        else:
+            tags = ["normal"] * len(rows)
+        return rows, tags
+
+    def format_column(self, df, column, is_amount, condition):
+        """
+        1 列分の表示値の配列を返す（format_frame と検索 filter_original で共用）
+        """
+        series = df[column]
+        if not is_amount:
+            return series.to_numpy(dtype=object)
+        amounts = pd.to_numeric(series, errors="coerce")
+        mask = amounts.notna() & (amounts != 0)
+        if condition:
+            mask &= df[condition].notna()
+        text = np.full(len(series), "", dtype=object)
+        text[mask.to_numpy()] = [f"{amount:,.0f}" for amount in amounts[mask].to_numpy()]
+        return text
 
     def toggle_column(self):
         frame_number = self.frame_number
@@ -2917,6 +3347,7 @@ class GUI:
         # 垂直スクロールバーの作成と配置
         scrollbar0y = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
         scrollbar0y.grid(row=0, column=1, sticky="ns")
+        self.scrollbars[0] = scrollbar0y
         # Treeview にスクロールバーを関連付け
         tree.configure(xscrollcommand=scrollbar0x.set, yscrollcommand=scrollbar0y.set)
         # double click
@@ -2989,6 +3420,7 @@ class GUI:
         # 垂直スクロールバーの作成と配置
         scrollbar1y = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
         scrollbar1y.grid(row=0, column=1, sticky="ns")
+        self.scrollbars[1] = scrollbar1y
         # Treeview にスクロールバーを関連付け
         tree.configure(xscrollcommand=scrollbar1x.set, yscrollcommand=scrollbar1y.set)
         # double click
@@ -3037,6 +3469,7 @@ class GUI:
         # 垂直スクロールバーの作成と配置
         scrollbar2y = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
         scrollbar2y.grid(row=0, column=1, sticky="ns")
+        self.scrollbars[2] = scrollbar2y
         # Treeview にスクロールバーを関連付け
         tree.configure(yscrollcommand=scrollbar2y.set)
 
@@ -3086,6 +3519,7 @@ class GUI:
         # 垂直スクロールバーの作成と配置
         scrollbar3y = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
         scrollbar3y.grid(row=0, column=1, sticky="ns")
+        self.scrollbars[3] = scrollbar3y
         # Treeview にスクロールバーを関連付け
         tree.configure(yscrollcommand=scrollbar3y.set)
 
@@ -3135,6 +3569,7 @@ class GUI:
         # 垂直スクロールバーの作成と配置
         scrollbar4y = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
         scrollbar4y.grid(row=0, column=1, sticky="ns")
+        self.scrollbars[4] = scrollbar4y
         # Treeview にスクロールバーを関連付け
         tree.configure(yscrollcommand=scrollbar4y.set)
 
@@ -3274,16 +3709,6 @@ class GUI:
             ExecutionMessage.start(root, search_trading_partner_body, name, alias1, alias2)
 
         def search_trading_partner_body(name, alias1, alias2):
-            def filter_data(original_data, search_terms, columns_to_search):
-                """
-                指定されたカラムに基づいてデータをフィルタリングする関数
-                """
-                filtered_data = []
-                for row in original_data:
-                    for search_term in search_terms:
-                        if search_term and any(pd.notna(row[col]) and search_term in row[col].lower() for col in columns_to_search):
-                            filtered_data.append(row)
-                return filtered_data
             search_terms = [name, alias1, alias2]
             frame_number = self.frame_number
             if 0 == frame_number:
@@ -3355,12 +3780,11 @@ class GUI:
             else:
                 return
             # 共通関数を呼び出してフィルタリング
-            filtered_data = filter_data(self.original_data, search_terms, columns_to_search)
-
-            for i in result_tree.get_children():
-                result_tree.delete(i)
-            for row in filtered_data:
-                result_tree.insert("", "end", values=self.format_searched_row(row, frame_number))
+            if self.original_df is None:
+                ExecutionMessage.end()
+                return
+            filtered_df = self.filter_original(search_terms, columns_to_search, frame_number)
+            self.display_data(filtered_df, result_tree, frame_number)
             ExecutionMessage.end()
 
         # ラジオボタンの作成
@@ -3406,6 +3830,9 @@ class GUI:
         # save csv
         self.save_button = tk.Button(search_frame, text="CSV保存", command=self.save_csv)
         self.save_button.pack(side="left", padx=4)
+        # profile
+        self.profile_button = tk.Button(search_frame, text="処理時間", command=self.show_profile)
+        self.profile_button.pack(side="left", padx=4)
         # toggle language
         self.toggle_language_button = tk.Button(search_frame, text="日本語/English", command=self.toggle_language)
         self.toggle_language_button.pack(side="left", padx=4)
@@ -3428,8 +3855,7 @@ class GUI:
         accounts = [key.split(" ", 1)[1] for key in account_dict.keys()]
         self.account_combobox["values"] = accounts
         # month combobox
-        self.summary_df = tidy_data.get_summary_df()
-        months = sorted(self.summary_df["Month"].unique())
+        months = tidy_data.get_months()
         self.month_combobox["values"] = [""] + months
         # show frame0
         self.show_frame(self.frame0, 0)
@@ -3443,12 +3869,35 @@ class GUI:
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("使用方法: python script.py <parameters.jsonのパス>")
-        sys.exit(1)
-    param_file_path = sys.argv[1]
+    parser = argparse.ArgumentParser(
+        description="Ledger Explorer. One parameters.json opens the GUI; --batch computes journal, "
+                    "general ledger, trial balance and BS/PL for every parameters file without the GUI."
+    )
+    parser.add_argument("param_files", nargs="+", help="parameters.json (one per entity with --batch)")
+    parser.add_argument("--batch", action="store_true", help="headless: write the results to --out-dir/<parameters file name>/")
+    parser.add_argument("--out-dir", default="ledger_output", help="output directory for --batch")
+    parser.add_argument("--format", default="csv", choices=BATCH_FORMATS, help="output format for --batch (parquet requires pyarrow)")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes for --batch (default: CPU count)")
+    args = parser.parse_args()
+
+    if args.batch:
+        start = time.perf_counter()
+        results = []
+        for result in run_batch(args.param_files, args.out_dir, args.format, args.workers):
+            results.append(result)
+            print(f"{result['status']:5} {result['seconds']:8.2f}s {result['param_file']} -> {result['out_dir']} {result['error']}")
+        failed = sum(1 for result in results if "ok" != result["status"])
+        summary_path = write_batch_summary(results, os.path.join(args.out_dir, "batch_summary.csv"))
+        print(f"{len(results)} entities, {failed} failed in {time.perf_counter() - start:.2f}s ({summary_path})", file=sys.stderr)
+        sys.exit(1 if failed else 0)
+
+    if len(args.param_files) != 1:
+        parser.error("GUI は parameters.json を 1 つだけ指定してください（複数の場合は --batch）")
+    param_file_path = args.param_files[0]
     # グローバル変数としてlog_trackerを定義
     log_tracker = LogTracker()
+    # 処理段階ごとの計測
+    stage_profiler = StageProfiler()
     # Initialize the GUI
     root = tk.Tk()
     gui = GUI(root)
@@ -52,61 +52,67 @@ class TidyData:
         if self.TRACE:
             print(message)
 
-    # Account_Codeを置き換え
-    def map_account_code(self, code, errors):
-        if pd.isna(code):
-            return code
-        try: # 小数の形式になっている場合は整数に変換
-            code = str(int(code))
-        except ValueError:
-            errors.append(f"Error: Account_Code {code} is not a valid integer.")
-            return code
-        if code in self.code_mapping_dict:
-            return self.code_mapping_dict[code]["eTax_Account_Code"]
-        else:
-            errors.append(f"Error: Account_Code {code} is not found in the mapping dictionary.")
-            return code  # 未対応のコードはそのまま返す
+    # Account_Code 列を一括で正規化（小数の形式 111.0 / "0111" は "111" に）。整数にできない値は NaN
+    def normalize_account_code(self, codes):
+        numeric = pd.to_numeric(codes, errors="coerce")
+        numeric = numeric.where(np.isfinite(numeric))
+        return np.trunc(numeric).astype("Int64").astype("string").astype(object).where(numeric.notna())
 
-    # Account_Name を置き換え
-    def map_account_name(self, code, errors):
-        if pd.isna(code):
-            return code
-        try: # 小数の形式になっている場合は整数に変換
-            code = str(int(code))
-        except ValueError:
-            errors.append(f"Error: Account_Code {code} is not a valid integer.")
-            return code
-        if code in self.code_mapping_dict:
-            if "en" == self.lang:
-                return self.code_mapping_dict[code]["English_Label"]
-            else:
-                return self.code_mapping_dict[code]["eTax_Account_Name"]
-        else:
-            # エラーをリストに追加
-            if code not in errors:  # 重複エラーを避ける
-                errors.append(f"Error: Account_Code {code} is not found in the mapping dictionary.")
-            return self.tidy_gl_df.loc[self.tidy_gl_df["Account_Code"] == code, 'Account_Name'].values[0]
+    # Account_Code -> eTax_Account_Code / 科目名、Tax_Code -> 税区分コード / 税区分名 の変換表
+    def mapping_tables(self):
+        account_table = self.account_list_df.drop_duplicates(subset="Account_Code", keep="last").set_index("Account_Code")
+        account_table = pd.DataFrame({
+            "code": account_table["eTax_Account_Code"],
+            "name": account_table["English_Label" if "en" == self.lang else "eTax_Account_Name"],
+        })
+        tax_table = self.tax_category_list_df.drop_duplicates(subset="Tax_Code", keep="last").set_index("Tax_Code")
+        tax_table = pd.DataFrame({
+            "code": tax_table["Tax_Category_Code"],
+            "name": tax_table["Tax_Category_Name_en" if "en" == self.lang else "Tax_Category_Name_ja"],
+        })
+        return account_table, tax_table
 
-    def map_tax_category_code(self, code, errors):
-        if pd.isna(code):
-            return code
-        if code in self.tax_category_mapping_dict:
-            return self.tax_category_mapping_dict[code]["Tax_Category_Code"]
-        else:
-            errors.append(f"Error: Tax_Code {code} is not found in the mapping dictionary.")
-            return code  # 未対応のコードはそのまま返す
+    def remap_codes(self, df):
+        """
+        借方・貸方の科目コード、科目名、税区分コード、税区分名を e-Tax のコードに列単位で置き換える。
+        借方・貸方の科目コードがどちらも空の行はそのまま。
+          科目コード: 変換表にあれば eTax_Account_Code、無ければ正規化したコード、整数でなければ元の値
+          科目名    : 変換表にあれば e-Tax の科目名、無ければ元の科目名、整数でなければ元のコード
+          税区分    : 変換表にあれば税区分コード / 名称、無ければ元のコード（名称もコード）
+        :return: (変換後の DataFrame, 変換できなかったコードの DataFrame [Column, Code, Error, Count])
+        """
+        account_table, tax_table = self.mapping_tables()
+        rows = df[self.columns["借方科目コード"]].notna() | df[self.columns["貸方科目コード"]].notna()
+        unmapped = []
+        for side in ["借方", "貸方"]:
+            code_column = self.columns[f"{side}科目コード"]
+            name_column = self.columns[f"{side}科目名"]
+            raw = df.loc[rows, code_column]
+            code = self.normalize_account_code(raw)
+            invalid = raw.notna() & code.isna()
+            found = code.isin(account_table.index)
+            missing = code.notna() & ~found
+            new_code = raw.astype(object).mask(code.notna(), code).mask(found, code.map(account_table["code"]))
+            new_name = raw.astype(object).mask(missing, df.loc[rows, name_column]).mask(found, code.map(account_table["name"]))
+            df[code_column] = df[code_column].astype(object)
+            df[name_column] = df[name_column].astype(object)
+            df.loc[rows, code_column] = new_code
+            df.loc[rows, name_column] = new_name
+            unmapped.append(pd.DataFrame({"Column": code_column, "Code": raw[invalid], "Error": "Account_Code is not a valid integer"}))
+            unmapped.append(pd.DataFrame({"Column": code_column, "Code": code[missing], "Error": "Account_Code is not found in the mapping dictionary"}))
 
-    def map_tax_category_name(self, code, errors):
-        if pd.isna(code):
-            return code
-        if code in self.tax_category_mapping_dict:
-            if "en" == self.lang:
-                return self.tax_category_mapping_dict[code]["Tax_Category_Name_en"]
-            else:
-                return self.tax_category_mapping_dict[code]["Tax_Category_Name_ja"]
-        else:
-            errors.append(f"Error: Tax_Code {code} is not found in the mapping dictionary.")
-            return code  # 未対応のコードはそのまま返す
+            tax_column = self.columns[f"{side}税区分コード"]
+            tax_name_column = self.columns[f"{side}税区分名"]
+            tax = df.loc[rows, tax_column]
+            found = tax.isin(tax_table.index)
+            df[tax_column] = df[tax_column].astype(object)
+            df[tax_name_column] = df[tax_name_column].astype(object)
+            df.loc[rows, tax_column] = tax.mask(found, tax.map(tax_table["code"]))
+            df.loc[rows, tax_name_column] = tax.mask(found, tax.map(tax_table["name"]))
+            unmapped.append(pd.DataFrame({"Column": tax_column, "Code": tax[tax.notna() & ~found], "Error": "Tax_Code is not found in the mapping dictionary"}))
+        unmapped = pd.concat(unmapped, ignore_index=True)
+        unmapped = unmapped.groupby(["Column", "Code", "Error"], sort=False).size().reset_index(name="Count")
+        return df, unmapped
 
     def beginning_balance(self):
         # beginning_balance_pathを読み込む
@@ -234,40 +240,13 @@ class TidyData:
         self.tidy_gl_df = pd.read_csv(self.file_path, dtype=dtype_dict)
         self.tidy_gl_df.columns = self.tidy_gl_df.columns.str.strip()  # 列名の空白を除去
         # tax_category.csv を読み込み、変換用の辞書を作成
-        tax_category_list_df = pd.read_csv(self.tax_category_path, dtype=str)
-        tax_category_list_df.columns = tax_category_list_df.columns.str.strip()  # 列名の空白を除去
-        # Account_Code をキーにして eTax_Account_Code と eTax_Account_Name を持つ辞書を作成
-        self.tax_category_mapping_dict = tax_category_list_df.set_index('Tax_Code')[['Dr_Cr', 'Tax_Name', "Tax_Category_Code", "Tax_Category_Name_ja", "Tax_Category_Name_en"]].to_dict('index')
-        # 対応先がない場合のエラーログリスト
-        errors = []
-        # 借方と貸方の科目コード及び税コードに対してコードのマッピングを適用
-        # 行ごとに繰り返し処理を行い、借方と貸方の科目コード、名称、借方税区分コード、借方税区分名をマッピング
-        def process_row(row):
-            debit_account_code = row[self.columns["借方科目コード"]]
-            credit_account_code = row[self.columns["貸方科目コード"]]
-            debit_tax_category_code = row[self.columns["借方税区分コード"]]
-            credit_tax_category_code = row[self.columns["貸方税区分コード"]]
-            if pd.isna(debit_account_code) and pd.isna(credit_account_code):
-                return row
-            else:
-                # 借方科目コードと名称の変換
-                row[self.columns["借方科目コード"]] = self.map_account_code(debit_account_code, errors)
-                row[self.columns["借方科目名"]] = self.map_account_name(debit_account_code, errors)
-                # 貸方科目コードと名称の変換
-                row[self.columns["貸方科目コード"]] = self.map_account_code(credit_account_code, errors)
-                row[self.columns["貸方科目名"]] = self.map_account_name(credit_account_code, errors)
-                # 借方科目コードと名称の変換
-                row[self.columns["借方税区分コード"]] = self.map_tax_category_code(debit_tax_category_code, errors)
-                row[self.columns["借方税区分名"]] = self.map_tax_category_name(debit_tax_category_code, errors)
-                # 貸方科目コードと名称の変換
-                row[self.columns["貸方税区分コード"]] = self.map_tax_category_code(credit_tax_category_code, errors)
-                row[self.columns["貸方税区分名"]] = self.map_tax_category_name(credit_tax_category_code, errors)
-                return row
-        # データフレーム全体に行単位で関数を適用
-        self.tidy_gl_df = self.tidy_gl_df.apply(process_row, axis=1)
-        # エラーがあれば出力
-        if errors:
-            self.trace_print("\n".join(errors))
+        self.tax_category_list_df = pd.read_csv(self.tax_category_path, dtype=str)
+        self.tax_category_list_df.columns = self.tax_category_list_df.columns.str.strip()  # 列名の空白を除去
+        # 借方と貸方の科目コード及び税コードに対してコードのマッピングを列単位で適用
+        self.tidy_gl_df, self.unmapped_codes_df = self.remap_codes(self.tidy_gl_df)
+        # 対応先がない場合のエラーを出力
+        for row in self.unmapped_codes_df.itertuples(index=False):
+            self.trace_print(f"Error: {row.Column} {row.Code} ({row.Count} rows): {row.Error}.")
         # 結果を確認
         self.debug_print(self.tidy_gl_df.head())
         # 新しいe-Taxコードに変換したデータフレームを CSV に保存
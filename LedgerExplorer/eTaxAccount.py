@@ -9,10 +9,85 @@ Else If the value in Column8, column19 is 10D100100 then
 a)  digital_transaction is 1 and changed value change its value to 10D100101 
 b)  digital_transaction is not 1 and changed value change its value to 10D100102
 """
+from collections import deque
+
+import numpy as np
 import pandas as pd
 
 DEBUG = False
 
+class AhoCorasick:
+    """
+    複数パターンの部分一致（Aho–Corasick）。パターン数によらず文字列 1 回の走査で
+    含まれている全パターンの値を返す。
+    """
+    def __init__(self):
+        self.goto = [{}]     # state -> {char: state}
+        self.fail = [0]
+        self.output = [[]]   # state -> [value]（fail を辿った先の出力も含む）
+
+    def add(self, pattern, value):
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append(value)
+
+    def build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fail = self.fail[state]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                fail = self.goto[fail].get(char, 0)
+                self.fail[next_state] = fail if fail != next_state else 0
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+        return self
+
+    def find_all(self, text):
+        state = 0
+        values = []
+        for char in text:
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            if self.output[state]:
+                values.extend(self.output[state])
+        return values
+
+def partner_automaton(trading_partner):
+    """name, alias1, alias2 の全てから 1 つのオートマトンを作る（値は trading_partner の行番号）"""
+    automaton = AhoCorasick()
+    for position, names in enumerate(trading_partner[["name", "alias1", "alias2"]].itertuples(index=False)):
+        for name in names:
+            if isinstance(name, str) and name:
+                automaton.add(name, position)
+    return automaton.build()
+
+def match_partner(column, automaton):
+    """
+    列の各値に含まれる取引先の行番号（複数なら先頭の行）を返す。一致なしは -1。
+    同じ値は 1 回だけ走査する。
+    """
+    codes, uniques = pd.factorize(column)
+    matched = np.array(
+        [min(automaton.find_all(value), default=-1) if isinstance(value, str) else -1 for value in uniques],
+        dtype=np.int64,
+    )
+    result = np.full(len(column), -1, dtype=np.int64)
+    found = codes >= 0
+    result[found] = matched[codes[found]]
+    return result
+
 # Load the data files
 base = "data/_PCA"
 entryGL_path = f"{base}/entryGL.csv"
@@ -96,57 +171,41 @@ if DEBUG:
         print(f"Row {index}: Column8={row['Column8']}, Column9={row['Column9']}, Column19={row['Column19']}, Column20={row['Column20']}")
 
 # Step 2: Check conditions for updating digital_transaction values
-for index, row in entryGL.iterrows():
-    trading_partner_value = None  # 初期値
-    contains_match = False
-
-    # Column11, Column22, Column27 のいずれかの値が trading_partner の name, alias1, alias2 に含まれるかチェック
-    for col in ["Column11", "Column22", "Column27"]:
-        matched_rows = trading_partner[
-            (trading_partner["name"] == row[col]) |
-            (trading_partner["alias1"] == row[col]) |
-            (trading_partner["alias2"] == row[col])
-        ]
-
-        if not matched_rows.empty:
-            contains_match = True
-            value = matched_rows.iloc[0]["digital_transaction"]  # 取得
-            trading_partner_value = False if pd.isna(value) else True  # NaNならFalse、それ以外ならTrue
-            break  # 最初にマッチしたら処理を抜ける
-
-    # 後続処理で trading_partner_value を使用
-    # if contains_match:
-    #     print(f"Index {index}: Found matching trading partner {trading_partner_value}")
-    """
-    10D100100	総売上高 *
-    10D100101	電子取引売上高
-    10D100102	電子取引以外売上高
-    10D100110	売上値引及び戻り高 *
-    10D100111	電子取引売上値引及び戻り高
-    10D100112	電子取引以外売上値引及び戻り高
-    10E100130	当期商品仕入高
-    10E100131	電子取引当期商品仕入高
-    10E100132	電子取引以外当期商品仕入高
-    10E100120	仕入値引及び戻し高
-    10E100133	電子取引仕入値引及び戻し高
-    10E100134	電子取引以外仕入値引及び戻し高
-    """
-    # trading_partner_value を使って追加の処理を行う
-    if row["Column8"] in ["10D100110", "10E100130"]:
-        if trading_partner_value:
-            entryGL.at[index, "Column8"] = row["Column8"][:-1] + "1"
-            entryGL.at[index, "Column9"] = "電子取引" + row["Column9"]
-        else:
-            entryGL.at[index, "Column8"] = row["Column8"][:-1] + "2"
-            entryGL.at[index, "Column9"] = "電子取引以外" + row["Column9"]
-
-    if row["Column19"] in ["10D100100","10E100120"]:
-        if trading_partner_value:
-            entryGL.at[index, "Column19"] = row["Column19"][:-1] + "1"
-            entryGL.at[index, "Column20"] = "電子取引" + row["Column20"]
-        else:
-            entryGL.at[index, "Column19"] = row["Column19"][:-1] + "2"
-            entryGL.at[index, "Column20"] = "電子取引以外" + row["Column20"]
+# Column11, Column22, Column27 の順に、値が trading_partner の name, alias1, alias2 のいずれかを含むかチェック
+# （最初にマッチした列の取引先を使う）
+automaton = partner_automaton(trading_partner)
+partner = np.full(len(entryGL), -1, dtype=np.int64)
+for col in ["Column11", "Column22", "Column27"]:
+    unmatched = partner < 0
+    partner[unmatched] = match_partner(entryGL[col], automaton)[unmatched]
+# digital_transaction が NaN なら False、それ以外なら True（マッチなしも False）
+digital = trading_partner["digital_transaction"].notna().to_numpy()
+trading_partner_value = np.zeros(len(entryGL), dtype=bool)
+trading_partner_value[partner >= 0] = digital[partner[partner >= 0]]
+"""
+10D100100	総売上高 *
+10D100101	電子取引売上高
+10D100102	電子取引以外売上高
+10D100110	売上値引及び戻り高 *
+10D100111	電子取引売上値引及び戻り高
+10D100112	電子取引以外売上値引及び戻り高
+10E100130	当期商品仕入高
+10E100131	電子取引当期商品仕入高
+10E100132	電子取引以外当期商品仕入高
+10E100120	仕入値引及び戻し高
+10E100133	電子取引仕入値引及び戻し高
+10E100134	電子取引以外仕入値引及び戻し高
+"""
+# trading_partner_value を使って追加の処理を行う
+suffix = np.where(trading_partner_value, "1", "2")
+prefix = np.where(trading_partner_value, "電子取引", "電子取引以外")
+target = entryGL["Column8"].isin(["10D100110", "10E100130"]).to_numpy()
+entryGL.loc[target, "Column9"] = prefix[target] + entryGL.loc[target, "Column9"]
+entryGL.loc[target, "Column8"] = entryGL.loc[target, "Column8"].str[:-1] + suffix[target]
+
+target = entryGL["Column19"].isin(["10D100100", "10E100120"]).to_numpy()
+entryGL.loc[target, "Column20"] = prefix[target] + entryGL.loc[target, "Column20"]
+entryGL.loc[target, "Column19"] = entryGL.loc[target, "Column19"].str[:-1] + suffix[target]
 # Save the modified file as entryGLeTax.csv with UTF-8 BOM encoding
 output_path = f"{base}/entryGLeTax.csv"
 entryGL.to_csv(output_path, index=False, encoding="utf-8-sig")
@@ -1,24 +1,195 @@
-import pikepdf
+"""
+PDF/A-3 に埋め込まれた XML / CSV / JSON などの添付ファイルを抽出する。
+
+  単一ファイル（従来どおり）:
+      python "PDF_A-3/extractCSV _JSON.py"
+  ディレクトリ配下の PDF を一括抽出:
+      python "PDF_A-3/extractCSV _JSON.py" --src archive/ --out PDF_A-3/extracted_files --workers 8
+
+一括抽出では各 PDF を別プロセスで開き、ページ内容はデコードせずに添付ファイルの
+ストリームだけを読み出す。/AFRelationship・/Desc・サイズ・SHA-256 を SQLite の索引
+（既定: <out>/attachments.sqlite）に記録し、再実行時は PDF のサイズと更新時刻が
+索引と同じものを読み飛ばす。
+"""
+import argparse
+import hashlib
 import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pikepdf
 
 # PDF ファイル
 pdf_file = "PDF_A-3/final_output.pdf"
 output_dir = "PDF_A-3/extracted_files"  # 抽出したファイルの保存先
 
-# PDF を開く
-pdf = pikepdf.open(pdf_file)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pdfs (
+    pdf TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    attachments INTEGER,
+    error TEXT,
+    indexed_at TEXT
+);
+CREATE TABLE IF NOT EXISTS attachments (
+    pdf TEXT,
+    name TEXT,
+    relationship TEXT,
+    description TEXT,
+    subtype TEXT,
+    size INTEGER,
+    sha256 TEXT,
+    output_path TEXT,
+    PRIMARY KEY (pdf, name)
+);
+CREATE INDEX IF NOT EXISTS attachments_sha256 ON attachments (sha256);
+"""
+
+
+def pdf_name(value):
+    # pikepdf.Name('/Data') → 'Data'
+    if value is None:
+        return None
+    return str(value).lstrip("/")
+
+
+def file_sha256(file_path, chunk_size=1 << 20):
+    # 既存ファイルは全体を読み込まずにチャンク単位でハッシュする
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def extract_pdf(pdf_path, target_dir):
+    """
+    1 つの PDF の添付ファイルを target_dir に書き出し、メタデータを返す。
+    pikepdf はページ内容を遅延読み込みするため、添付ストリーム以外はデコードしない。
+    """
+    results = []
+    with pikepdf.open(pdf_path) as pdf:
+        attachments = pdf.attachments
+        if len(attachments) > 0:
+            os.makedirs(target_dir, exist_ok=True)
+        for name, filespec in attachments.items():
+            clean_name = os.path.basename(name)  # ファイル名を取得
+            file_path = os.path.join(target_dir, clean_name)  # 保存先パス
+            embedded = filespec.get_file()
+            data = embedded.read_bytes()
+            digest = hashlib.sha256(data).hexdigest()
+            # 同じ内容のファイルが既にあれば書き込まない
+            if not (os.path.isfile(file_path) and os.path.getsize(file_path) == len(data)
+                    and file_sha256(file_path) == digest):
+                with open(file_path, "wb") as f:
+                    f.write(data)
+            spec = filespec.obj
+            results.append({
+                "name": name,
+                "relationship": pdf_name(spec.get("/AFRelationship")),
+                "description": str(spec.get("/Desc")) if spec.get("/Desc") is not None else None,
+                "subtype": pdf_name(embedded.mime_type) if embedded.mime_type else None,
+                "size": len(data),
+                "sha256": digest,
+                "output_path": file_path,
+            })
+    return results
+
+
+def extract_job(pdf_path, target_dir):
+    # プロセスプールで実行: 例外は文字列で返す
+    try:
+        return pdf_path, extract_pdf(pdf_path, target_dir), None
+    except Exception as e:
+        return pdf_path, [], f"{type(e).__name__}: {e}"
+
+
+def find_pdfs(src):
+    for dirpath, _, filenames in os.walk(src):
+        for filename in sorted(filenames):
+            if filename.lower().endswith(".pdf"):
+                yield os.path.join(dirpath, filename)
+
+
+def open_index(index_path):
+    conn = sqlite3.connect(index_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def record_result(conn, pdf_path, stat, attachments, error):
+    with conn:
+        conn.execute("DELETE FROM attachments WHERE pdf = ?", (pdf_path,))
+        conn.executemany(
+            "INSERT INTO attachments (pdf, name, relationship, description, subtype, size, sha256, output_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(pdf_path, a["name"], a["relationship"], a["description"], a["subtype"], a["size"], a["sha256"], a["output_path"]) for a in attachments]
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO pdfs (pdf, size, mtime_ns, attachments, error, indexed_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (pdf_path, stat.st_size, stat.st_mtime_ns, len(attachments), error, time.strftime("%Y-%m-%d %H:%M:%S"))
+        )
+
+
+def extract_tree(src, out, index_path=None, workers=None, force=False):
+    """
+    src 配下の PDF から添付ファイルを out/<PDF の相対パス（拡張子なし）>/ に抽出し、
+    索引を更新する。戻り値は (処理件数, 読み飛ばし件数, エラー件数)。
+    """
+    src = os.path.abspath(src)
+    out = os.path.abspath(out)
+    os.makedirs(out, exist_ok=True)
+    conn = open_index(index_path or os.path.join(out, "attachments.sqlite"))
+    indexed = {pdf: (size, mtime_ns) for pdf, size, mtime_ns in conn.execute("SELECT pdf, size, mtime_ns FROM pdfs WHERE error IS NULL")}
+
+    jobs = {}
+    skipped = 0
+    for pdf_path in find_pdfs(src):
+        stat = os.stat(pdf_path)
+        if not force and indexed.get(pdf_path) == (stat.st_size, stat.st_mtime_ns):
+            skipped += 1
+            continue
+        relative = os.path.splitext(os.path.relpath(pdf_path, src))[0]
+        jobs[pdf_path] = (stat, os.path.join(out, relative))
+
+    errors = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(extract_job, pdf_path, target_dir) for pdf_path, (_, target_dir) in jobs.items()]
+        for done, future in enumerate(as_completed(futures), 1):
+            pdf_path, attachments, error = future.result()
+            record_result(conn, pdf_path, jobs[pdf_path][0], attachments, error)
+            if error:
+                errors += 1
+                print(f"❌ {pdf_path}: {error}")
+            if 0 == done % 1000:
+                print(f"… {done}/{len(jobs)} ({time.perf_counter() - start:.1f}s)")
+    conn.close()
+    print(f"🎯 {len(jobs)} 件抽出、{skipped} 件は変更なしのため読み飛ばし、エラー {errors} 件（{time.perf_counter() - start:.1f}s）")
+    return len(jobs), skipped, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF/A-3 の添付ファイルを抽出する")
+    parser.add_argument("--src", help="PDF を探すディレクトリ（指定しない場合は pdf_file のみ）")
+    parser.add_argument("--out", default=output_dir, help="抽出先ディレクトリ")
+    parser.add_argument("--index", help="SQLite 索引（既定: <out>/attachments.sqlite）")
+    parser.add_argument("--workers", type=int, default=None, help="プロセス数（既定: CPU 数）")
+    parser.add_argument("--force", action="store_true", help="変更のない PDF も抽出し直す")
+    args = parser.parse_args()
 
-# 保存ディレクトリを作成（存在しない場合）
-os.makedirs(output_dir, exist_ok=True)
+    if args.src:
+        extract_tree(args.src, args.out, args.index, args.workers, args.force)
+        return
 
-# 添付ファイルを抽出（加工なし）
-for name, file_obj in pdf.attachments.items():
-    clean_name = os.path.basename(name)  # ファイル名を取得
-    file_path = os.path.join(output_dir, clean_name)  # 保存先パス
-    with open(file_path, "wb") as f:
-        data = file_obj.read_from()
-        f.write(data)
+    # 保存ディレクトリを作成（存在しない場合）
+    os.makedirs(args.out, exist_ok=True)
+    # 添付ファイルを抽出（加工なし）
+    for attachment in extract_pdf(pdf_file, args.out):
+        print(f"✅ {os.path.basename(attachment['name'])} を {attachment['output_path']} に保存しました")
+    print("🎯 全ての埋め込みファイルをそのまま抽出しました！")
 
-    print(f"✅ {clean_name} を {file_path} に保存しました")
 
-print("🎯 全ての埋め込みファイルをそのまま抽出しました！")
+if __name__ == "__main__":
+    main()
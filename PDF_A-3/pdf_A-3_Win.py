@@ -1,9 +1,28 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-
-import sys, io, shutil, subprocess, traceback, re
+"""
+CSV（SME_Example1-minimum.csv）から請求書 PDF を作成し、Ghostscript で PDF/A-3 に変換して
+XML / BOM付きCSV を添付（/AF 付与）する。
+
+  単一モード（既定）: 全グループを 1 つの PDF に出力する（従来どおり）
+      python "PDF_A-3/pdf_A-3_Win.py"
+  バッチモード: d_NC00 のグループごとに 1 つの PDF/A-3 を出力する
+      python "PDF_A-3/pdf_A-3_Win.py" --batch --out-dir PDF_A-3/batch --workers 4 --gs-workers 2
+
+バッチモードでは
+  1) ReportLab による描画を プロセスプール（--workers）で並列実行
+  2) Ghostscript の PDF/A-3 変換は同時実行数を --gs-workers に制限（gs は 1 文書 1 プロセス）
+  3) 添付と /AF 付与は 1 回の pikepdf オープンで実施（プロセスプール）
+し、文書ごとの処理時間（render / gs / attach / total）を表示・CSV 出力する。
+バッチモードで添付する SME XML は --xml のファイルではなく、グループの CSV 行から
+core_japan.csv の smeXPath / smeSeq に従ってグループごとに作成する。
+"""
+import sys, io, os, csv, time, argparse, shutil, subprocess, traceback, re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Dict, List, Any, Iterable, Tuple
+import xml.etree.ElementTree as ET
+import numpy as np
 import pandas as pd
 
 # ===================== 入出力 =====================
@@ -12,45 +31,43 @@ base = Path("PDF_A-3")
 xml_src      = (base / "core_invoice_gateway/SME_Example1-minimum.xml").resolve()
 csv_src      = (base / "core_invoice_gateway/SME_Example1-minimum.csv").resolve()
 core_japan_src  = (base / "core_invoice_gateway/core_japan.csv").resolve()
-    
-# 生成物（BOM付きCSV）
-csv_bom      = csv_src.with_name(csv_src.stem + ".bom.csv")
-core_japan_bom  = core_japan_src.with_name(core_japan_src.stem + ".bom.csv")
 
 # PDF 出力
 raw_pdf      = (base / "invoice_from_csv.pdf").resolve()
 pdfa_pdf     = (base / "invoice_from_csv_pdfa3.pdf").resolve()
-final_pdf    = pdfa_pdf.with_name(pdfa_pdf.stem + "_final.pdf")
-
-# ===================== Ghostscript / ICC 自動検出 =====================
-if sys.platform.startswith("win"):
-    gs_candidates = [
-        r"C:\Program Files\gs\gs10.05.1\bin\gswin64c.exe",
-        r"C:\Program Files\gs\gs10.04.0\bin\gswin64c.exe",
-        shutil.which("gswin64c"),
-    ]
-    icc_candidates = [
-        r"C:\Windows\System32\spool\drivers\color\sRGB Color Space Profile.icm",
-        r"C:\Windows\System32\spool\drivers\color\sRGB IEC61966-2.1.icm",
-    ]
-else:
-    gs_candidates = ["/opt/homebrew/bin/gs", "/usr/local/bin/gs", shutil.which("gs")]
-    icc_candidates = [
-        "/System/Library/ColorSync/Profiles/sRGB Profile.icc",
-        "/System/Library/ColorSync/Profiles/sRGB IEC61966-2.1.icc",
-    ]
 
-gs = next((Path(p) for p in gs_candidates if p and Path(p).is_file()), None)
-icc = next((Path(p) for p in icc_candidates if p and Path(p).is_file()), None)
-if not gs:  raise FileNotFoundError("Ghostscript not found. Install it or add to PATH.")
-if not icc: raise FileNotFoundError("sRGB ICC profile not found.")
-print("GS :", gs)
-print("ICC:", icc)
+# 必須の Dimension（元名）
+dim_keys = ["d_NC00", "d_NC39-NC57", "d_NC39-NC61"]  # group, tax, line
 
-# ===================== 入力存在チェック =====================
-for p in [csv_src, core_japan_src, xml_src]:
-    if not p.is_file():
-        raise FileNotFoundError(f"Missing input: {p}")
+# ===================== Ghostscript / ICC 自動検出 =====================
+def find_gs_icc(gs_path: str | None = None, icc_path: str | None = None) -> Tuple[Path, Path]:
+    if sys.platform.startswith("win"):
+        gs_candidates = [
+            r"C:\Program Files\gs\gs10.05.1\bin\gswin64c.exe",
+            r"C:\Program Files\gs\gs10.04.0\bin\gswin64c.exe",
+            shutil.which("gswin64c"),
+        ]
+        icc_candidates = [
+            r"C:\Windows\System32\spool\drivers\color\sRGB Color Space Profile.icm",
+            r"C:\Windows\System32\spool\drivers\color\sRGB IEC61966-2.1.icm",
+        ]
+    else:
+        gs_candidates = ["/opt/homebrew/bin/gs", "/usr/local/bin/gs", shutil.which("gs")]
+        icc_candidates = [
+            "/System/Library/ColorSync/Profiles/sRGB Profile.icc",
+            "/System/Library/ColorSync/Profiles/sRGB IEC61966-2.1.icc",
+        ]
+    if gs_path:
+        gs_candidates = [gs_path]
+    if icc_path:
+        icc_candidates = [icc_path]
+    gs = next((Path(p) for p in gs_candidates if p and Path(p).is_file()), None)
+    icc = next((Path(p) for p in icc_candidates if p and Path(p).is_file()), None)
+    if not gs:  raise FileNotFoundError("Ghostscript not found. Install it or add to PATH.")
+    if not icc: raise FileNotFoundError("sRGB ICC profile not found.")
+    print("GS :", gs)
+    print("ICC:", icc)
+    return gs, icc
 
 # ===================== 1) CSV を BOM 付き utf-8-sig で保存 =====================
 def read_csv_guess(path: Path) -> pd.DataFrame:
@@ -68,11 +85,9 @@ def read_csv_guess(path: Path) -> pd.DataFrame:
 def write_csv_bom(df: pd.DataFrame, path: Path):
     df.to_csv(path, index=False, encoding="utf-8-sig")
 
-df_raw   = read_csv_guess(csv_src)
-df_bind  = read_csv_guess(core_japan_src)
-write_csv_bom(df_raw, csv_bom)
-write_csv_bom(df_bind, core_japan_bom)
-print("✅ CSVをBOM付きで保存:", csv_bom.name, core_japan_bom.name)
+def bom_path(path: Path, out_dir: Path | None = None) -> Path:
+    target = path.with_name(path.stem + ".bom.csv")
+    return (out_dir / target.name) if out_dir else target
 
 # ===================== 2) ヘッダ日本語化（binding: B→E。d_は切ってlookup） =====================
 def choose_cols_for_binding(df: pd.DataFrame):
@@ -85,34 +100,31 @@ def choose_cols_for_binding(df: pd.DataFrame):
     #     return cols[0], cols[1]
     raise ValueError("core_japan.csv の列構成を解釈できません")
 
-key_col, val_col = choose_cols_for_binding(df_bind)
-bind_map = {str(k).strip(): str(v).strip() for k, v in zip(df_bind[key_col], df_bind[val_col])}
+def japanese_headers(df_raw: pd.DataFrame, df_bind: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    key_col, val_col = choose_cols_for_binding(df_bind)
+    bind_map = {str(k).strip(): str(v).strip() for k, v in zip(df_bind[key_col], df_bind[val_col])}
 
-orig_cols = list(df_raw.columns)
+    orig_cols = list(df_raw.columns)
 
-def map_header(h: str) -> str:
-    key = str(h)
-    if key.startswith("d_"):
-        key = key[2:]
-    return bind_map.get(key, str(h))
+    def map_header(h: str) -> str:
+        key = str(h)
+        if key.startswith("d_"):
+            key = key[2:]
+        return bind_map.get(key, str(h))
 
-jp_cols = [map_header(c) for c in orig_cols]
-df = df_raw.copy()
-df.columns = jp_cols
-df = df.fillna("")  # NaN→空文字（重要）
+    jp_cols = [map_header(c) for c in orig_cols]
+    df = df_raw.copy()
+    df.columns = jp_cols
+    df = df.fillna("")  # NaN→空文字（重要）
 
-# 診断
-print("✅ ヘッダ日本語化（例）:", list(zip(orig_cols[:8], jp_cols[:8])))
-print("✅ データ shape:", df.shape)
-print("✅ 先頭5行:\n", df.head())
+    # 診断
+    print("✅ ヘッダ日本語化（例）:", list(zip(orig_cols[:8], jp_cols[:8])))
+    print("✅ データ shape:", df.shape)
+    # 元名→日本語名の対応（d_列解決に使用）
+    return df, dict(zip(orig_cols, jp_cols))
 
-# ===================== 3) d_列ベースのグループ化（dict list で処理） =====================
-# 元名→日本語名の対応（d_列解決に使用）
-orig_to_jp: Dict[str, str] = dict(zip(orig_cols, jp_cols))
-
-# 必須の Dimension（元名）
-dim_keys = ["d_NC00", "d_NC39-NC57", "d_NC39-NC61"]  # group, tax, line
-def resolve_jp_dim_cols(df: pd.DataFrame) -> Tuple[str, str, str]:
+# ===================== 3) d_列ベースのグループ化（列単位で処理） =====================
+def resolve_jp_dim_cols(df: pd.DataFrame, orig_to_jp: Dict[str, str]) -> Tuple[str, str, str]:
     resolved = []
     for k in dim_keys:
         jp = orig_to_jp.get(k)
@@ -121,73 +133,69 @@ def resolve_jp_dim_cols(df: pd.DataFrame) -> Tuple[str, str, str]:
         resolved.append(jp)
     return tuple(resolved)
 
-jp_d0, jp_dtax, jp_dline = resolve_jp_dim_cols(df)
-
-# DataFrame → dict list
-records: List[Dict[str, Any]] = df.to_dict(orient="records")
-
-# d_NC00（日本語化後）を group id、d_NC39-NC57 を TAX、d_NC39-NC61 を LIN 判定に使用
-groups: Dict[int, Dict[str, List[Dict[str, Any]]]] = {}
-for row in records:
-    raw_gid  = str(row.get(jp_d0, "")).strip()
-    raw_tax  = str(row.get(jp_dtax, "")).strip()
-    raw_line = str(row.get(jp_dline, "")).strip()
-
-    gid = int(raw_gid) if raw_gid.isdigit() else None
-    tax = int(raw_tax) if raw_tax.isdigit() else None
-    lin = int(raw_line) if raw_line.isdigit() else None
-    if gid is None:
-        continue
-
-    groups.setdefault(gid, {"HDR": [], "TAX": [], "LIN": []})
-    if tax is None and lin is None:
-        groups[gid]["HDR"].append(row)
-    elif tax is not None:
-        groups[gid]["TAX"].append(row)
-    else:
-        groups[gid]["LIN"].append(row)
-
-print("🧭 グループ概要：")
-for gid, sec in sorted(groups.items()):
-    print(f"  gid={gid}: HDR={len(sec['HDR'])}, TAX={len(sec['TAX'])}, LIN={len(sec['LIN'])}")
+SECTIONS = ("HDR", "TAX", "LIN")
 
 # ===================== 4) セクション内「全行で空の列」を削除 =====================
-def _is_blank_value(v: Any) -> bool:
-    s = "" if v is None else str(v).strip()
-    return (s == "" or s.lower() in {"nan", "none"})
-
-def drop_all_blank_columns(
-    rows: List[Dict[str, Any]],
-    keep: Iterable[str] | None = None
-) -> Tuple[List[Dict[str, Any]], List[str]]:
-    if not rows:
-        return rows, []
-    keep_set = set(keep or [])
-    all_keys = set()
-    for r in rows:
-        all_keys.update(r.keys())
-    to_drop = []
-    for k in sorted(all_keys - keep_set):
-        if all(_is_blank_value(r.get(k)) for r in rows):
-            to_drop.append(k)
-    if to_drop:
-        for r in rows:
-            for k in to_drop:
-                r.pop(k, None)
-    return rows, to_drop
-
-# 例：必ず残したいキー群（必要に応じて追記）
-# must_keep_cols = {jp_d0, jp_dtax, jp_dline, "インボイス文書番号", "文書通貨コード"}
-must_keep_cols = {jp_d0}
-
-for gid, parts in groups.items():
-    for section in ("HDR", "TAX", "LIN"):
-        before_keys = set().union(*(r.keys() for r in parts[section])) if parts[section] else set()
-        parts[section], dropped = drop_all_blank_columns(parts[section], keep=must_keep_cols)
-        after_keys  = set().union(*(r.keys() for r in parts[section])) if parts[section] else set()
-        if dropped:
-            print(f"🧹 group {gid} {section}: dropped {len(dropped)} cols → {dropped}")
-            print(f"    keys {len(before_keys)} → {len(after_keys)}")
+def blank_mask(text: pd.DataFrame) -> pd.DataFrame:
+    """空・"nan"・"none"（前後空白・大文字小文字を無視）のセルを True とする"""
+    mask = {}
+    for col in text.columns:
+        s = text[col].str.strip()
+        mask[col] = s.eq("") | s.str.lower().isin(("nan", "none"))
+    return pd.DataFrame(mask, index=text.index)
+
+def group_sections(
+    df: pd.DataFrame,
+    jp_d0: str,
+    jp_dtax: str,
+    jp_dline: str,
+    must_keep_cols: Iterable[str] = (),
+) -> Dict[int, Dict[str, Dict[str, Any]]]:
+    """
+    d_NC00（日本語化後）を group id、d_NC39-NC57 を TAX、d_NC39-NC61 を LIN 判定に使用し、
+    グループ・セクションごとに {"columns": 残す列, "cells": 行×列の文字列配列, "dropped": 削除した列} を返す。
+    空白判定・全行空の列の判定は DataFrame 全体で一度だけ行う。
+    """
+    text = df.astype(str)
+    raw_gid = text[jp_d0].str.strip()
+    is_tax = text[jp_dtax].str.strip().str.isdigit()
+    is_lin = text[jp_dline].str.strip().str.isdigit()
+    valid = raw_gid.str.isdigit()
+    gid = raw_gid.where(valid, "-1").astype(int)
+    section = pd.Series(np.select([is_tax, is_lin], ["TAX", "LIN"], "HDR"), index=df.index)
+
+    blank = blank_mask(text)
+    # 空セルは ""、それ以外は元の文字列
+    cells = np.where(blank.to_numpy(), "", text.to_numpy())
+    columns = np.asarray(df.columns, dtype=object)
+    keep_cols = np.isin(columns, list(must_keep_cols))
+
+    keys = [gid[valid], section[valid]]
+    all_blank = blank[valid].groupby(keys, sort=False).all()
+    positions = df[valid].groupby(keys, sort=False).indices
+    row_numbers = np.flatnonzero(valid.to_numpy())
+
+    groups: Dict[int, Dict[str, Dict[str, Any]]] = {}
+    for (g, sec), rows in positions.items():
+        keep = ~all_blank.loc[(g, sec)].to_numpy() | keep_cols
+        groups.setdefault(int(g), {})[sec] = {
+            "columns": columns[keep].tolist(),
+            "cells": cells[np.ix_(row_numbers[rows], np.flatnonzero(keep))],
+            "dropped": columns[~keep].tolist(),
+        }
+    return groups
+
+def print_group_summary(groups: Dict[int, Dict[str, Dict[str, Any]]]):
+    print("🧭 グループ概要：")
+    for gid, parts in sorted(groups.items()):
+        counts = ", ".join(f"{sec}={len(parts[sec]['cells']) if sec in parts else 0}" for sec in SECTIONS)
+        print(f"  gid={gid}: {counts}")
+    for gid, parts in sorted(groups.items()):
+        for sec in SECTIONS:
+            if sec in parts and parts[sec]["dropped"]:
+                dropped = parts[sec]["dropped"]
+                print(f"🧹 group {gid} {sec}: dropped {len(dropped)} cols → {dropped}")
+                print(f"    keys {len(parts[sec]['columns']) + len(dropped)} → {len(parts[sec]['columns'])}")
 
 # ===================== 5) ReportLab: 縦横反転テーブルでPDF化 =====================
 from reportlab.lib.pagesizes import A4
@@ -197,6 +205,10 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.styles import getSampleStyleSheet
 
+# フォント登録・スタイルはプロセスごとに 1 回だけ行う
+_font_name: str | None = None
+_styles = None
+
 def register_jp_font() -> str:
     candidates = [
         (Path(r"C:\Windows\Fonts\YuGothR.ttc"), "YuGothic", 0),
@@ -213,93 +225,90 @@ def register_jp_font() -> str:
             return name
     return "Helvetica"
 
-font_name = register_jp_font()
-styles = getSampleStyleSheet()
-for k in ("Heading1","Heading2","BodyText","Normal","Title"):
-    if k in styles: styles[k].fontName = font_name
-
-def listdict_to_table_transposed(
-    rows: List[Dict[str, Any]],
+def get_font_and_styles():
+    global _font_name, _styles
+    if _font_name is None:
+        _font_name = register_jp_font()
+        _styles = getSampleStyleSheet()
+        for k in ("Heading1","Heading2","BodyText","Normal","Title"):
+            if k in _styles: _styles[k].fontName = _font_name
+    return _font_name, _styles
+
+def columns_to_table_transposed(
+    part: Dict[str, Any] | None,
     *,
-    keep_cols: Iterable[str] | None = None,
-    drop_blank_cols: bool = False,  # 既に外で実施済み
+    records_per_table: int = 10,
     font_name: str = "Helvetica",
     styles_obj=None,
-) -> Paragraph | Table:
-    if not rows:
-        return Paragraph("（データなし）", styles_obj["BodyText"] if styles_obj else None)
-
-    # 全キー集合（行ごとに異なっていてもOK）
-    all_keys = set()
-    for r in rows:
-        all_keys.update(r.keys())
-
-    # 転置データ作成
-    data: List[List[str]] = []
-    record_ids = [f"#{i+1}" for i in range(len(rows))]
-    for key in all_keys:
-        row_data = [key]  # 項目名
-        for r in rows:
-            v = r.get(key, "")
-            s = "" if _is_blank_value(v) else str(v)
-            row_data.append(s)
-        data.append(row_data)
-    data.insert(0, ["項目名"] + record_ids)
-
-    t = Table(data, repeatRows=1)
-    t.setStyle(TableStyle([
+) -> List[Paragraph | Table]:
+    """列配列から転置テーブルを作成する（明細が多い場合は records_per_table 件ずつ分割）"""
+    if not part or 0 == len(part["cells"]):
+        return [Paragraph("（データなし）", styles_obj["BodyText"] if styles_obj else None)]
+
+    style = TableStyle([
         ("FONTNAME", (0,0), (-1,-1), font_name),
         ("FONTSIZE", (0,0), (-1,-1), 8),
         ("GRID", (0,0), (-1,-1), 0.25, colors.grey),
         ("BACKGROUND", (0,0), (-1,0), colors.lightgrey),
         ("ALIGN", (0,0), (-1,-1), "LEFT"),
         ("VALIGN", (0,0), (-1,-1), "TOP"),
-    ]))
-    return t
-
-# ページ構成（各 gid につき HDR/TAX/LIN の順で転置テーブル）
-elems = []
-for gid in sorted(groups.keys()):
-    parts = groups[gid]
-    elems += [Paragraph(f"SME Example / Group {gid}（HDR）", styles["Heading2"]), Spacer(1, 6),
-              listdict_to_table_transposed(parts["HDR"], font_name=font_name, styles_obj=styles), PageBreak()]
-    elems += [Paragraph(f"SME Example / Group {gid}（TAX）", styles["Heading2"]), Spacer(1, 6),
-              listdict_to_table_transposed(parts["TAX"], font_name=font_name, styles_obj=styles), PageBreak()]
-    elems += [Paragraph(f"SME Example / Group {gid}（LIN）", styles["Heading2"]), Spacer(1, 6),
-              listdict_to_table_transposed(parts["LIN"], font_name=font_name, styles_obj=styles), PageBreak()]
-
-# 末尾 PageBreak 除去
-if elems and isinstance(elems[-1], PageBreak):
-    elems.pop()
-
-raw_pdf.parent.mkdir(parents=True, exist_ok=True)
-doc = SimpleDocTemplate(str(raw_pdf), pagesize=A4, rightMargin=24, leftMargin=24, topMargin=24, bottomMargin=24)
-doc.build(elems)
-print("✅ PDF 作成:", raw_pdf)
+    ])
+    columns = part["columns"]
+    cells = part["cells"]
+    tables: List[Paragraph | Table] = []
+    for start in range(0, len(cells), records_per_table):
+        block = cells[start:start + records_per_table]
+        # 転置データ作成（行: 項目、列: レコード）
+        data: List[List[str]] = [["項目名"] + [f"#{i+1}" for i in range(start, start + len(block))]]
+        data += [[key] + values for key, values in zip(columns, block.T.tolist())]
+        t = Table(data, repeatRows=1)
+        t.setStyle(style)
+        tables += [t, Spacer(1, 6)]
+    return tables[:-1]
+
+def render_pdf(groups: Dict[int, Dict[str, Dict[str, Any]]], output: Path):
+    font_name, styles = get_font_and_styles()
+    # ページ構成（各 gid につき HDR/TAX/LIN の順で転置テーブル）
+    elems = []
+    for gid in sorted(groups.keys()):
+        parts = groups[gid]
+        for section in SECTIONS:
+            elems += [Paragraph(f"SME Example / Group {gid}（{section}）", styles["Heading2"]), Spacer(1, 6)]
+            elems += columns_to_table_transposed(parts.get(section), font_name=font_name, styles_obj=styles)
+            elems.append(PageBreak())
+
+    # 末尾 PageBreak 除去
+    if elems and isinstance(elems[-1], PageBreak):
+        elems.pop()
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    doc = SimpleDocTemplate(str(output), pagesize=A4, rightMargin=24, leftMargin=24, topMargin=24, bottomMargin=24)
+    doc.build(elems)
 
 # ===================== 6) Ghostscript で PDF/A-3 変換 =====================
-for p in [pdfa_pdf, final_pdf]:
-    try: p.unlink(missing_ok=True)
-    except Exception: pass
+def convert_pdfa(gs: Path, icc: Path, source: Path, output: Path, verbose: bool = True):
+    for p in [output]:
+        try: p.unlink(missing_ok=True)
+        except Exception: pass
 
-gs_cmd = [
-    str(gs), "-dNOSAFER",
-    "-dPDFA=3", "-dPDFACompatibilityPolicy=1",
-    "-dBATCH","-dNOPAUSE",
-    "-sDEVICE=pdfwrite",
-    f"-sOutputFile={str(pdfa_pdf)}",
-    "-sColorConversionStrategy=RGB",
-    f"-sOutputICCProfile={str(icc)}",
-    "-dEmbedAllFonts=true",
-    str(raw_pdf),
-]
-p = subprocess.run(gs_cmd, capture_output=True, text=True)
-print("GS(PDFA) returncode:", p.returncode)
-if p.stdout.strip(): print("GS STDOUT:\n", p.stdout)
-if p.stderr.strip(): print("GS STDERR:\n", p.stderr)
-if p.returncode != 0:
-    raise SystemExit("❌ Ghostscript failed in PDF/A-3 conversion")
-print("✅ PDF/A-3:", pdfa_pdf)
+    gs_cmd = [
+        str(gs), "-dNOSAFER",
+        "-dPDFA=3", "-dPDFACompatibilityPolicy=1",
+        "-dBATCH","-dNOPAUSE",
+        "-sDEVICE=pdfwrite",
+        f"-sOutputFile={str(output)}",
+        "-sColorConversionStrategy=RGB",
+        f"-sOutputICCProfile={str(icc)}",
+        "-dEmbedAllFonts=true",
+        str(source),
+    ]
+    p = subprocess.run(gs_cmd, capture_output=True, text=True)
+    if verbose or p.returncode != 0:
+        print("GS(PDFA) returncode:", p.returncode)
+        if p.stdout.strip(): print("GS STDOUT:\n", p.stdout)
+        if p.stderr.strip(): print("GS STDERR:\n", p.stderr)
+    if p.returncode != 0:
+        raise RuntimeError(f"❌ Ghostscript failed in PDF/A-3 conversion: {source}")
 
 # ===================== 7) PDF に XML と BOM付きCSV を添付（/AF 付与） =====================
 import pikepdf
@@ -318,12 +327,15 @@ def ensure_ef_names(pdf: pikepdf.Pdf):
         ef_tree['/Names'] = Array()
     return ef_tree['/Names']
 
-try:
-    with pikepdf.open(str(pdfa_pdf)) as pdf:
+def attach_files(source: Path, output: Path, attachments: List[Tuple[Path, str, str]]):
+    """
+    attachments: [(ファイル, AFRelationship, Desc), ...]
+    添付・/AFRelationship・/Desc・/AF を 1 回のオープンで付与して保存する。
+    """
+    with pikepdf.open(str(source)) as pdf:
         # 添付（辞書代入で作成）
-        pdf.attachments[xml_src.name] = xml_src.read_bytes()
-        pdf.attachments[csv_bom.name] = csv_bom.read_bytes()
-        pdf.attachments[core_japan_bom.name] = core_japan_bom.read_bytes()
+        for path, _, _ in attachments:
+            pdf.attachments[path.name] = path.read_bytes()
 
         # /AFRelationship と /AF を後付け
         ef_names = ensure_ef_names(pdf)  # [name, filespec, ...]
@@ -332,11 +344,9 @@ try:
             af_array = Array()
             pdf.Root['/AF'] = af_array
 
-        meta = {
-            xml_src.name:      ("Data",        "SME Example XML"),
-            csv_bom.name:      ("Data",        "SME CSV (BOM UTF-8)"),
-            core_japan_bom.name:  ("Data",        "core_japan CSV (BOM UTF-8)"),
-        }
+        meta = {path.name: (rel, desc) for path, rel, desc in attachments}
+        # pikepdf のバージョンによっては添付時に /AF へ追加済みのため二重登録しない
+        af_names = {str(ref.get('/F')) for ref in af_array}
         seen = set()
         for i in range(0, len(ef_names), 2):
             fname_obj    = ef_names[i]
@@ -354,14 +364,301 @@ try:
             rel, desc = meta[fname]
             filespec['/Desc'] = desc
             filespec['/AFRelationship'] = Name('/' + rel)
-            af_array.append(ref_for_af)
+            if fname not in af_names:
+                af_array.append(ref_for_af)
 
-        try: final_pdf.unlink(missing_ok=True)
+        try: output.unlink(missing_ok=True)
         except Exception: pass
-        pdf.save(str(final_pdf))
-    print("✅ 添付完了:", final_pdf)
+        pdf.save(str(output))
+
+# ===================== SME XML（グループ別） =====================
+SME_NS = {
+    "rsm": "urn:un:unece:uncefact:data:standard:SMEinvoice",
+    "qdt": "urn:un:unece:uncefact:data:standard:QualifiedDataType:31",
+    "ram": "urn:un:unece:uncefact:data:standard:ReusableAggregateBusinessInformationEntity:31",
+    "udt": "urn:un:unece:uncefact:data:standard:UnqualifiedDataType:31",
+    "xsi": "http://www.w3.org/2001/XMLSchema-instance",
+}
+SME_SCHEMA_LOCATION = "urn:un:unece:uncefact:data:standard:SMEinvoice https://www.wuwei.space/core-japan/server/data/schema/data/standard/SMEinvoice.xsd"
+# 行ごとに要素を 1 つ作るセクション → その要素を表す d_列
+SME_REPEATS = {"TAX": "d_NC39-NC57", "LIN": "d_NC39-NC61"}
+
+def sme_xpath_steps(xpath: str) -> List[str]:
+    """smeXPath から述語（[...]）を除き、ステップのリストにする"""
+    while True:
+        stripped = re.sub(r"\[[^\[\]]*\]", "", xpath)
+        if stripped == xpath:
+            break
+        xpath = stripped
+    return [step for step in xpath.split("/") if step]
+
+def sme_attribute_copy(xpath: str) -> Tuple[str, List[str]] | None:
+    """
+    .../X[ram:Y/@attr=/絶対パス]/ram:Y の形の smeXPath から (attr, 絶対パスのステップ) を返す。
+    例: TaxTotalAmount の currencyID は InvoiceCurrencyCode の値を写す。
+    """
+    match = re.search(r"\[([\w:]+)/@(\w+)=(/[^\[\]]+)\]/\1$", xpath)
+    return (match.group(2), sme_xpath_steps(match.group(3))) if match else None
+
+def sme_binding(df_bind: pd.DataFrame) -> Dict[str, Tuple[float, List[str], Tuple[str, List[str]] | None]]:
+    """core_japan.csv の id → (smeSeq, smeXPath のステップ, 写す属性)。id が重複する行は先頭を使う"""
+    bind = df_bind.fillna("").drop_duplicates("id")
+    bind = bind[(bind["smeXPath"].str.strip() != "") & bind["smeSeq"].str.strip().str.isdigit()]
+    return {
+        row.id.strip(): (float(row.smeSeq), sme_xpath_steps(row.smeXPath.strip()), sme_attribute_copy(row.smeXPath.strip()))
+        for row in bind.itertuples()
+    }
+
+def sme_child(parent: ET.Element, step: str, new: bool = False) -> ET.Element:
+    """parent の子要素 step（prefix:name）。既存があれば最後のものを使い、new なら必ず作る"""
+    prefix, name = step.split(":", 1)
+    tag = f"{{{SME_NS[prefix]}}}{name}"
+    if not new:
+        found = parent.findall(tag)
+        if found:
+            return found[-1]
+    return ET.SubElement(parent, tag)
+
+def sme_set(elem: ET.Element, steps: List[str], value: str, root: ET.Element, copy: Tuple[str, List[str]] | None = None):
+    """
+    elem から steps をたどって値を設定する（最後のステップが @属性 なら属性値）。
+    copy があれば root から見た絶対パスの値をその属性に写す。
+    """
+    attribute = steps[-1][1:] if steps and steps[-1].startswith("@") else None
+    for step in steps[:-1] if attribute else steps:
+        elem = sme_child(elem, step)
+    if attribute:
+        elem.set(attribute, value)
+    else:
+        elem.text = value
+    if copy:
+        # 写し元は探すだけで作らない
+        path = "/".join(f"{{{SME_NS[step.split(':', 1)[0]]}}}{step.split(':', 1)[1]}" for step in copy[1][1:])
+        source = root.find(path)
+        if source is not None and source.text:
+            elem.set(copy[0], source.text)
+
+def write_sme_xml(rows: pd.DataFrame, binding: Dict[str, Tuple[float, List[str], Tuple[str, List[str]] | None]], path: Path):
+    """
+    1 グループ（d_NC00 が同じ行）の元 CSV 行から SME XML を作成する。
+    HDR 行の値は smeXPath の位置に、TAX 行・LIN 行は行ごとに d_NC39-NC57 / d_NC39-NC61 の要素を作って
+    その下に設定する。要素は smeSeq 順に作る。
+    """
+    text = rows.fillna("").astype(str).apply(lambda s: s.str.strip())
+    is_tax = text[SME_REPEATS["TAX"]].str.isdigit()
+    is_lin = text[SME_REPEATS["LIN"]].str.isdigit()
+    section_rows = {"HDR": text[~is_tax & ~is_lin], "TAX": text[is_tax], "LIN": text[is_lin]}
+    repeat_steps = {sec: binding[key[2:]][1] for sec, key in SME_REPEATS.items()}
+
+    # 値の列を、属するセクション（繰り返し要素の下か）ごとに smeSeq 順で並べる
+    fields: Dict[str, List[Tuple[float, str, List[str], Any]]] = {sec: [] for sec in SECTIONS}
+    for col in rows.columns:
+        if col.startswith("d_") or col not in binding:
+            continue
+        seq, steps, copy = binding[col]
+        sec = next((sec for sec, rs in repeat_steps.items() if steps[:len(rs)] == rs), "HDR")
+        fields[sec].append((seq, col, steps, copy))
+    # HDR の値と繰り返し要素を smeSeq 順に処理する
+    items = [(seq, "HDR", col, steps, copy) for seq, col, steps, copy in fields["HDR"]]
+    items += [(binding[key[2:]][0], sec, None, repeat_steps[sec], None) for sec, key in SME_REPEATS.items()]
+
+    root_step = repeat_steps["TAX"][0]
+    root = sme_child(ET.Element("dummy"), root_step, new=True)
+    root.set(f"{{{SME_NS['xsi']}}}schemaLocation", SME_SCHEMA_LOCATION)
+    header = section_rows["HDR"]
+    for _, sec, col, steps, copy in sorted(items, key=lambda item: item[0]):
+        if "HDR" == sec:
+            values = header[col][header[col] != ""]
+            if len(values):
+                sme_set(root, steps[1:], values.iloc[0], root, copy)
+            continue
+        sub_fields = sorted(fields[sec], key=lambda field: field[0])
+        for _, row in section_rows[sec].iterrows():
+            parent = root
+            for step in steps[1:-1]:
+                parent = sme_child(parent, step)
+            elem = sme_child(parent, steps[-1], new=True)
+            for _, col, field_steps, copy in sub_fields:
+                if row[col]:
+                    sme_set(elem, field_steps[len(steps):], row[col], root, copy)
+
+    for prefix, uri in SME_NS.items():
+        ET.register_namespace(prefix, uri)
+    tree = ET.ElementTree(root)
+    ET.indent(tree, space="    ")
+    tree.write(path, encoding="utf-8", xml_declaration=True)
+
+# ===================== 単一モード =====================
+def run_single(gs: Path, icc: Path, csv_src: Path = csv_src, core_japan_src: Path = core_japan_src, xml_src: Path = xml_src):
+    final_pdf = pdfa_pdf.with_name(pdfa_pdf.stem + "_final.pdf")
+    # 生成物（BOM付きCSV）
+    csv_bom = bom_path(csv_src)
+    core_japan_bom = bom_path(core_japan_src)
+
+    df_raw   = read_csv_guess(csv_src)
+    df_bind  = read_csv_guess(core_japan_src)
+    write_csv_bom(df_raw, csv_bom)
+    write_csv_bom(df_bind, core_japan_bom)
+    print("✅ CSVをBOM付きで保存:", csv_bom.name, core_japan_bom.name)
+
+    df, orig_to_jp = japanese_headers(df_raw, df_bind)
+    print("✅ 先頭5行:\n", df.head())
+    jp_d0, jp_dtax, jp_dline = resolve_jp_dim_cols(df, orig_to_jp)
+    # 例：必ず残したいキー群（必要に応じて追記）
+    # must_keep_cols = {jp_d0, jp_dtax, jp_dline, "インボイス文書番号", "文書通貨コード"}
+    groups = group_sections(df, jp_d0, jp_dtax, jp_dline, must_keep_cols={jp_d0})
+    print_group_summary(groups)
+
+    render_pdf(groups, raw_pdf)
+    print("✅ PDF 作成:", raw_pdf)
+
+    try: final_pdf.unlink(missing_ok=True)
+    except Exception: pass
+    convert_pdfa(gs, icc, raw_pdf, pdfa_pdf)
+    print("✅ PDF/A-3:", pdfa_pdf)
+
+    try:
+        attach_files(pdfa_pdf, final_pdf, [
+            (xml_src,        "Data", "SME Example XML"),
+            (csv_bom,        "Data", "SME CSV (BOM UTF-8)"),
+            (core_japan_bom, "Data", "core_japan CSV (BOM UTF-8)"),
+        ])
+        print("✅ 添付完了:", final_pdf)
+    except Exception as e:
+        print("❌ 添付時エラー:", e)
+        traceback.print_exc()
+        raise
+
+# ===================== バッチモード（d_NC00 ごとに 1 文書） =====================
+def render_job(gid: int, parts: Dict[str, Dict[str, Any]], raw_rows: pd.DataFrame, binding: Dict[str, Tuple[float, List[str], Any]],
+               work_dir: str) -> Dict[str, Any]:
+    """プロセスプールで実行: グループの BOM付きCSV・SME XML と ReportLab PDF を作成する"""
+    start = time.perf_counter()
+    work = Path(work_dir)
+    group_csv = work / f"invoice_{gid}.bom.csv"
+    write_csv_bom(raw_rows, group_csv)
+    group_xml = work / f"invoice_{gid}.xml"
+    write_sme_xml(raw_rows, binding, group_xml)
+    raw = work / f"invoice_{gid}.pdf"
+    render_pdf({gid: parts}, raw)
+    return {"gid": gid, "raw": str(raw), "csv": str(group_csv), "xml": str(group_xml), "render": time.perf_counter() - start}
+
+def gs_job(gs: Path, icc: Path, job: Dict[str, Any]) -> Dict[str, Any]:
+    """スレッドで実行（gs 子プロセスの終了待ちのみ）: PDF/A-3 に変換する"""
+    start = time.perf_counter()
+    pdfa = Path(job["raw"]).with_name(f"invoice_{job['gid']}_pdfa3.pdf")
+    convert_pdfa(gs, icc, Path(job["raw"]), pdfa, verbose=False)
+    return {**job, "pdfa": str(pdfa), "gs": time.perf_counter() - start}
+
+def attach_job(job: Dict[str, Any], out_dir: str, shared: List[Tuple[str, str, str]]) -> Dict[str, Any]:
+    """プロセスプールで実行: 添付と /AF 付与を 1 回の pikepdf パスで行う"""
+    start = time.perf_counter()
+    final = Path(out_dir) / f"invoice_{job['gid']}.pdf"
+    attachments = [(Path(job["xml"]), "Data", f"SME XML group {job['gid']}")]
+    attachments += [(Path(p), rel, desc) for p, rel, desc in shared]
+    attachments.append((Path(job["csv"]), "Data", f"SME CSV group {job['gid']} (BOM UTF-8)"))
+    attach_files(Path(job["pdfa"]), final, attachments)
+    return {**job, "final": str(final), "attach": time.perf_counter() - start}
+
+def run_batch(gs: Path, icc: Path, out_dir: Path, workers: int, gs_workers: int, keep_work: bool = False,
+              csv_src: Path = csv_src, core_japan_src: Path = core_japan_src) -> List[Dict[str, Any]]:
+    batch_start = time.perf_counter()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    work_dir = out_dir / "work"
+    work_dir.mkdir(parents=True, exist_ok=True)
+    core_japan_bom = bom_path(core_japan_src, out_dir)
+
+    df_raw   = read_csv_guess(csv_src)
+    df_bind  = read_csv_guess(core_japan_src)
+    write_csv_bom(df_bind, core_japan_bom)
+
+    df, orig_to_jp = japanese_headers(df_raw, df_bind)
+    jp_d0, jp_dtax, jp_dline = resolve_jp_dim_cols(df, orig_to_jp)
+    groups = group_sections(df, jp_d0, jp_dtax, jp_dline, must_keep_cols={jp_d0})
+    print(f"🧭 グループ数: {len(groups)}")
+
+    # 元の CSV をグループ別に分割（文書ごとの添付用）
+    raw_gid = df_raw["d_NC00"].fillna("").astype(str).str.strip()
+    raw_by_gid = {int(k): v for k, v in df_raw.groupby(raw_gid, sort=False) if k.isdigit()}
+
+    # SME XML は全グループ分の 1 ファイルではなく、グループごとに render_job で作成する
+    binding = sme_binding(df_bind)
+    shared = [(str(core_japan_bom), "Data", "core_japan CSV (BOM UTF-8)")]
+
+    results: Dict[int, Dict[str, Any]] = {}
+    failures: Dict[int, str] = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool, ThreadPoolExecutor(max_workers=gs_workers) as gs_pool:
+        render_futures = {
+            pool.submit(render_job, gid, groups[gid], raw_by_gid.get(gid, df_raw.iloc[0:0]), binding, str(work_dir)): gid
+            for gid in sorted(groups)
+        }
+        gs_futures = {}
+        for future in as_completed(render_futures):
+            gid = render_futures[future]
+            try:
+                gs_futures[gs_pool.submit(gs_job, gs, icc, future.result())] = gid
+            except Exception as e:
+                failures[gid] = f"render: {e}"
+        attach_futures = {}
+        for future in as_completed(gs_futures):
+            gid = gs_futures[future]
+            try:
+                attach_futures[pool.submit(attach_job, future.result(), str(out_dir), shared)] = gid
+            except Exception as e:
+                failures[gid] = f"gs: {e}"
+        for future in as_completed(attach_futures):
+            gid = attach_futures[future]
+            try:
+                job = future.result()
+                job["total"] = job["render"] + job["gs"] + job["attach"]
+                results[gid] = job
+            except Exception as e:
+                failures[gid] = f"attach: {e}"
+
+    if not keep_work:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    # 文書ごとの処理時間
+    timings = [results[gid] for gid in sorted(results)]
+    timing_csv = out_dir / "timings.csv"
+    with open(timing_csv, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["gid", "final", "render_sec", "gs_sec", "attach_sec", "total_sec"])
+        for job in timings:
+            writer.writerow([job["gid"], job["final"], f"{job['render']:.3f}", f"{job['gs']:.3f}", f"{job['attach']:.3f}", f"{job['total']:.3f}"])
+    for job in timings:
+        print(f"  gid={job['gid']}: render {job['render']:.3f}s, gs {job['gs']:.3f}s, attach {job['attach']:.3f}s → {Path(job['final']).name}")
+    for gid, reason in sorted(failures.items()):
+        print(f"❌ gid={gid}: {reason}")
+    print(f"✅ バッチ完了: {len(timings)} 件 / 失敗 {len(failures)} 件 / {time.perf_counter() - batch_start:.2f}s（{timing_csv}）")
+    return timings
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description="CSV から PDF/A-3 請求書を作成し XML/CSV を添付する")
+    parser.add_argument("--batch", action="store_true", help="d_NC00 のグループごとに PDF/A-3 を作成する")
+    parser.add_argument("--out-dir", default=str(base / "batch"), help="バッチモードの出力先")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="描画・添付のプロセス数")
+    parser.add_argument("--gs-workers", type=int, default=2, help="同時に実行する Ghostscript の数")
+    parser.add_argument("--keep-work", action="store_true", help="中間 PDF（work/）を残す")
+    parser.add_argument("--csv", default=str(csv_src), help="請求書 CSV（d_NC00 / d_NC39-NC57 / d_NC39-NC61 列を含む）")
+    parser.add_argument("--binding", default=str(core_japan_src), help="ヘッダ日本語化用の binding CSV")
+    parser.add_argument("--xml", default=str(xml_src), help="添付する XML（単一モードのみ。バッチモードはグループごとに作成）")
+    parser.add_argument("--gs", help="Ghostscript 実行ファイル")
+    parser.add_argument("--icc", help="sRGB ICC プロファイル")
+    args = parser.parse_args(argv)
+
+    gs, icc = find_gs_icc(args.gs, args.icc)
+    # ===================== 入力存在チェック =====================
+    csv_path, binding_path, xml_path = Path(args.csv).resolve(), Path(args.binding).resolve(), Path(args.xml).resolve()
+    for p in [csv_path, binding_path] + ([] if args.batch else [xml_path]):
+        if not p.is_file():
+            raise FileNotFoundError(f"Missing input: {p}")
+
+    if args.batch:
+        run_batch(gs, icc, Path(args.out_dir).resolve(), max(1, args.workers), max(1, args.gs_workers), args.keep_work,
+                  csv_path, binding_path)
+    else:
+        run_single(gs, icc, csv_path, binding_path, xml_path)
 
-except Exception as e:
-    print("❌ 添付時エラー:", e)
-    traceback.print_exc()
-    raise
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+UBL インボイスを Schematron（CEN-EN16931-UBL.sch / PEPPOL-EN16931-UBL.sch）で検証する。
+
+  単一ファイル:
+      python PDF_A-3/schematron.py PDF_A-3/Japan_PINT_Invoice_UBL_Example.xml
+  ディレクトリ配下の XML を一括検証（JSON Lines で失敗を出力）:
+      python PDF_A-3/schematron.py outgoing/ --sch PDF_A-3/CEN-EN16931-UBL.sch --workers 8 --out failures.jsonl
+
+.sch は ISO Schematron のスケルトン（lxml.isoschematron 同梱）で XSLT に一度だけ変換し、
+<sch のディレクトリ>/.cache/<name>-<sha256>.xsl に保存する。.sch が変わればハッシュが変わり
+作り直す。変換済みの XSLT はプロセスごとに 1 回だけコンパイルして使い回す。
+
+queryBinding="xslt2" の .sch（EN16931 / PEPPOL は両方とも xslt2）は XPath 2.0 を使うため
+libxslt（lxml.etree.XSLT）では実行できない。この場合は saxonche（SaxonC-HE）が必要:
+    pip install saxonche
+結果は SVRL の failed-assert / successful-report を dict にしたもの。
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from lxml import etree, isoschematron
+
+# 既定の入力
+xml_file = "PDF_A-3/Japan_PINT_Invoice_UBL_Example.xml"
+sch_files = ["PDF_A-3/CEN-EN16931-UBL.sch", "PDF_A-3/PEPPOL-EN16931-UBL.sch"]
+
+CACHE_VERSION = "1"
+CACHE_DIR = ".cache"
+SVRL_NS = isoschematron.SVRL_NS
+
+_compiled = {}     # (sch path, cache_dir, phase) -> (xsl path, query binding) (per process)
+_stylesheets = {}  # xsl path -> compiled stylesheet (per process)
+_saxon = None      # PySaxonProcessor (per process)
+
+
+def read_sch(sch_file):
+    # XML 宣言とルート要素の間のゴミ（PEPPOL-EN16931-UBL.sch の "\n" 文字列など）を除いて読む
+    with open(sch_file, "rb") as f:
+        data = f.read()
+    data = re.sub(rb"^(\s*<\?xml[^>]*\?>)[^<]*", rb"\1\n", data)
+    return etree.fromstring(data).getroottree()
+
+
+def compile_schematron(sch_file, cache_dir=None, phase=None):
+    """
+    .sch を ISO スケルトンで SVRL 出力の XSLT に変換し、キャッシュしたファイルのパスを返す。
+    :return: (xsl_path, query_binding)
+    """
+    compiled_key = (os.path.abspath(sch_file), cache_dir, phase)
+    if compiled_key in _compiled:
+        return _compiled[compiled_key]
+    with open(sch_file, "rb") as f:
+        key = hashlib.sha256(CACHE_VERSION.encode() + f"|{phase}|".encode() + f.read()).hexdigest()[:16]
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(sch_file)), CACHE_DIR)
+    name = os.path.splitext(os.path.basename(sch_file))[0]
+    xsl_path = os.path.join(cache_dir, f"{name}-{key}.xsl")
+
+    sch = read_sch(sch_file)
+    query_binding = (sch.getroot().get("queryBinding") or "xslt").lower()
+    if os.path.isfile(xsl_path):
+        _compiled[compiled_key] = (xsl_path, query_binding)
+        return xsl_path, query_binding
+
+    if query_binding in ("xslt2", "xslt3"):
+        # スケルトン（XSLT 1.0 版）は xslt2 を拒否するので書き換える。
+        # 生成される XSLT の式は XPath 2.0 のままなので Saxon で実行する。
+        sch.getroot().set("queryBinding", "xslt")
+    params = {"allow-foreign": "'true'"}
+    if phase:
+        params["phase"] = etree.XSLT.strparam(phase)
+    doc = isoschematron.iso_dsdl_include(sch)
+    doc = isoschematron.iso_abstract_expand(doc)
+    xsl = isoschematron.iso_svrl_for_xslt1(doc, **params)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    for stale in glob.glob(os.path.join(cache_dir, f"{name}-*.xsl")):
+        os.remove(stale)
+    tmp_path = f"{xsl_path}.{os.getpid()}.tmp"
+    xsl.write(tmp_path, encoding="utf-8", xml_declaration=True)
+    os.replace(tmp_path, xsl_path)
+    _compiled[compiled_key] = (xsl_path, query_binding)
+    return xsl_path, query_binding
+
+
+def saxon_processor():
+    global _saxon
+    if _saxon is None:
+        try:
+            from saxonche import PySaxonProcessor
+        except ImportError:
+            raise RuntimeError('queryBinding="xslt2" の Schematron には saxonche が必要です (pip install saxonche)')
+        _saxon = PySaxonProcessor(license=False)
+    return _saxon
+
+
+def load_stylesheet(sch_file, cache_dir=None):
+    """変換済み XSLT をプロセスごとに 1 回だけコンパイルする"""
+    xsl_path, query_binding = compile_schematron(sch_file, cache_dir)
+    stylesheet = _stylesheets.get(xsl_path)
+    if stylesheet is None:
+        if query_binding in ("xslt2", "xslt3"):
+            stylesheet = saxon_processor().new_xslt30_processor().compile_stylesheet(stylesheet_file=os.path.abspath(xsl_path))
+        else:
+            stylesheet = etree.XSLT(etree.parse(xsl_path))
+        _stylesheets[xsl_path] = stylesheet
+    return stylesheet
+
+
+def run_stylesheet(stylesheet, xml_path):
+    # SVRL（lxml の要素）を返す
+    if isinstance(stylesheet, etree.XSLT):
+        return stylesheet(etree.parse(xml_path)).getroot()
+    svrl = stylesheet.transform_to_string(source_file=os.path.abspath(xml_path))
+    return etree.fromstring(svrl.encode("utf-8"))
+
+
+def svrl_failures(svrl, xml_path, sch_file):
+    """SVRL の failed-assert / successful-report を dict のリストにする"""
+    results = []
+    for node in svrl.iter(f"{{{SVRL_NS}}}failed-assert", f"{{{SVRL_NS}}}successful-report"):
+        text = node.find(f"{{{SVRL_NS}}}text")
+        results.append({
+            "file": xml_path,
+            "schematron": os.path.basename(sch_file),
+            "kind": etree.QName(node).localname,
+            "id": node.get("id"),
+            "flag": node.get("flag"),
+            "location": node.get("location"),
+            "test": node.get("test"),
+            "text": " ".join(text.xpath("string()").split()) if text is not None else "",
+        })
+    return results
+
+
+def validate_invoice(xml_path, sch_list, cache_dir=None):
+    """1 つの XML を全ての .sch で検証し、失敗のリストを返す（空なら合格）"""
+    failures = []
+    for sch_file in sch_list:
+        try:
+            svrl = run_stylesheet(load_stylesheet(sch_file, cache_dir), xml_path)
+            failures.extend(svrl_failures(svrl, xml_path, sch_file))
+        except Exception as e:
+            failures.append({
+                "file": xml_path, "schematron": os.path.basename(sch_file), "kind": "error",
+                "id": None, "flag": "fatal", "location": None, "test": None, "text": str(e),
+            })
+    return failures
+
+
+def validate_chunk(xml_paths, sch_list, cache_dir):
+    """Worker: [(xml_path, failures)]"""
+    return [(xml_path, validate_invoice(xml_path, sch_list, cache_dir)) for xml_path in xml_paths]
+
+
+def init_worker(sch_list, cache_dir):
+    # 各プロセスで XSLT を 1 回だけコンパイルしておく
+    for sch_file in sch_list:
+        load_stylesheet(sch_file, cache_dir)
+
+
+def validate_many(xml_paths, sch_list, workers=None, chunk_size=50, cache_dir=None):
+    """
+    複数の XML をプロセスプールで検証し、終わったチャンクから (xml_path, failures) を返す。
+    .sch → XSLT の変換は親プロセスで先に済ませるので、ワーカーはキャッシュを読むだけ。
+    """
+    for sch_file in sch_list:
+        compile_schematron(sch_file, cache_dir)
+    xml_paths = list(xml_paths)
+    chunks = [xml_paths[i:i + chunk_size] for i in range(0, len(xml_paths), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield from validate_chunk(chunk, sch_list, cache_dir)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(sch_list, cache_dir)) as pool:
+        futures = [pool.submit(validate_chunk, chunk, sch_list, cache_dir) for chunk in chunks]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def collect_xml(paths):
+    xml_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            xml_paths += sorted(glob.glob(os.path.join(path, "**", "*.xml"), recursive=True))
+        else:
+            xml_paths.append(path)
+    return xml_paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate UBL invoices with compiled Schematron")
+    parser.add_argument("paths", nargs="*", default=[xml_file], help="XML files or directories (recursive)")
+    parser.add_argument("--sch", action="append", help=f"Schematron file, repeatable (default: {' '.join(sch_files)})")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=50, help="invoices per worker task")
+    parser.add_argument("--cache-dir", default=None, help="directory for the compiled XSLT (default: <sch dir>/.cache)")
+    parser.add_argument("--fatal-only", action="store_true", help="report only flag=\"fatal\" failures")
+    parser.add_argument("--out", help="JSON lines file for the failures (default: stdout)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    xml_paths = collect_xml(args.paths)
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    invalid = 0
+    try:
+        for xml_path, failures in validate_many(xml_paths, args.sch or sch_files, args.workers, max(1, args.chunk_size), args.cache_dir):
+            if args.fatal_only:
+                failures = [f for f in failures if f["flag"] == "fatal"]
+            if failures:
+                invalid += 1
+            for failure in failures:
+                out.write(json.dumps(failure, ensure_ascii=False) + "\n")
+    finally:
+        if args.out:
+            out.close()
+    print(f"{len(xml_paths)} invoices validated, {invalid} with failures in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    sys.exit(1 if invalid else 0)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+benchmark_specialization.py
+Compares the FSM registry load of specialization.py before and after the single-pass change.
+
+  legacy : csv.DictReader twice (f.seek(0)), check_csv_row + populate_record on every row in both passes
+  table  : Specialization.read_fsm_table (one parse, validated once)
+
+Both sides time the same work: reading, validating and populating the FSM rows. Class and
+property registration (register_classes / register_properties) is left out of both, as it is
+the same code before and after the change.
+
+Example Usage:
+python Python/benchmark_specialization.py
+python Python/benchmark_specialization.py XBRL-GL-2025/FSM/XBRL-GL_2025_FSM_04-07.csv -n 50
+
+MIT License
+
+(c) 2023-2025 SAMBUICHI, Nobuyuki (Sambuichi Professional Engineers Office)
+"""
+import os
+import sys
+import csv
+import glob
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from specialization import Specialization
+
+DEFAULT_FILES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'XBRL-GL-2026', 'xBRL-GL2.0_FSM*.csv')
+
+def new_processor(fsm_file, bsm_file):
+    processor = Specialization(fsm_file, bsm_file, None, None, 'utf-8-sig', False, False)
+    processor.object_class_dict = {}
+    return processor
+
+def legacy_load(processor):
+    # The previous two-pass read, without the registration logic itself
+    rows = 0
+    with open(processor.fsm_file, encoding=processor.encoding, newline='') as f:
+        reader = csv.DictReader(f, fieldnames=processor.header)
+        for _ in range(2):
+            f.seek(0)
+            next(reader)
+            processor.current_class = ''
+            seq = 0
+            for row_number, row in enumerate(reader, start=1):
+                if not row['sequence'] and not row['level']:
+                    continue
+                if '' == row['module']:
+                    continue
+                record = {}
+                for key in processor.header:
+                    if key in row:
+                        record[key] = row[key]
+                    else:
+                        record[key] = ''
+                _, result = processor.check_csv_row(row)
+                if result != "Row is valid.":
+                    break
+                seq, record = processor.populate_record(record, seq)
+                rows += 1
+    return rows
+
+def table_load(processor):
+    # The single-pass read, without the registration logic (same as legacy_load)
+    table = processor.read_fsm_table(processor.fsm_file)
+    return len(table)
+
+def best_of(fn, fsm_file, bsm_file, number):
+    best = None
+    for _ in range(number):
+        processor = new_processor(fsm_file, bsm_file)
+        start = time.perf_counter()
+        fn(processor)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the FSM registry load of specialization.py')
+    parser.add_argument('fsm_files', nargs='*', help=f'FSM CSV files (default: {DEFAULT_FILES})')
+    parser.add_argument('-n', '--number', type=int, default=20, help='repetitions per file (best time is reported)')
+    args = parser.parse_args()
+
+    fsm_files = args.fsm_files or sorted(glob.glob(DEFAULT_FILES))
+    bsm_file = os.path.join(tempfile.gettempdir(), 'benchmark_specialization_BSM.csv')
+
+    print(f"{'file':<32} {'rows':>6} {'legacy ms':>10} {'table ms':>10} {'speedup':>8}")
+    for fsm_file in fsm_files:
+        rows = legacy_load(new_processor(fsm_file, bsm_file)) // 2
+        legacy = best_of(legacy_load, fsm_file, bsm_file, args.number)
+        table = best_of(table_load, fsm_file, bsm_file, args.number)
+        print(f"{os.path.basename(fsm_file):<32} {rows:>6} {1000 * legacy:>10.2f} {1000 * table:>10.2f} {legacy / table:>7.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+"""
+oim_csv.py
+
+OIM xBRL-CSV report writer shared by xml2tidy.py, xBRLGL_StructuredCSV.py and csv2tidy.py.
+
+The column metadata (concept / unit / dimension of each column) is computed once by the caller
+and passed in as Column objects; this module only groups the rows into tables, splits them
+into row-count chunks and writes the CSV files and the JSON metadata.
+
+  report.csv + report.json                       single table (default, same as before)
+  report_header.csv, report_entryDetail.csv ...  split_tables(): one table per innermost dimension
+  report_entryDetail_001.csv, _002.csv ...       chunk_rows > 0: each table in chunks of N rows
+
+Each table gets its own tableTemplates entry; every chunk is listed in "tables" with the
+template of its table so that loaders can read the chunks concurrently.
+
+ReportReader reads such a report back: the JSON metadata is parsed once, the column
+datatypes (LHM / structure / binding file, or the unit of monetary columns) are mapped to
+pandas dtypes, and the tables are loaded lazily, only the requested columns, chunk by chunk.
+
+  reader = ReportReader("OIM/Customer_Invoices.json", load_datatype_map("XBRL_GL_LHM.csv"))
+  for df in reader.iter_chunks("entryDetail", ["entryHeader", "entryDetail", "amount"]):
+      ...
+
+MIT License
+
+(c) 2025 SAMBUICHI, Nobuyuki (Sambuichi Professional Engineers Office)
+"""
+import os
+import csv
+import json
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    import pandas as pd  # ReportReader only
+except ImportError:
+    pd = None
+
+XBRL_CSV = "https://xbrl.org/2021/xbrl-csv"
+HEADER_TABLE = "header"
+
+# xbrli:xxxItemType (structure / LHM) and binding datatypes -> pandas dtype
+# "date" columns are converted with pd.to_datetime after reading; anything else stays str
+DTYPES = {
+    "monetaryItemType": "float64",
+    "decimalItemType": "float64",
+    "floatItemType": "float64",
+    "doubleItemType": "float64",
+    "pureItemType": "float64",
+    "sharesItemType": "float64",
+    "percentItemType": "float64",
+    "integerItemType": "Int64",
+    "intItemType": "Int64",
+    "longItemType": "Int64",
+    "shortItemType": "Int64",
+    "nonNegativeIntegerItemType": "Int64",
+    "positiveIntegerItemType": "Int64",
+    "booleanItemType": "boolean",
+    "QNameItemType": "category",
+    "tokenItemType": "category",
+    "dateItemType": "date",
+    "dateTimeItemType": "date",
+    "Decimal": "float64",
+    "Amount": "float64",
+    "Numeric": "float64",
+    "Quantity": "float64",
+    "Integer": "Int64",
+    "Indicator": "boolean",
+    "Date": "date",
+    "DateTime": "date",
+}
+
+
+@dataclass
+class Column:
+    name: str               # CSV column name
+    concept: str = None     # prefix:name of a fact column
+    unit: str = None        # e.g. iso4217:USD for monetary items
+    dimension: str = None   # typed dimension QName of a key column, e.g. gl-plt:d_cor_entryHeader
+
+    def metadata(self):
+        if not self.concept:
+            return {}
+        dimensions = {"concept": self.concept}
+        if self.unit:
+            dimensions["unit"] = self.unit
+        return {"dimensions": dimensions}
+
+
+@dataclass
+class Table:
+    name: str               # "" for the single table report
+    columns: list           # [Column]
+    rows: list = field(default_factory=list)  # [dict] keyed by Column.name
+
+
+def is_empty(value):
+    return value is None or "" == value or [] == value
+
+
+def single_table(rows, columns):
+    return [Table("", list(columns), rows)]
+
+
+def split_tables(rows, key_columns, fact_columns):
+    """
+    Groups rows by the innermost non-empty key column. Rows without any key go to the header table.
+    Each table keeps only the key and fact columns that have a value in its rows.
+    :param key_columns: [Column] dimension columns, outermost first
+    :param fact_columns: [Column] concept columns
+    """
+    groups = {}
+    for row in rows:
+        name = HEADER_TABLE
+        for column in key_columns:
+            if not is_empty(row.get(column.name)):
+                name = column.name
+        groups.setdefault(name, []).append(row)
+    tables = []
+    for name, group in groups.items():
+        used = set()
+        for row in group:
+            used.update(k for k, v in row.items() if not is_empty(v))
+        columns = [c for c in key_columns + fact_columns if c.name in used]
+        tables.append(Table(name, columns, group))
+    return tables
+
+
+def write_chunk(csv_file, fieldnames, rows, encoding):
+    """Worker: writes one CSV file and returns (csv_file, number of rows)"""
+    with open(csv_file, "w", newline="", encoding=encoding) as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    return csv_file, len(rows)
+
+
+def join_id(*parts):
+    return "_".join(str(p) for p in parts if p)
+
+
+def write_report(
+    csv_file,
+    json_file,
+    document_info,
+    tables,
+    prefix,
+    dimensions=None,
+    chunk_rows=0,
+    workers=None,
+    encoding="utf-8-sig",
+    json_encoding=None,
+):
+    """
+    Writes the tables as xBRL-CSV files and the JSON metadata listing all of them.
+    :param csv_file: report CSV path; tables and chunks are written next to it as <stem>_<table>[_<n>].csv
+    :param prefix: template / table id prefix, e.g. "xbrl-gl" -> xbrl-gl_<table>_template
+    :param dimensions: report level dimensions added to every template (period, entity)
+    :param chunk_rows: maximum rows per CSV file, 0 = no chunking
+    :param workers: number of processes, 1 = write in this process
+    :return: list of the written CSV files
+    """
+    stem = os.path.splitext(csv_file)[0]
+    table_templates = {}
+    json_tables = {}
+    jobs = []
+    for table in tables:
+        template_id = join_id(prefix, table.name, "template")
+        template_dimensions = dict(dimensions or {})
+        for column in table.columns:
+            if column.dimension:
+                template_dimensions[column.dimension] = f"${column.name}"
+        table_templates[template_id] = {
+            "dimensions": template_dimensions,
+            "columns": {column.name: column.metadata() for column in table.columns},
+        }
+        fieldnames = [column.name for column in table.columns]
+        if chunk_rows and len(table.rows) > chunk_rows:
+            chunks = [table.rows[i:i + chunk_rows] for i in range(0, len(table.rows), chunk_rows)]
+        else:
+            chunks = [table.rows]
+        for n, chunk in enumerate(chunks, start=1):
+            number = f"{n:03d}" if len(chunks) > 1 else None
+            path = f"{join_id(stem, table.name, number)}.csv"
+            json_tables[join_id(prefix, table.name, "table", number)] = {
+                "template": template_id,
+                "url": os.path.basename(path),
+            }
+            jobs.append((path, fieldnames, chunk, encoding))
+
+    written = []
+    if workers == 1 or len(jobs) <= 1:
+        for job in jobs:
+            written.append(write_chunk(*job))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(write_chunk, *job) for job in jobs]
+            for future in as_completed(futures):
+                written.append(future.result())
+
+    json_meta = {
+        "documentInfo": document_info,
+        "tableTemplates": table_templates,
+        "tables": json_tables,
+    }
+    with open(json_file, "w", encoding=json_encoding) as f:
+        json.dump(json_meta, f, ensure_ascii=False, indent=4)
+    return [path for path, _ in sorted(written)]
+
+
+def load_datatype_map(structure_file, encoding="utf-8-sig", prefix="cor"):
+    """
+    Reads concept -> datatype from a structure / LHM file (element, datatype columns)
+    or from a csv2tidy binding file (path, datatype columns; concept is <prefix>:<last step of path>).
+    """
+    datatype_map = {}
+    with open(structure_file, encoding=encoding, newline="") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            datatype = (row.get("datatype") or "").strip()
+            if not datatype:
+                continue
+            if row.get("element"):
+                datatype_map[row["element"].strip()] = datatype
+            elif row.get("path"):
+                path = row["path"].strip()
+                datatype_map[f"{prefix}:{path[1 + path.rfind('/'):]}"] = datatype
+    return datatype_map
+
+
+def pandas_dtype(datatype):
+    if not datatype:
+        return None
+    return DTYPES.get(datatype.split(":")[-1])
+
+
+class ReportReader:
+    """
+    Lazy, typed reader of an xBRL-CSV report written by write_report().
+    Tables are named after their template without the prefix (header, entryDetail ...);
+    a single table report has the table "".
+    prefix is the one given to write_report(); it is matched as a whole, so it may contain "_".
+    """
+
+    def __init__(self, json_file, datatype_map=None, encoding="utf-8-sig", dimension_dtype="Int64", prefix="xbrl-gl"):
+        if pd is None:
+            raise RuntimeError("ReportReader requires pandas (pip install pandas)")
+        self.json_file = json_file
+        self.base_dir = os.path.dirname(os.path.abspath(json_file))
+        self.encoding = encoding
+        with open(json_file, encoding=encoding) as f:
+            json_meta = json.load(f)
+        self.document_info = json_meta.get("documentInfo", {})
+
+        self.columns = {}  # table -> [Column]
+        self.files = {}    # table -> [csv path]
+        self.dtypes = {}   # table -> {column: dtype}
+        self.dates = {}    # table -> [column]
+        names = {}
+        for template_id, template in json_meta.get("tableTemplates", {}).items():
+            # join_id(prefix, table.name, "template")
+            name = template_id.removesuffix("template").rstrip("_")
+            name = "" if name == prefix else name.removeprefix(f"{prefix}_")
+            names[template_id] = name
+            dimension_columns = {
+                value[1:]: key
+                for key, value in template.get("dimensions", {}).items()
+                if isinstance(value, str) and value.startswith("$")
+            }
+            columns = []
+            for column_name, metadata in template.get("columns", {}).items():
+                dimensions = metadata.get("dimensions", {})
+                columns.append(Column(
+                    column_name,
+                    concept=dimensions.get("concept"),
+                    unit=dimensions.get("unit"),
+                    dimension=dimension_columns.get(column_name),
+                ))
+            self.columns[name] = columns
+            self.files[name] = []
+            dtypes, dates = {}, []
+            for column in columns:
+                if column.dimension:
+                    dtype = dimension_dtype
+                elif column.unit:
+                    dtype = "float64"
+                else:
+                    dtype = pandas_dtype((datatype_map or {}).get(column.concept))
+                if "date" == dtype:
+                    dates.append(column.name)
+                    dtype = None
+                dtypes[column.name] = dtype or str
+            self.dtypes[name] = dtypes
+            self.dates[name] = dates
+        for table in json_meta.get("tables", {}).values():
+            name = names.get(table.get("template"))
+            if name is not None:
+                self.files[name].append(os.path.join(self.base_dir, table["url"]))
+
+    def table_names(self):
+        return list(self.columns)
+
+    def resolve(self, table):
+        if table is None:
+            if 1 != len(self.columns):
+                raise ValueError(f"Report has tables {self.table_names()}, specify one.")
+            table = self.table_names()[0]
+        if table not in self.columns:
+            raise KeyError(f"Table {table} not found in {self.json_file}")
+        return table
+
+    def iter_chunks(self, table=None, columns=None, chunksize=100_000):
+        """
+        Yields DataFrames of at most chunksize rows from each CSV file of the table.
+        Only the listed columns are parsed; the files are memory mapped.
+        """
+        table = self.resolve(table)
+        dtypes = self.dtypes[table]
+        usecols = [c for c in columns if c in dtypes] if columns else list(dtypes)
+        dates = [c for c in self.dates[table] if c in usecols]
+        for csv_file in self.files[table]:
+            # chunk files of a split table keep only the columns used in the table
+            reader = pd.read_csv(
+                csv_file,
+                usecols=lambda c: c in usecols,
+                dtype={c: dtypes[c] for c in usecols},
+                encoding=self.encoding,
+                keep_default_na=False,
+                na_values=[""],
+                memory_map=True,
+                chunksize=chunksize,
+            )
+            with reader:
+                for df in reader:
+                    for column in dates:
+                        if column in df.columns:
+                            df[column] = pd.to_datetime(df[column], errors="coerce", format="ISO8601")
+                    yield df
+
+    def read(self, table=None, columns=None, chunksize=100_000):
+        """Reads the whole table (all of its chunk files) into one DataFrame"""
+        frames = list(self.iter_chunks(table, columns, chunksize))
+        if not frames:
+            return pd.DataFrame(columns=columns or [c.name for c in self.columns[self.resolve(table)]])
+        return pd.concat(frames, ignore_index=True)
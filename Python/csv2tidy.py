@@ -44,6 +44,9 @@ from datetime import datetime
 from pathlib import Path
 from collections import defaultdict
 
+from common import oim_csv
+from common.oim_csv import Column
+
 SEP = os.sep
 TRACE = None
 DEBUG = None
@@ -1261,7 +1264,11 @@ def transform_id(id):
     return id
 
 
-def tidy_to_csv(data, filename, encoding="utf-8-sig"):
+def tidy_rows(data):
+    """
+    Converts a tidy_data dictionary to flattened rows.
+    Returns the CSV header and the rows having at least one data column.
+    """
     global dim_level
     global dim_line
 
@@ -1279,30 +1286,68 @@ def tidy_to_csv(data, filename, encoding="utf-8-sig"):
     sorted_header = sorted(data_header, key=lambda item: semantic_sort_dict[item])
     header = dim_header + sorted_header
 
-    records = processor.get_records()
+    rows = []
+    for record in processor.get_records():
+        row = {}
+        data_exists = False
+        for id, d in record.items():
+            if id in dim_line:
+                id_ = re.sub(r"\[.*?\]", "", id)
+                if d and "0" != str(d):
+                    row[id_] = d
+            else:
+                data_exists = True
+                row[id] = d
+        if data_exists:
+            rows.append(row)
+
+    return header, rows
+
+
+def tidy_to_csv(data, filename, encoding="utf-8-sig"):
+    header, rows = tidy_rows(data)
     with open(filename, "w", newline="", encoding=encoding) as f:
         writer = csv.DictWriter(f, fieldnames=header)
         writer.writeheader()
-        for record in records:
-            row = {}
-            data_exists = False
-            for id, d in record.items():
-                if id in dim_line:
-                    id_ = re.sub(r"\[.*?\]", "", id)
-                    if d and "0" != str(d):
-                        row[id_] = d
-                else:
-                    data_exists = True
-                    row[id] = d
-            if data_exists:
-                writer.writerow(row)
+        writer.writerows(rows)
 
     return header
 
 
-def fill_json_meta(out_csv, out_json, header):
+def column_metadata(header):
+    """
+    Precomputes the xBRL-CSV column metadata of the tidy CSV header.
+    Columns ending with _<number> are concepts, the others are typed dimensions.
+    Returns (key_columns, fact_columns).
+    """
+    # binding by the last step of its path (the first one wins)
+    bindings = {}
+    for x in binding_dict.values():
+        path = x["path"]
+        if len(path) > 0:
+            bindings.setdefault(path[1 + path.rindex("/") :], x)
+
+    key_columns = []
+    fact_columns = []
+    for column_path in header:
+        if not re.match("^.*_[0-9]+$", column_path):
+            key_columns.append(Column(column_path, dimension=f"cor:d_{column_path}"))
+            continue
+        column = Column(column_path, concept=f"cor:{column_path}")
+        binding = bindings.get(column_path)
+        if binding and "Decimal" == binding["datatype"] and "Amount" in binding["term"]:
+            column.unit = "iso4217:JPY"
+        fact_columns.append(column)
+    return key_columns, fact_columns
+
+
+def fill_json_meta(out_csv, out_json, header, rows, split=False, chunk_rows=0, workers=None):
+    """
+    Writes the tidy rows as xBRL-CSV table(s) and the JSON metadata.
+    split: one table per dimension, chunk_rows: maximum rows per CSV file, workers: number of processes
+    """
     document_info = {
-        "documentType": "https://xbrl.org/2021/xbrl-csv",
+        "documentType": oim_csv.XBRL_CSV,
         "namespaces": {
             "cor": "http://www.iso.org/iso21926",
             "ns0": "http://www.example.com",
@@ -1316,74 +1361,27 @@ def fill_json_meta(out_csv, out_json, header):
         "taxonomy": ["../../taxonomy/core.xsd"],
     }
 
-    table_templates = {}
-    cor_template = {"columns": {}, "dimensions": {}}
-    dimensions = []
-    sorted_columns = {}
-
-    for column_path in header:
-        binding = None
-        datatype = None
-        is_monetary = False
-        for x in binding_dict.values():
-            path = x["path"]
-            if len(path) > 0 and column_path == path[1 + path.rindex("/") :]:
-                binding = x
-                datatype = binding["datatype"]
-                term = binding["term"]
-                if 'Decimal' == datatype and 'Amount' in term:
-                    is_monetary = True
-                break
-
-        if binding is None:
-            data = [
-                x
-                for x in semantic_dict.values()
-                if x["path"] is not None and x["path"].endswith(column_path)
-            ]
-            if len(data) > 0 and "representation" in data[0]:
-                datatype = data[0]["representation"]
-
-        if not re.match("^.*_[0-9]+$", column_path):
-            cor_template["columns"][column_path] = {}
-            dimensions.append(column_path)
-            sorted_columns[column_path] = cor_template["columns"][column_path]
-        else:
-            concept_name = column_path
-            dimensions_obj = {"concept": f"cor:{concept_name}"}
-            if is_monetary:
-                dimensions_obj["unit"] = "iso4217:JPY"
-            sorted_columns[column_path] = {"dimensions": dimensions_obj}
-    sorted_columns_keys = sorted(sorted_columns.keys())
-    for key in sorted_columns_keys:
-        cor_template["columns"][key] = sorted_columns[key]
-    for dimension in dimensions:
-        cor_template["dimensions"][f"cor:d_{dimension}"] = f"${dimension}"
-    cor_template["dimensions"]["period"] = "2024-03-01T00:00:00"
-    cor_template["dimensions"]["entity"] = "ns0:Example co."
-
-    table_templates["iso21926_template"] = cor_template
-
-    tables = {}
-    cor_table = {
-        "template": "iso21926_template",
-        "url": out_csv[1 + out_csv.rindex(SEP) :],
-    }
-    tables["iso21926_table"] = cor_table
-
-    json_obj = {
-        "documentInfo": document_info,
-        "tableTemplates": table_templates,
-        "tables": tables,
-    }
-
-    if DEBUG:
-        json_string = json.dumps(json_obj, indent=4)
-        print(json_string)
-
-    with open(out_json, "w") as file:
-        json.dump(json_obj, file, indent=4)
-        trace_print(f"JSON object written to {out_json}")
+    key_columns, fact_columns = column_metadata(header)
+    if split:
+        tables = oim_csv.split_tables(rows, key_columns, fact_columns)
+    else:
+        tables = oim_csv.single_table(rows, key_columns + fact_columns)
+
+    csv_files = oim_csv.write_report(
+        out_csv,
+        out_json,
+        document_info,
+        tables,
+        "iso21926",
+        dimensions={"period": "2024-03-01T00:00:00", "entity": "ns0:Example co."},
+        chunk_rows=chunk_rows,
+        workers=workers,
+        encoding=encoding,
+        json_encoding="utf-8",  # JSON metadata never has a BOM, whatever the CSV encoding
+    )
+    for csv_file in csv_files:
+        trace_print(f"CSV written to {csv_file}")
+    trace_print(f"JSON object written to {out_json}")
 
 
 def main():
@@ -1409,6 +1407,9 @@ def main():
     parser.add_argument("-m", "--lhm_file", required=True, help="LHM file path")
     parser.add_argument("-b", "--binding_file", required=True, help="Binding file path")
     parser.add_argument("-e", "--encoding", required=False, default="utf-8-sig", help="File encoding, default is utf-8-sig")
+    parser.add_argument("--split-tables", required=False, action="store_true", help="Write one xBRL-CSV table per dimension")
+    parser.add_argument("--chunk-rows", required=False, type=int, default=0, help="Maximum rows per CSV file, 0 = no chunking")
+    parser.add_argument("--workers", required=False, type=int, default=None, help="Number of processes writing the CSV files")
     parser.add_argument("-t", "--trace", required=False, action="store_true")
     parser.add_argument("-d", "--debug", required=False, action="store_true")
 
@@ -1493,9 +1494,9 @@ def main():
 
     print(f"\n** tidy data to {out_file}")
 
-    header = tidy_to_csv(converter.tidy_data, out_file, encoding)
+    header, rows = tidy_rows(converter.tidy_data)
 
-    fill_json_meta(out_file, out_json, header)
+    fill_json_meta(out_file, out_json, header, rows, args.split_tables, max(0, args.chunk_rows), args.workers)
 
     print(f"** END converted {data_file} to {out_file}")
 
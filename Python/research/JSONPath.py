@@ -1,5 +1,31 @@
-from jsonpath_ng import parse
+"""
+JSONPath.py
+
+Compiled, eval-free JSONPath engine for the JSON hierarchies produced by
+TidyDataParser.process_hierarchy / csv2tidy.
+
+A query is tokenized and parsed once into an operator tree (segments of
+selectors; filters as comparison / logical nodes) and the compiled query is
+cached, so repeated queries over many documents do not re-parse anything.
+Evaluation walks the document segment by segment with explicit lists and
+stacks instead of Python recursion, so deep or large hierarchies do not hit
+the recursion limit, and filter expressions never go through eval().
+
+Supported syntax:
+    $                       root
+    .name  ['name']         child member
+    .*  [*]                 wildcard
+    ..name  ..*  ..[...]    descendants (document order)
+    [0]  [-1]               index
+    [start:end:step]        slice
+    [0,2]  ['a','b']        union
+    [?(@.price < 10)]       filter (also [?@.price<10])
+        operators: == != < <= > >= && || ! ( )
+        operands:  @.path, $.path, numbers, 'strings', "strings", true, false, null
+        @.path alone tests existence
+"""
 import re
+from functools import lru_cache
 
 # Sample JSON data
 data = {
@@ -37,125 +63,529 @@ data = {
 }
 
 
-def flatten(results):
-    """Flatten nested lists into a single list."""
-    flat = []
-    for item in results:
-        if isinstance(item, list):
-            flat.extend(flatten(item))
+class JSONPathError(ValueError):
+    """Raised when a JSONPath query cannot be parsed."""
+
+
+# Marker for "no value" (missing member / non-singular path) in filter comparisons
+NOTHING = object()
+
+"""
+Tokenizer
+"""
+TOKEN_PATTERN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<dotdot>\.\.)
+  | (?P<dot>\.)
+  | (?P<root>\$)
+  | (?P<current>@)
+  | (?P<filter>\?)
+  | (?P<lbracket>\[)
+  | (?P<rbracket>\])
+  | (?P<lparen>\()
+  | (?P<rparen>\))
+  | (?P<comma>,)
+  | (?P<colon>:)
+  | (?P<star>\*)
+  | (?P<op>==|!=|<=|>=|<|>|&&|\|\||!)
+  | (?P<number>-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?)
+  | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<name>[A-Za-z_\u0080-\uffff][A-Za-z0-9_\-\u0080-\uffff]*)
+""", re.VERBOSE)
+
+ESCAPES = {"b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t", "/": "/", "\\": "\\", "'": "'", '"': '"'}
+
+
+def unquote(text):
+    body = text[1:-1]
+    if "\\" not in body:
+        return body
+    return re.sub(
+        r"\\(u[0-9a-fA-F]{4}|.)",
+        lambda m: chr(int(m.group(1)[1:], 16)) if m.group(1).startswith("u") else ESCAPES.get(m.group(1), m.group(1)),
+        body
+    )
+
+
+def tokenize(query):
+    tokens = []
+    position = 0
+    while position < len(query):
+        match = TOKEN_PATTERN.match(query, position)
+        if not match:
+            raise JSONPathError(f"Unexpected character {query[position]!r} at {position} in {query!r}")
+        kind = match.lastgroup
+        if "space" != kind:
+            tokens.append((kind, match.group(kind), position))
+        position = match.end()
+    tokens.append(("end", "", position))
+    return tokens
+
+"""
+Selectors (operator tree for path segments)
+"""
+class NameSelector:
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def select(self, node, root, out):
+        if isinstance(node, dict) and self.name in node:
+            out.append(node[self.name])
+
+    def __repr__(self):
+        return f"Name({self.name!r})"
+
+
+class WildcardSelector:
+    __slots__ = ()
+
+    def select(self, node, root, out):
+        if isinstance(node, dict):
+            out.extend(node.values())
+        elif isinstance(node, list):
+            out.extend(node)
+
+    def __repr__(self):
+        return "Wildcard()"
+
+
+class IndexSelector:
+    __slots__ = ("index",)
+
+    def __init__(self, index):
+        self.index = index
+
+    def select(self, node, root, out):
+        if isinstance(node, list) and -len(node) <= self.index < len(node):
+            out.append(node[self.index])
+
+    def __repr__(self):
+        return f"Index({self.index})"
+
+
+class SliceSelector:
+    __slots__ = ("slice",)
+
+    def __init__(self, start, stop, step):
+        if 0 == step:
+            raise JSONPathError("Slice step must not be 0")
+        self.slice = slice(start, stop, step)
+
+    def select(self, node, root, out):
+        if isinstance(node, list):
+            out.extend(node[self.slice])
+
+    def __repr__(self):
+        return f"Slice({self.slice.start}:{self.slice.stop}:{self.slice.step})"
+
+
+class FilterSelector:
+    __slots__ = ("expression",)
+
+    def __init__(self, expression):
+        self.expression = expression
+
+    def select(self, node, root, out):
+        if isinstance(node, dict):
+            children = node.values()
+        elif isinstance(node, list):
+            children = node
+        else:
+            return
+        test = self.expression.test
+        out.extend(child for child in children if test(child, root))
+
+    def __repr__(self):
+        return f"Filter({self.expression!r})"
+
+
+class Segment:
+    __slots__ = ("selectors", "descendant")
+
+    def __init__(self, selectors, descendant=False):
+        self.selectors = selectors
+        self.descendant = descendant
+
+    def apply(self, nodes, root):
+        if self.descendant:
+            nodes = descendants(nodes)
+        out = []
+        selectors = self.selectors
+        if 1 == len(selectors):
+            select = selectors[0].select
+            for node in nodes:
+                select(node, root, out)
         else:
-            flat.append(item)
-    return flat
+            for node in nodes:
+                for selector in selectors:
+                    selector.select(node, root, out)
+        return out
 
+    def __repr__(self):
+        return f"{'..' if self.descendant else ''}{self.selectors!r}"
 
-def recursive_descent(data, key=None, handle_normal=True):
+
+def descendants(nodes):
     """
-    Traverse the JSON structure recursively to find all instances of a given key.
-    If no key is provided, collect all elements (for recursive wildcards like $..*).
+    Return each node followed by all of its descendants in document order.
+    An explicit stack replaces recursion, so arbitrarily deep hierarchies are safe.
     """
-    if handle_normal and key:
-        query = f"$..{key}" if key != "*" else "$..*"
+    out = []
+    stack = list(reversed(nodes))
+    while stack:
+        node = stack.pop()
+        out.append(node)
+        if isinstance(node, dict):
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return out
+
+"""
+Filter expressions
+"""
+class Literal:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def evaluate(self, current, root):
+        return self.value
+
+    def test(self, current, root):
+        return bool(self.value)
+
+    def __repr__(self):
+        return repr(self.value)
+
+
+class PathOperand:
+    """@.path or $.path inside a filter; compares by its single value."""
+    __slots__ = ("relative", "segments")
+
+    def __init__(self, relative, segments):
+        self.relative = relative
+        self.segments = segments
+
+    def nodes(self, current, root):
+        nodes = [current if self.relative else root]
+        for segment in self.segments:
+            if not nodes:
+                break
+            nodes = segment.apply(nodes, root)
+        return nodes
+
+    def evaluate(self, current, root):
+        nodes = self.nodes(current, root)
+        return nodes[0] if 1 == len(nodes) else NOTHING
+
+    def test(self, current, root):
+        # Existence test
+        return 0 < len(self.nodes(current, root))
+
+    def __repr__(self):
+        return f"{'@' if self.relative else '$'}{self.segments!r}"
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def equals(left, right):
+    if is_number(left) and is_number(right):
+        return left == right
+    if type(left) is not type(right):
+        return False
+    return left == right
+
+
+def less_than(left, right):
+    if is_number(left) and is_number(right):
+        return left < right
+    if isinstance(left, str) and isinstance(right, str):
+        return left < right
+    return False
+
+
+COMPARISONS = {
+    "==": lambda left, right: equals(left, right),
+    "!=": lambda left, right: not equals(left, right),
+    "<": lambda left, right: less_than(left, right),
+    ">": lambda left, right: less_than(right, left),
+    "<=": lambda left, right: less_than(left, right) or equals(left, right),
+    ">=": lambda left, right: less_than(right, left) or equals(left, right),
+}
+
+
+class Comparison:
+    __slots__ = ("op", "left", "right", "compare")
+
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+        self.compare = COMPARISONS[op]
+
+    def test(self, current, root):
+        return self.compare(self.left.evaluate(current, root), self.right.evaluate(current, root))
+
+    def __repr__(self):
+        return f"({self.left!r} {self.op} {self.right!r})"
+
+
+class And:
+    __slots__ = ("operands",)
+
+    def __init__(self, operands):
+        self.operands = operands
+
+    def test(self, current, root):
+        return all(operand.test(current, root) for operand in self.operands)
+
+    def __repr__(self):
+        return "(" + " && ".join(repr(operand) for operand in self.operands) + ")"
+
+
+class Or:
+    __slots__ = ("operands",)
+
+    def __init__(self, operands):
+        self.operands = operands
+
+    def test(self, current, root):
+        return any(operand.test(current, root) for operand in self.operands)
+
+    def __repr__(self):
+        return "(" + " || ".join(repr(operand) for operand in self.operands) + ")"
+
+
+class Not:
+    __slots__ = ("operand",)
+
+    def __init__(self, operand):
+        self.operand = operand
+
+    def test(self, current, root):
+        return not self.operand.test(current, root)
+
+    def __repr__(self):
+        return f"!{self.operand!r}"
+
+"""
+Parser
+"""
+class Parser:
+    def __init__(self, query):
+        self.query = query
+        self.tokens = tokenize(query)
+        self.position = 0
+
+    def peek(self, offset=0):
+        return self.tokens[self.position + offset]
+
+    def next(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def expect(self, kind):
+        token = self.next()
+        if kind != token[0]:
+            raise JSONPathError(f"Expected {kind} but found {token[1]!r} at {token[2]} in {self.query!r}")
+        return token
+
+    def error(self, token):
+        return JSONPathError(f"Unexpected {token[1] or 'end of query'!r} at {token[2]} in {self.query!r}")
+
+    def parse_query(self):
+        self.expect("root")
+        segments = self.parse_segments()
+        token = self.peek()
+        if "end" != token[0]:
+            raise self.error(token)
+        return segments
+
+    def parse_segments(self):
+        segments = []
+        while True:
+            kind = self.peek()[0]
+            if "dot" == kind:
+                self.next()
+                segments.append(Segment([self.parse_member()]))
+            elif "dotdot" == kind:
+                self.next()
+                if "lbracket" == self.peek()[0]:
+                    segments.append(Segment(self.parse_bracket(), descendant=True))
+                else:
+                    segments.append(Segment([self.parse_member()], descendant=True))
+            elif "lbracket" == kind:
+                segments.append(Segment(self.parse_bracket()))
+            else:
+                return segments
+
+    def parse_member(self):
+        token = self.next()
+        if "star" == token[0]:
+            return WildcardSelector()
+        if "name" == token[0]:
+            return NameSelector(token[1])
+        raise self.error(token)
+
+    def parse_bracket(self):
+        self.expect("lbracket")
+        selectors = [self.parse_selector()]
+        while "comma" == self.peek()[0]:
+            self.next()
+            selectors.append(self.parse_selector())
+        self.expect("rbracket")
+        return selectors
+
+    def parse_selector(self):
+        token = self.peek()
+        kind = token[0]
+        if "star" == kind:
+            self.next()
+            return WildcardSelector()
+        if "string" == kind:
+            self.next()
+            return NameSelector(unquote(token[1]))
+        if "filter" == kind:
+            self.next()
+            return FilterSelector(self.parse_or())
+        if kind in ("number", "colon"):
+            return self.parse_index_or_slice()
+        raise self.error(token)
+
+    def parse_integer(self):
+        token = self.expect("number")
         try:
-            jsonpath_expr = parse(query)
-            result = [match.value for match in jsonpath_expr.find(data)]
-            return result
-        except Exception:
-            pass  # Fallback to explicit handling if JSONPath fails
-
-    results = []
-    if isinstance(data, dict):
-        for k, v in data.items():
-            if key is None or k == key:
-                results.append(v)
-            results.extend(recursive_descent(v, key, handle_normal=False))
-    elif isinstance(data, list):
-        for item in data:
-            results.extend(recursive_descent(item, key, handle_normal=False))
-    return results
-
-
-def manual_filter(data, condition):
-    """
-    Apply a manual filter condition (e.g., @.price < 10) to a list of items.
-    Safely evaluates the condition for dictionary items.
-    """
-    filtered = []
-    for item in data:
-        if isinstance(item, dict):
-            try:
-                # Replace @.key with item['key'] dynamically for safe access
-                condition_replaced = re.sub(r"@\.(\w+)", r'item["\1"]', condition)
-                if eval(condition_replaced):
-                    filtered.append(item)
-            except (KeyError, AttributeError, SyntaxError):
-                # Skip items where the condition cannot be applied
-                pass
-    return filtered
+            return int(token[1])
+        except ValueError:
+            raise JSONPathError(f"Index must be an integer: {token[1]!r} in {self.query!r}")
+
+    def parse_index_or_slice(self):
+        start = self.parse_integer() if "number" == self.peek()[0] else None
+        if "colon" != self.peek()[0]:
+            if start is None:
+                raise self.error(self.peek())
+            return IndexSelector(start)
+        self.next()
+        stop = self.parse_integer() if "number" == self.peek()[0] else None
+        step = 1
+        if "colon" == self.peek()[0]:
+            self.next()
+            if "number" == self.peek()[0]:
+                step = self.parse_integer()
+        return SliceSelector(start, stop, step)
+
+    # logical-or  := logical-and ( '||' logical-and )*
+    def parse_or(self):
+        operands = [self.parse_and()]
+        while ("op", "||") == self.peek()[:2]:
+            self.next()
+            operands.append(self.parse_and())
+        return operands[0] if 1 == len(operands) else Or(operands)
+
+    # logical-and := basic ( '&&' basic )*
+    def parse_and(self):
+        operands = [self.parse_basic()]
+        while ("op", "&&") == self.peek()[:2]:
+            self.next()
+            operands.append(self.parse_basic())
+        return operands[0] if 1 == len(operands) else And(operands)
+
+    # basic := '!' basic | '(' logical-or ')' | comparable [ op comparable ]
+    def parse_basic(self):
+        token = self.peek()
+        if ("op", "!") == token[:2]:
+            self.next()
+            return Not(self.parse_basic())
+        if "lparen" == token[0]:
+            self.next()
+            expression = self.parse_or()
+            self.expect("rparen")
+            return expression
+        left = self.parse_comparable()
+        token = self.peek()
+        if "op" == token[0] and token[1] in COMPARISONS:
+            self.next()
+            return Comparison(token[1], left, self.parse_comparable())
+        return left
+
+    def parse_comparable(self):
+        token = self.next()
+        kind, text = token[0], token[1]
+        if "current" == kind:
+            return PathOperand(True, self.parse_segments())
+        if "root" == kind:
+            return PathOperand(False, self.parse_segments())
+        if "number" == kind:
+            return Literal(float(text) if any(ch in text for ch in ".eE") else int(text))
+        if "string" == kind:
+            return Literal(unquote(text))
+        if "name" == kind and text in ("true", "false", "null"):
+            return Literal({"true": True, "false": False, "null": None}[text])
+        raise self.error(token)
+
+
+class CompiledPath:
+    """A parsed JSONPath query; reusable across any number of documents."""
+    __slots__ = ("query", "segments")
+
+    def __init__(self, query, segments):
+        self.query = query
+        self.segments = segments
+
+    def find(self, document):
+        nodes = [document]
+        for segment in self.segments:
+            if not nodes:
+                break
+            nodes = segment.apply(nodes, document)
+        return nodes
+
+    def __repr__(self):
+        return f"CompiledPath({self.query!r}, {self.segments!r})"
+
+
+@lru_cache(maxsize=1024)
+def compile_path(query):
+    """Parse query once; later calls with the same string reuse the compiled tree."""
+    return CompiledPath(query, Parser(query.strip()).parse_query())
 
 
 def process_query(query, data):
-    pattern = r"\[\d*(:\d*)?(:\d*)?\]"
-    match = re.fullmatch(pattern, query) 
-    unsupported = any(op in query for op in [":", "..", "[?"])
-    if match or not unsupported:
-        jsonpath_expr = parse(query)
-        result = [match.value for match in jsonpath_expr.find(data)]
-        return result
-    elif "$..*"==query:
-        return recursive_descent(data)
     """
     Process a JSONPath query, supporting normal processing, recursive descent,
     slicing, and filtering.
     """
-    if "$.." in query:
-        if "[?" in query:
-            # Handle filtering
-            key = query.split("..")[-1].split("[")[0]
-            condition = query.split("[?")[-1].rstrip("]")
-            items = flatten(recursive_descent(data, key))
-            return manual_filter(items, condition)
-        elif "[" in query and ":" in query:
-            # Handle slicing
-            key = query.split("..")[-1].split("[")[0]
-            slice_expr = query.split("[")[-1].rstrip("]")
-            start, end = (slice_expr.split(":") + [None])[:2]
-            start = int(start) if start else None
-            end = int(end) if end else None
-            items = flatten(recursive_descent(data, key))
-            return items[start:end]
-        elif "[" in query:
-            # Handle single index
-            key = query.split("..")[-1].split("[")[0]
-            index = int(query.split("[")[-1].rstrip("]"))
-            items = flatten(recursive_descent(data, key))
-            return [items[index]] if -len(items) <= index < len(items) else []
-        else:
-            # Handle recursive descent without filters
-            key = query.split("..")[-1].split("[")[0]
-            return flatten(recursive_descent(data, key))
-    else:
-        # Normal JSONPath processing
-        try:
-            jsonpath_expr = parse(query)
-            return [match.value for match in jsonpath_expr.find(data)]
-        except Exception as e:
-            return f"Error: {e}"
-
-# Test cases
-queries = [
-    {"query": "$.store.book[*]", "description": "1. All books"},
-    {"query": "$.store.book[*].author", "description": "2. Authors of all books"},
-    {"query": "$..author", "description": "3. All authors in the document (recursive descent)"},
-    {"query": "$..book[2]", "description": "4. The third book"},
-    {"query": "$..book[-1]", "description": "5. The last book (negative index)"},
-    {"query": "$..book[:2]", "description": "6. The first two books"},
-    {"query": "$..book[1:3]", "description": "7. The second and the third books"},
-    {"query": "$.store..price", "description": "8. All prices in a store"},
-    {"query": "$..book[?@.price<10]", "description": "9. Filter books cheaper than 10"},
-    {"query": "$..*", "description": "10. All elements recursively"},
-]
-
-for test in queries:
-    print(f"Test: {test['description']}")
-    result = process_query(test["query"], data)
-    print(f"Query: {test['query']}\nResult: {result}\n")
+    try:
+        return compile_path(query).find(data)
+    except JSONPathError as e:
+        return f"Error: {e}"
+
+
+if __name__ == "__main__":
+    # Test cases
+    queries = [
+        {"query": "$.store.book[*]", "description": "1. All books"},
+        {"query": "$.store.book[*].author", "description": "2. Authors of all books"},
+        {"query": "$..author", "description": "3. All authors in the document (recursive descent)"},
+        {"query": "$..book[2]", "description": "4. The third book"},
+        {"query": "$..book[-1]", "description": "5. The last book (negative index)"},
+        {"query": "$..book[:2]", "description": "6. The first two books"},
+        {"query": "$..book[1:3]", "description": "7. The second and the third books"},
+        {"query": "$.store..price", "description": "8. All prices in a store"},
+        {"query": "$..book[?@.price<10]", "description": "9. Filter books cheaper than 10"},
+        {"query": "$..*", "description": "10. All elements recursively"},
+        {"query": "$..book[?(@.isbn && @.price > 10)].title", "description": "11. Titles of books with ISBN over 10"},
+        {"query": "$.store.book[?(@.category == 'fiction' || !@.isbn)]['title','price']", "description": "12. Union and logical filter"},
+    ]
+
+    for test in queries:
+        print(f"Test: {test['description']}")
+        result = process_query(test["query"], data)
+        print(f"Query: {test['query']}\nResult: {result}\n")
@@ -1,10 +1,11 @@
 import re
+import os
 import csv
 import time
-from googletrans import Translator
-
-# Initialize the translator
-translator = Translator()
+import sqlite3
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Translation dictionary for cell values
 translation_dict = {
@@ -351,6 +352,7 @@ company_names = set()
 trading_partner_names = set()
 cost_center_names = set()
 description_pattern = set()
+undefined_names = set()  # 警告済みの translation_dict 未定義名（collect と翻訳の 2 回で重複させない）
 
 def translate_date(jp_date):
     # Match the Japanese date format using regular expression
@@ -540,7 +542,9 @@ def process_description(description):
             entity = translation_dict[entity_str]
         else:
             entity = entity_str
-            print(f"- process_description {entity_str} is not defined in translation_dict.")
+            if entity_str not in undefined_names:
+                undefined_names.add(entity_str)
+                print(f"- process_description {entity_str} is not defined in translation_dict.")
         if '他' in description:
             other = ' Other'
         else:
@@ -550,19 +554,13 @@ def process_description(description):
     if translated_description:
         return translated_description
     text = description
-    try:
-        if None is text or '' == text:
-            return ''
-        time.sleep(0.2)
-        if text in translation_dict:
-            return translation_dict[text]
-        text = clean_text(text)
-        # Use Google Translate to translate text
-        translated = translator.translate(text, src='ja', dest='en').text
-        return translated
-    except Exception as e:
-        print(f"- Translation error in process_description for '{text}': {e}")
-        return text
+    if None is text or '' == text:
+        return ''
+    if text in translation_dict:
+        return translation_dict[text]
+    text = clean_text(text)
+    # Translate with the cache / backend
+    return lookup_translation(text)
 
 def clean_description(description):
     pattern1 = r'([0-9０-９]{1,2}月[0-9０-９]{1,2}日)伝票[NoＮｏ]+([0-9０-９]+)(.+)'
@@ -581,7 +579,187 @@ def clean_description(description):
     text = description
     return text
 
-# Function to translate text using the translation dictionary and Google Translate
+# ---------------------------------------------------------------------------
+# 翻訳レイヤー
+# 一意な文字列を先に集め、SQLite の永続キャッシュを引き、未登録の文字列だけを
+# バックエンドへまとめて（並列・レート制限付きで）送る。
+# ---------------------------------------------------------------------------
+class TranslationCache:
+    """(backend, src, dest, text) -> translated を保存する SQLite キャッシュ"""
+    def __init__(self, path, backend, src='ja', dest='en'):
+        self.path = path
+        self.key = (backend, src, dest)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS translation ("
+            "backend TEXT, src TEXT, dest TEXT, text TEXT, translated TEXT, "
+            "PRIMARY KEY (backend, src, dest, text))"
+        )
+
+    def get_many(self, texts):
+        found = {}
+        texts = list(texts)
+        for i in range(0, len(texts), 500):  # SQLite のパラメータ数の上限に収める
+            chunk = texts[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            cursor = self.connection.execute(
+                f"SELECT text, translated FROM translation "
+                f"WHERE backend=? AND src=? AND dest=? AND text IN ({placeholders})",
+                (*self.key, *chunk),
+            )
+            found.update(cursor.fetchall())
+        return found
+
+    def put_many(self, translations):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO translation VALUES (?, ?, ?, ?, ?)",
+                [(*self.key, text, translated) for text, translated in translations.items()],
+            )
+
+    def close(self):
+        self.connection.close()
+
+class GoogleBackend:
+    """googletrans によるオンライン翻訳（一括で送り、失敗したら 1 件ずつ）"""
+    name = 'google'
+    online = True
+    def __init__(self, src='ja', dest='en'):
+        from googletrans import Translator
+        self.translator = Translator()
+        self.src = src
+        self.dest = dest
+
+    def translate_batch(self, texts):
+        try:
+            results = self.translator.translate(list(texts), src=self.src, dest=self.dest)
+            return [result.text for result in results]
+        except Exception:
+            translated = []
+            for text in texts:
+                try:
+                    translated.append(self.translator.translate(text, src=self.src, dest=self.dest).text)
+                except Exception as e:
+                    print(f"- Translation error for '{text}': {e}")
+                    translated.append(None)
+            return translated
+
+class DictionaryBackend:
+    """オフライン: translation_dict と 2 列 CSV（原文, 訳文）の辞書で引く。無いものは未翻訳のまま"""
+    name = 'dictionary'
+    online = False
+    def __init__(self, dictionary_file=None):
+        self.dictionary = dict(translation_dict)
+        if dictionary_file:
+            with open(dictionary_file, mode='r', encoding='utf-8-sig') as f:
+                for row in csv.reader(f):
+                    if len(row) >= 2 and row[0]:
+                        self.dictionary[row[0]] = row[1]
+
+    def translate_batch(self, texts):
+        return [self.dictionary.get(text) for text in texts]
+
+class StubBackend:
+    """テスト用: ネットワークを使わず "[en] 原文" を返す"""
+    name = 'stub'
+    online = False
+    def __init__(self, dest='en'):
+        self.dest = dest
+
+    def translate_batch(self, texts):
+        return [f"[{self.dest}] {text}" for text in texts]
+
+BACKENDS = {
+    'google': GoogleBackend,
+    'dictionary': DictionaryBackend,
+    'stub': StubBackend,
+}
+
+class TokenBucket:
+    """rate 件/秒、最大 capacity 件までまとめて取れるトークンバケット（スレッド間で共有）"""
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+class TranslationService:
+    def __init__(self, backend, cache, rate=5.0, batch_size=20, workers=4):
+        self.backend = backend
+        self.cache = cache
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        # レート制限はオンラインのバックエンドだけ
+        self.bucket = TokenBucket(rate, max(rate, self.batch_size)) if backend.online else None
+
+    def translate_batch(self, texts):
+        if self.bucket:
+            self.bucket.acquire(len(texts))
+        return texts, self.backend.translate_batch(texts)
+
+    def translate_all(self, texts):
+        """
+        一意な文字列をキャッシュで引き、残りだけをバックエンドで翻訳してキャッシュに追加する。
+        翻訳できなかった文字列は結果に含めない（次回また翻訳を試みる）。
+        """
+        texts = sorted({text for text in texts if text})
+        translations = self.cache.get_many(texts)
+        misses = [text for text in texts if text not in translations]
+        print(f"  {len(texts)} unique strings, {len(translations)} cached, {len(misses)} to translate with {self.backend.name}")
+        if not misses:
+            return translations
+        batches = [misses[i:i + self.batch_size] for i in range(0, len(misses), self.batch_size)]
+        translated = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self.translate_batch, batch) for batch in batches]
+            for future in as_completed(futures):
+                try:
+                    batch, results = future.result()
+                except Exception as e:
+                    print(f"- Translation error in batch: {e}")
+                    continue
+                for text, result in zip(batch, results):
+                    if result:
+                        translated[text] = result
+                # 途中で止まっても翻訳済みの分は残す
+                self.cache.put_many({text: translated[text] for text in batch if text in translated})
+        translations.update(translated)
+        return translations
+
+translation_service = None
+translations = {}   # 今回の実行で使う翻訳（キャッシュ + バックエンド）
+pending = set()     # collect 中に見つかった未翻訳の文字列
+COLLECTING = False
+
+def lookup_translation(text):
+    if text in translations:
+        return translations[text]
+    if COLLECTING:
+        pending.add(text)
+        return text
+    # collect で拾えなかった文字列（通常は起きない）
+    translations[text] = text
+    translations.update(translation_service.translate_all([text]))
+    return translations[text]
+
+# Function to translate text using the translation dictionary and the translation cache / backend
 def translate_text(text, column=None):
     # Convert the text to string
     text = str(text)
@@ -592,22 +770,23 @@ def translate_text(text, column=None):
     # Check if text is in the dictionary
     elif text in translation_dict:
         return translation_dict[text]
-    else:
-        try:
-            if None is text or '' == text:
-                return ''
-            time.sleep(0.2)
-            if text in translation_dict:
-                return translation_dict[text]
-            # Use Google Translate to translate text
-            translated = translator.translate(text, src='ja', dest='en').text
-            return translated
-        except Exception as e:
-            print(f"- Translation error in translate_text {column} for '{text}': {e}")
-            return text
+    elif None is text or '' == text:
+        return ''
+    # Translate with the cache / backend
+    return lookup_translation(text)
+
+parser = argparse.ArgumentParser(description='Translate entryGL.csv (Japanese) to English with a persistent translation cache')
+parser.add_argument('--base-dir', default='data/_PCA', help='directory of entryGL.csv (default: data/_PCA)')
+parser.add_argument('--backend', choices=sorted(BACKENDS), default='google', help='translation backend for strings not in the cache (default: google)')
+parser.add_argument('--dictionary', help='two column CSV (Japanese, English) added to the dictionary backend')
+parser.add_argument('--cache', help='SQLite translation cache (default: <base-dir>/translation_cache.sqlite)')
+parser.add_argument('--rate', type=float, default=5.0, help='strings per second sent to the backend (default: 5)')
+parser.add_argument('--batch-size', type=int, default=20, help='strings per backend request (default: 20)')
+parser.add_argument('--workers', type=int, default=4, help='concurrent backend requests (default: 4)')
+args = parser.parse_args()
 
 print('# Define the base directory and file paths')
-base_dir = 'data/_PCA'
+base_dir = args.base_dir
 input_file_path = f'{base_dir}/entryGL.csv'
 output_file_path = f'{base_dir}/entryGL_translated.csv'
 company_file_path = f'{base_dir}/company_names.csv'
@@ -666,11 +845,7 @@ with open(cost_center_file_path, mode='w', newline='', encoding='utf-8-sig') as
         cs_writer.writerow([name])
 
 print('# Translate the specified columns')
-current_month = None
-for row in rows:
-    if row['Column1'][:6] != current_month:
-        print(f"Translating {row['Column1'][:6][:4]}-{row['Column1'][:6][-2:]}")
-    current_month = row['Column1'][:6]
+def translate_row(row):
     for column in [
         "Column9", # 借方科目名
         "Column7", # 借方部門名
@@ -708,6 +883,32 @@ for row in rows:
             text = clean_text(row[column])
             row[column] = translate_text(text, column)
 
+if 'dictionary' == args.backend:
+    backend = DictionaryBackend(args.dictionary)
+else:
+    backend = BACKENDS[args.backend]()
+cache = TranslationCache(args.cache or f'{base_dir}/translation_cache.sqlite', backend.name)
+translation_service = TranslationService(backend, cache, args.rate, args.batch_size, args.workers)
+
+# 1. 翻訳が必要な文字列を集める（行は書き換えない）
+COLLECTING = True
+for row in rows:
+    translate_row(dict(row))
+COLLECTING = False
+
+# 2. キャッシュに無いものだけをまとめて翻訳（翻訳できなかったものは原文のまま）
+translations.update({text: text for text in pending})
+translations.update(translation_service.translate_all(pending))
+
+# 3. 行を翻訳
+current_month = None
+for row in rows:
+    if row['Column1'][:6] != current_month:
+        print(f"Translating {row['Column1'][:6][:4]}-{row['Column1'][:6][-2:]}")
+    current_month = row['Column1'][:6]
+    translate_row(row)
+cache.close()
+
 with open(company_file_path, mode='w', newline='', encoding='utf-8-sig') as cmfile:
     cm_writer = csv.writer(cmfile)
     cm_writer.writerow(['取引先名'])
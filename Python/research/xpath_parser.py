@@ -1,6 +1,77 @@
 import xmlschema
 from lxml import etree
 import os
+import sys
+import glob
+import json
+import pickle
+import hashlib
+import argparse
+import urllib.parse
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+SCHEMA_CACHE_DIR = ".cache"
+_schemas = {}  # xsd_file (abspath) -> compiled xmlschema.XMLSchema (per process)
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def schema_files(schema):
+    """Local files of every schema document (include/import) used by the compiled schema."""
+    files = set()
+    for component in schema.maps.iter_schemas():
+        url = component.url or ""
+        parsed = urllib.parse.urlparse(url)
+        if "file" == parsed.scheme:
+            # percent-encoded names and file:///C:/... (Windows) are decoded here
+            url = urllib.request.url2pathname(parsed.path)
+        if url and os.path.isfile(url):
+            files.add(os.path.abspath(url))
+    return sorted(files)
+
+def load_schema(xsd_file, cache_dir=None):
+    """
+    Compile the XSD once per process, and keep a pickled copy in cache_dir
+    (default: <xsd dir>/.cache). The pickle stores the SHA-256 of every schema
+    document it was compiled from; if any of them changed it is compiled again.
+    :param xsd_file: Path to the XSD schema file
+    :return: xmlschema.XMLSchema
+    """
+    xsd_file = os.path.abspath(xsd_file)
+    if xsd_file in _schemas:
+        return _schemas[xsd_file]
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(xsd_file), SCHEMA_CACHE_DIR)
+    name = hashlib.sha256(xsd_file.encode("utf-8")).hexdigest()[:16]
+    cache_file = os.path.join(cache_dir, f"xmlschema-{xmlschema.__version__}-{name}.pickle")
+    schema = None
+    if os.path.isfile(cache_file):
+        try:
+            with open(cache_file, "rb") as f:
+                digests, cached = pickle.load(f)
+            if all(os.path.isfile(path) and file_digest(path) == digest for path, digest in digests.items()):
+                schema = cached
+        except Exception:
+            schema = None  # 壊れた / 古いキャッシュはコンパイルし直す
+    if schema is None:
+        schema = xmlschema.XMLSchema(xsd_file)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # the XSD itself is always hashed, even if its URL could not be mapped to a file
+            digests = {path: file_digest(path) for path in set(schema_files(schema)) | {xsd_file}}
+            tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+            with open(tmp_file, "wb") as f:
+                pickle.dump((digests, schema), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, cache_file)
+        except Exception:
+            pass  # キャッシュできなくても検証は続行
+    _schemas[xsd_file] = schema
+    return schema
 
 def validate_xml_local(xml_file, xsd_file):
     """
@@ -9,8 +80,8 @@ def validate_xml_local(xml_file, xsd_file):
     :param xsd_file: Path to the XSD schema file
     """
     try:
-        # Load the XSD schema
-        schema = xmlschema.XMLSchema(xsd_file)
+        # Load the XSD schema (compiled once, see load_schema)
+        schema = load_schema(xsd_file)
         # Validate the XML file
         schema.validate(xml_file)
         print("XML validation successful.")
@@ -19,6 +90,65 @@ def validate_xml_local(xml_file, xsd_file):
     except Exception as e:
         print(f"An error occurred: {e}")
 
+def iter_validation_errors(xml_file, xsd_file):
+    """
+    Validate one XML file and yield one dict per error:
+    {"file", "status": "invalid"|"error", "path", "line", "reason", "message"}.
+    Nothing is yielded for a valid file.
+    """
+    try:
+        schema = load_schema(xsd_file)
+        for error in schema.iter_errors(xml_file):
+            yield {
+                "file": xml_file,
+                "status": "invalid",
+                "path": getattr(error, "path", None),
+                "line": getattr(error, "sourceline", None),
+                "reason": getattr(error, "reason", None),
+                "message": getattr(error, "message", str(error)),
+            }
+    except Exception as e:
+        yield {"file": xml_file, "status": "error", "path": None, "line": None, "reason": None, "message": str(e)}
+
+def validate_files(xml_files, xsd_file):
+    """Worker: validate a chunk of files, return [(xml_file, [error records])]"""
+    return [(xml_file, list(iter_validation_errors(xml_file, xsd_file))) for xml_file in xml_files]
+
+def _init_worker(xsd_file, cache_dir):
+    # Each process loads the compiled schema once (from the pickle written by the parent)
+    load_schema(xsd_file, cache_dir)
+
+def validate_many(xml_files, xsd_file, workers=None, chunk_size=20, cache_dir=None):
+    """
+    Validate many XML files against one schema in a process pool.
+    Yields (xml_file, [error records]) as each chunk completes; an empty list means valid.
+    """
+    load_schema(xsd_file, cache_dir)  # compile (or load) once before starting the workers
+    xml_files = list(xml_files)
+    chunks = [xml_files[i:i + chunk_size] for i in range(0, len(xml_files), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield from validate_files(chunk, xsd_file)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(xsd_file, cache_dir)) as pool:
+        futures = [pool.submit(validate_files, chunk, xsd_file) for chunk in chunks]
+        for future in as_completed(futures):
+            yield from future.result()
+
+def validate_directory(xml_dir, xsd_file, pattern="*.xml", out=sys.stdout, workers=None, chunk_size=20):
+    """
+    Validate every XML file under xml_dir (recursive) and write the errors as JSON lines to out.
+    :return: (number of files, number of invalid files)
+    """
+    xml_files = sorted(glob.glob(os.path.join(xml_dir, "**", pattern), recursive=True))
+    invalid = 0
+    for xml_file, errors in validate_many(xml_files, xsd_file, workers, chunk_size):
+        if errors:
+            invalid += 1
+        for record in errors:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return len(xml_files), invalid
+
 def execute_xpath(xml_file, xpath_query, namespaces):
     """
     Execute an XPath query on the XML file.
@@ -43,7 +173,28 @@ def execute_xpath(xml_file, xpath_query, namespaces):
     except Exception as e:
         print(f"Error executing XPath: {e}")
 
-if __name__ == "__main__":
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # Batch validation:
+    # python Python/research/xpath_parser.py XBRL-GL-2026/gl/plt/case-c-b-m-u-t-s/gl-plt-all-2025-12-01.xsd ledgers/ --workers 4 --out errors.jsonl
+    parser = argparse.ArgumentParser(description="Validate a directory of XML instances against one XSD")
+    parser.add_argument("xsd_file", help="XSD schema (entry point)")
+    parser.add_argument("xml_dir", help="directory searched recursively for instances")
+    parser.add_argument("--pattern", default="*.xml", help="file name pattern (default: *.xml)")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=20, help="files per worker task")
+    parser.add_argument("--out", help="JSON lines file for the error records (default: stdout)")
+    args = parser.parse_args()
+
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        count, invalid = validate_directory(args.xml_dir, args.xsd_file, args.pattern, out, args.workers, max(1, args.chunk_size))
+    finally:
+        if args.out:
+            out.close()
+    print(f"{count} files validated, {invalid} invalid.", file=sys.stderr)
+    sys.exit(1 if invalid else 0)
+
+elif __name__ == "__main__":
     # File paths
     DATA_DIR = "Python/data"
     XML_FILE = os.path.join(DATA_DIR, "SalInvoiceGen.xml")
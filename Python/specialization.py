@@ -490,95 +490,90 @@ class Specialization:
             row.pop('property_type_order', None)
         return data_sorted_final
 
-    def specialization(self):
-        self.object_class_dict = {}
-        with open(self.fsm_file, encoding=self.encoding, newline='') as f:
+    def read_fsm_table(self, fsm_file):
+        """
+        Read the FSM CSV once into a list of (row_number, record).
+        Each row is validated and populated (id, level, normalised terms) here only once;
+        reading stops at the first invalid row.
+        """
+        table = []
+        with open(fsm_file, encoding=self.encoding, newline='') as f:
             reader = csv.DictReader(f, fieldnames=self.header)
-            h = next(reader)
+            next(reader) # Skip header row
             self.current_class = ''
             seq = 0
-            # First pass: Register Abstract Classes and Classes
             for row_number, row in enumerate(reader, start=1):
                 if not row['sequence'] and not row['level']:
                     continue
                 if '' == row['module']:
                     print(f"** ERROR no module defined. {row_number}: {row}")
                     continue
-                record = {}
-                for key in self.header:
-                    if key in row:
-                        record[key] = row[key]
-                    else:
-                        record[key] = ''
+                record = {key: row.get(key, '') for key in self.header}
                 _, result = self.check_csv_row(row)
                 if result != "Row is valid.":
                     print(f"** ERROR Row is invalid. {row_number}: {result} {row}")
                     break
                 seq, record = self.populate_record(record, seq)
-                property_type = record['property_type'].strip()
-                class_term = record['class_term'].strip()
-                if property_type in ['Abstract Class', 'Class']:
-                    if class_term not in self.object_class_dict:
-                        self.object_class_dict[class_term] = record
-                        self.object_class_dict[class_term]['properties'] = {}
-                        
-            # Reset reader to process properties
-            f.seek(0)
-            next(reader) # Skip header row
-            # Second pass: Register Properties
-            for row_number, row in enumerate(reader, start=1):
-                if not row['sequence'] and not row['level']:
-                    continue
-                if '' == row['module']:
-                    print(f"** ERROR Row {row_number}: {row}")
+                table.append((row_number, record))
+        return table
+
+    def register_classes(self, table):
+        # First pass: Register Abstract Classes and Classes
+        for _, record in table:
+            property_type = record['property_type'].strip()
+            class_term = record['class_term'].strip()
+            if property_type in ['Abstract Class', 'Class']:
+                if class_term not in self.object_class_dict:
+                    self.object_class_dict[class_term] = record
+                    self.object_class_dict[class_term]['properties'] = {}
+
+    def register_properties(self, table):
+        # Second pass: Register Properties
+        current_class_id = None
+        for _, record in table:
+            class_term = record['class_term'].strip()
+            self.current_class = class_term
+            property_type, property_term = self.getproperty_term(record)
+            if property_type in ['Abstract Class', 'Class']:
+                current_class_id = record['id'].strip()
+            elif 'Specialization'==property_type:
+                superclass_term = record['associated_class']
+                if superclass_term not in self.object_class_dict:
+                    print(f"ERROR: {superclass_term} is not defined.")
                     continue
-                record = {}
-                for key in self.header:
-                    if key in row:
-                        record[key] = row[key]
-                    else:
-                        record[key] = ''
-                _, result = self.check_csv_row(row)
-                if result != "Row is valid.":
-                    print(f"** ERROR Row {row_number}: {result} {row}")
-                    break
-                seq, record = self.populate_record(record, seq)
-                property_type = record['property_type'].strip()
-                class_term = record['class_term'].strip()
-                property_type, property_term = self.getproperty_term(record)
-                if property_type in ['Abstract Class', 'Class']:
-                    self.current_class = class_term
-                    current_class_id = record['id'].strip()
-                elif 'Specialization'==property_type:
-                    superclass_term = record['associated_class']
-                    if superclass_term not in self.object_class_dict:
-                        print(f"ERROR: {superclass_term} is not defined.")
-                        continue
-                    super_class = self.object_class_dict[superclass_term]
-                    record['id'] = f"{current_class_id}_{record['id'][1 + record['id'].rindex('_'):]}"
-                    _class_term = f"{class_term}.{superclass_term}"
-                    record['class_term'] = _class_term
-                    _properties = copy.deepcopy(super_class['properties'])
-                    for _property_term, _property in _properties.items():
-                        _propertyID = _property['id']
-                        _property['id'] = f"{current_class_id}_{_propertyID}"
-                        _property['module'] = self.current_class
-                        _property['class_term'] = _class_term
-                        if 'Attribute'==_property['property_type']:
-                            element = _property['element']
-                            new_name = self.merge_class_term_with_element(class_term, element)
-                            _property['element'] = new_name
-                        self.object_class_dict[class_term]['properties'][_property_term] = _property
-                elif property_type not in ['Abstract Class', 'Class']:
-                    if class_term not in self.object_class_dict:
-                        print(f"** ERROR NOT REGISTERED {class_term} in object_class_dict\n{record}")
+                super_class = self.object_class_dict[superclass_term]
+                record['id'] = f"{current_class_id}_{record['id'][1 + record['id'].rindex('_'):]}"
+                _class_term = f"{class_term}.{superclass_term}"
+                record['class_term'] = _class_term
+                _properties = copy.deepcopy(super_class['properties'])
+                for _property_term, _property in _properties.items():
+                    _propertyID = _property['id']
+                    _property['id'] = f"{current_class_id}_{_propertyID}"
+                    _property['module'] = self.current_class
+                    _property['class_term'] = _class_term
+                    if 'Attribute'==_property['property_type']:
+                        element = _property['element']
+                        new_name = self.merge_class_term_with_element(class_term, element)
+                        _property['element'] = new_name
+                    self.object_class_dict[class_term]['properties'][_property_term] = _property
+            else:
+                if class_term not in self.object_class_dict:
+                    print(f"** ERROR NOT REGISTERED {class_term} in object_class_dict\n{record}")
+                else:
+                    multiplicity = record['multiplicity']
+                    if multiplicity in ['0..0', '0']:
+                        if property_term in self.object_class_dict[class_term]['properties']:
+                            del self.object_class_dict[class_term]['properties'][property_term]
                     else:
-                        multiplicity = record['multiplicity']
-                        if multiplicity in ['0..0', '0']:
-                            if property_term in self.object_class_dict[class_term]['properties']:
-                                del self.object_class_dict[class_term]['properties'][property_term]
-                        else:
-                            self.object_class_dict[class_term]['properties'][property_term] = record
+                        self.object_class_dict[class_term]['properties'][property_term] = record
+
+    def specialization(self):
+        self.object_class_dict = {}
+        # Parse the FSM once; classes are registered before properties so that
+        # specializations can refer to classes defined in later rows.
+        table = self.read_fsm_table(self.fsm_file)
+        self.register_classes(table)
+        self.register_properties(table)
 
         self.BSM_list = []
         selected_classes = self.object_class_dict.keys()
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+tidy2xml.py
+
+Converts a hierarchical tidy CSV (as written by xml2tidy.py) back into an
+XBRL-GL instance document, using the combined structure file (LHM + binding).
+
+The instance is written incrementally with lxml.etree.xmlfile: tidy records are
+read one at a time and the tuples (classes of the LHM) are opened and closed from
+the level / element / multiplicity of the structure file, so the memory used does
+not depend on the size of the instance. The tidy records must be in document
+order, as xml2tidy.py writes them.
+
+A fact already written in a tuple instance is not written again when the same value is
+repeated on a following tidy record (xml2tidy.py copies the parent values to the child rows).
+The written facts are kept per tuple instance along the whole class chain, so a child tuple
+without a dimension column is not reopened for the repeated rows. LHM classes without 2016PWD
+binding (e.g. gl-cor:entered) have no element in the instance; their facts are written in
+the parent tuple.
+
+Example Usage:
+python Python/tidy2xml.py -i All.csv -n 2025-12-01 -s XBRL-GL-2025/LHM/XBRL-GL_2025_LHM.csv -o All.xml
+
+MIT License
+
+(c) 2025 SAMBUICHI, Nobuyuki (Sambuichi Professional Engineers Office)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from lxml import etree as ET
+import os
+import sys
+import argparse
+import csv
+import datetime
+
+NUMERIC_TYPES = (
+    "decimalItemType",
+    "floatItemType",
+    "doubleItemType",
+    "integerItemType",
+    "nonNegativeIntegerItemType",
+    "positiveIntegerItemType",
+    "pureItemType",
+    "sharesItemType",
+    "percentItemType",
+)
+
+class Tidy2XML:
+    def __init__(
+        self, input_file, version, structure_file, output_file, encoding, trace, debug,
+        schema_ref=None, currency="usd", instant=None, binding=True, indent=True
+    ):
+        self.input_file = self.file_path(input_file.strip())
+        if not os.path.isfile(self.input_file):
+            print(f"Input tidy CSV file {self.input_file} is missing.")
+            sys.exit()
+
+        self.version = version.strip()
+
+        self.structure_file = self.file_path(structure_file.strip())
+        if not os.path.isfile(self.structure_file):
+            print(f"Structure file {self.structure_file} is missing.")
+            sys.exit()
+
+        self.output_file = self.file_path(output_file.strip())
+        self.output_dir = os.path.dirname(self.output_file)
+        if self.output_dir and not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir, exist_ok=True)
+            print(f"Created output directory: {self.output_dir}")
+
+        self.encoding = encoding.strip() if encoding else "utf-8-sig"
+        self.TRACE = trace
+        self.DEBUG = debug
+        self.schema_ref = schema_ref or f"../plt/case-c-b-m-u-e-t-s/gl-plt-all-{self.version}.xsd"
+        self.currency = currency
+        self.instant = instant or datetime.date.today().isoformat()
+        self.binding = binding
+        self.indent = indent
+
+        self.namespaces = {
+            "xbrli": "http://www.xbrl.org/2003/instance",
+            "xbrll": "http://www.xbrl.org/2003/linkbase",
+            "xlink": "http://www.w3.org/1999/xlink",
+            "xsi": "http://www.w3.org/2001/XMLSchema-instance",
+            "gl-cor": f"http://www.xbrl.org/int/gl/cor/{self.version}",
+            "gl-muc": f"http://www.xbrl.org/int/gl/muc/{self.version}",
+            "gl-bus": f"http://www.xbrl.org/int/gl/bus/{self.version}",
+            "gl-usk": f"http://www.xbrl.org/int/gl/usk/{self.version}",
+            "gl-ehm": f"http://www.xbrl.org/int/gl/ehm/{self.version}",
+            "gl-taf": f"http://www.xbrl.org/int/gl/taf/{self.version}",
+            "gl-srcd": f"http://www.xbrl.org/int/gl/srcd/{self.version}",
+            "gl-plt": f"http://www.xbrl.org/int/gl/plt/{self.version}",
+            "iso4217": "http://www.xbrl.org/2003/iso4217",
+            "iso639": "http://www.xbrl.org/2005/iso639",
+        }
+
+    def trace_print(self, text):
+        if self.TRACE or self.DEBUG:
+            print(text)
+
+    def debug_print(self, text):
+        if self.DEBUG:
+            print(text)
+
+    def file_path(self, pathname):
+        if os.sep == pathname[0:1]:
+            return pathname
+        else:
+            _pathname = pathname.replace("/", os.sep)
+            dir = os.path.dirname(__file__)
+            return os.path.join(dir, _pathname)
+
+    def clark(self, qname):
+        # 'gl-cor:entryHeader' -> '{http://www.xbrl.org/int/gl/cor/...}entryHeader'
+        prefix, localname = qname.split(":", 1)
+        if prefix not in self.namespaces:
+            self.namespaces[prefix] = f"http://www.xbrl.org/int/gl/{prefix[3:]}/{self.version}"
+        return f"{{{self.namespaces[prefix]}}}{localname}"
+
+    def load_structure(self):
+        """
+        Read the structure file (LHM + binding) in sequence order.
+        self.nodes: local name -> {qname, tag, level, type, datatype, parent, single, transparent}
+        transparent: an LHM class without 2016PWD binding (e.g. gl-cor:entered); no element is written
+        for it, its children are written in the parent tuple
+        """
+        with open(self.structure_file, mode="r", encoding=self.encoding) as f:
+            sorted_rows = sorted(
+                (row for row in csv.DictReader(f) if row.get("element")),
+                key=lambda r: (
+                    int(r["sequence"]) if r.get("sequence", "").isdigit() else 9999
+                ),
+            )
+        self.nodes = {}
+        parents = [""] * 20
+        for row in sorted_rows:
+            element = row["element"].strip()
+            level = row.get("level", "").strip()
+            if not level.isdigit() or ":" not in element:
+                continue
+            level = int(level)
+            typ = row.get("type", "").strip()
+            if typ in ("C", "R"):
+                parents[level] = element  # class or association (R) holds the next level
+            local = element.split(":", 1)[-1]
+            if local in self.nodes:
+                continue  # same local name in two modules: the first one (sequence order) is used
+            tag = row.get("2016PWD", "").strip() if self.binding else ""
+            multiplicity = row.get("multiplicity", "").strip()
+            self.nodes[local] = {
+                "qname": element,
+                "tag": self.clark(tag if ":" in tag else element),
+                "level": level,
+                "type": "C" if "R" == typ else typ,
+                "datatype": row.get("datatype", "").strip(),
+                "parent": parents[level - 1] if level > 1 else "",
+                "single": multiplicity.endswith("..1") or "1" == multiplicity,
+                "transparent": self.binding and typ in ("C", "R") and ":" not in tag,
+                "sequence": len(self.nodes),
+            }
+        # class chain (root -> class) for every class
+        self.chains = {}
+        for local, node in self.nodes.items():
+            if "C" != node["type"]:
+                continue
+            chain = [local]
+            parent = node["parent"]
+            while parent:
+                parent_local = parent.split(":", 1)[-1]
+                chain.insert(0, parent_local)
+                parent = self.nodes[parent_local]["parent"]
+            self.chains[local] = chain
+        self.debug_print(f"{len(self.nodes)} structure rows, {len(self.chains)} classes")
+
+    def iter_records(self):
+        """Yield tidy records (dict: local name -> value) one row at a time"""
+        with open(self.input_file, mode="r", encoding=self.encoding, newline="") as f:
+            reader = csv.reader(f)
+            header = [h.strip().replace("_", ":", 1).split(":", 1)[-1] if h.startswith("gl-") else h.strip()
+                      for h in next(reader, [])]
+            unknown = [h for h in header if h and h not in self.nodes]
+            if unknown:
+                self.trace_print(f"Columns not in the structure file are ignored: {unknown}")
+            for row in reader:
+                yield {k: v for k, v in zip(header, row) if v != "" and k in self.nodes}
+
+    def fact_attributes(self, node):
+        attributes = {"contextRef": "now"}
+        datatype = node["datatype"]
+        if datatype.endswith("monetaryItemType"):
+            attributes["unitRef"] = self.currency.upper()
+            attributes["decimals"] = "INF"
+        elif datatype.endswith(NUMERIC_TYPES):
+            attributes["unitRef"] = "NotUsed"
+            attributes["decimals"] = "INF"
+        return attributes
+
+    def write_element(self, xf, element):
+        # xf.write(element) would declare the namespaces again on every element
+        with xf.element(element.tag, dict(element.attrib)):
+            if element.text:
+                xf.write(element.text)
+            for child in element:
+                self.write_element(xf, child)
+
+    def write_header(self, xf):
+        nl = "\n\t" if self.indent else ""
+        xf.write(nl)
+        self.write_element(xf, ET.Element(
+            "{http://www.xbrl.org/2003/linkbase}schemaRef",
+            {
+                "{http://www.w3.org/1999/xlink}type": "simple",
+                "{http://www.w3.org/1999/xlink}arcrole": "http://www.w3.org/1999/xlink/properties/linkbase",
+                "{http://www.w3.org/1999/xlink}href": self.schema_ref,
+            },
+        ))
+        xbrli = self.namespaces["xbrli"]
+        context = ET.Element(f"{{{xbrli}}}context", id="now")
+        entity = ET.SubElement(context, f"{{{xbrli}}}entity")
+        ET.SubElement(entity, f"{{{xbrli}}}identifier", scheme="http://www.xbrl.org/xbrlgl/sample").text = "SAMPLE"
+        period = ET.SubElement(context, f"{{{xbrli}}}period")
+        ET.SubElement(period, f"{{{xbrli}}}instant").text = self.instant
+        xf.write(nl)
+        self.write_element(xf, context)
+        for unit_id, measure in ((self.currency.upper(), f"iso4217:{self.currency.upper()}"), ("NotUsed", "xbrli:pure")):
+            unit = ET.Element(f"{{{xbrli}}}unit", id=unit_id)
+            ET.SubElement(unit, f"{{{xbrli}}}measure").text = measure
+            xf.write(nl)
+            self.write_element(xf, unit)
+
+    def convert(self):
+        self.load_structure()
+
+        # open tuples: [class local name, dimension value, element context]
+        stack = []
+        # facts written so far, per tuple instance, including the tuples already closed:
+        # {"facts": {fact: value}, "children": {class: [dimension value, instance]}}
+        # only the latest instance of a class is kept under its parent, as the records are in document order
+        written = {"facts": {}, "children": {}}
+        count = 0
+
+        def newline(depth):
+            if self.indent:
+                xf.write("\n" + "\t" * depth)
+
+        def written_depth():
+            # number of open tuples written as elements (transparent classes are not)
+            return sum(1 for entry in stack if entry[2] is not None)
+
+        def close_to(depth):
+            while len(stack) > depth:
+                context = stack.pop()[2]
+                if context is not None:
+                    newline(written_depth() + 1)
+                    context.__exit__(None, None, None)
+
+        def matching_depth(chain, record):
+            # number of open tuples that are on the path to the class, with the same dimension value
+            depth = 0
+            while depth < len(stack) and depth < len(chain):
+                name, key = stack[depth][:2]
+                if name != chain[depth]:
+                    break
+                new_key = record.get(name)
+                if new_key is not None:
+                    if key is None:
+                        stack[depth][1] = new_key
+                    elif new_key != key and not self.nodes[name]["single"]:
+                        break
+                depth += 1
+            return depth
+
+        def instance(chain, record):
+            # the written facts of the tuple instance of the record (same rule as matching_depth)
+            node = written
+            for name in chain:
+                key = record.get(name)
+                child = node["children"].get(name)
+                if child is None or (
+                    key is not None and child[0] is not None and key != child[0] and not self.nodes[name]["single"]
+                ):
+                    child = node["children"][name] = [key, {"facts": {}, "children": {}}]
+                elif key is not None and child[0] is None:
+                    child[0] = key
+                node = child[1]
+            return node
+
+        with ET.xmlfile(self.output_file, encoding="utf-8") as xf:
+            xf.write_declaration()
+            nsmap = {k: v for k, v in self.namespaces.items()}
+            with xf.element(
+                "{http://www.xbrl.org/2003/instance}xbrl",
+                {"{http://www.w3.org/2001/XMLSchema-instance}schemaLocation": f"{self.namespaces['gl-plt']} {self.schema_ref}"},
+                nsmap=nsmap,
+            ):
+                self.write_header(xf)
+                for record in self.iter_records():
+                    count += 1
+                    items = sorted(
+                        (self.nodes[k]["sequence"], k, v) for k, v in record.items() if "C" != self.nodes[k]["type"]
+                    )
+                    parent = None
+                    for _, local, value in items:
+                        node = self.nodes[local]
+                        if node["parent"] != parent:
+                            # facts are in sequence order, so facts of the same class follow each other
+                            parent = node["parent"]
+                            chain = self.chains[parent.split(":", 1)[-1]]
+                            depth = matching_depth(chain, record)
+                            facts = instance(chain, record)["facts"]
+                        if facts.get(local) == value:
+                            continue  # parent value repeated on a child row of the tidy data
+                        close_to(depth)
+                        for name in chain[depth:]:
+                            context = None
+                            if not self.nodes[name]["transparent"]:
+                                newline(written_depth() + 1)
+                                context = xf.element(self.nodes[name]["tag"])
+                                context.__enter__()
+                            stack.append([name, record.get(name), context])
+                        newline(written_depth() + 1)
+                        with xf.element(node["tag"], self.fact_attributes(node)):
+                            xf.write(value)
+                        facts[local] = value
+                        depth = len(chain)
+                    if count % 10000 == 0:
+                        self.trace_print(f"{count} records")
+                        xf.flush()
+                close_to(0)
+                newline(0)
+
+        print(f"XBRL GL instance written to: {self.output_file} ({count} records)")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert tidy hierarchical CSV to an XBRL-GL XML instance (streaming)."
+    )
+    parser.add_argument(
+        "-i", "--input", required=True, help="Input tidy CSV file path"
+    )
+    parser.add_argument(
+        "-n", "--version", required=True, help="XBRL-GL taxonomy version date"
+    )
+    parser.add_argument(
+        "-s",
+        "--structure",
+        required=True,
+        help="Combined structure CSV (LHM + binding)",
+    )
+    parser.add_argument(
+        "-o", "--output", required=True, help="Output XBRL-GL XML file path"
+    )
+    parser.add_argument(
+        "-e",
+        "--encoding",
+        default="utf-8-sig",
+        help="File encoding (default: utf-8-sig)",
+    )
+    parser.add_argument("--schema", help="xbrll:schemaRef href (default: ../plt/case-c-b-m-u-e-t-s/gl-plt-all-<version>.xsd)")
+    parser.add_argument("--currency", default="usd", help="ISO 4217 currency of monetary facts (default: usd)")
+    parser.add_argument("--instant", help="Context instant (default: today)")
+    parser.add_argument("--no-binding", action="store_true", help="Use the LHM element names instead of the 2016PWD binding")
+    parser.add_argument("--no-indent", action="store_true", help="Do not indent the output")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    parser.add_argument("-d", "--debug", action="store_true")
+
+    args = parser.parse_args()
+
+    converter = Tidy2XML(
+        input_file=args.input,
+        version=args.version,
+        structure_file=args.structure,
+        output_file=args.output,
+        encoding=args.encoding,
+        trace=args.verbose,
+        debug=args.debug,
+        schema_ref=args.schema,
+        currency=args.currency,
+        instant=args.instant,
+        binding=not args.no_binding,
+        indent=not args.no_indent,
+    )
+
+    converter.convert()
+
+
+if __name__ == "__main__":
+    main()
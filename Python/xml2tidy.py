@@ -44,10 +44,27 @@ import json
 import re
 
 from csv2tidy import DataProcessor
+from common import oim_csv
+from common.oim_csv import Column
+
+PALETTES = [
+    "case-c",
+    "case-c-b",
+    "case-c-b-m",
+    "case-c-b-m-u",
+    "case-c-b-m-u-e",
+    "case-c-b-m-u-e-t",
+    "case-c-b-m-u-e-t-s",
+    "case-c-b-m-u-t",
+    "case-c-b-m-u-t-s",
+    "case-c-b-t",
+    "case-c-t",
+]
 
 class XML2Tidy:
     def __init__(
-        self, input_file, version, structure_file, output_file, encoding, trace, debug
+        self, input_file, version, structure_file, output_file, encoding, trace, debug,
+        split=False, chunk_rows=0, workers=None
     ):
 
         self.input_file = self.file_path(input_file.strip())
@@ -72,6 +89,10 @@ class XML2Tidy:
         self.TRACE = trace
         self.DEBUG = debug
         self.currency = "usd"
+        # xBRL-CSV output: one table per dimension, chunks of chunk_rows rows, written by workers processes
+        self.split = split
+        self.chunk_rows = chunk_rows
+        self.workers = workers
 
         self.dimensions = set()
 
@@ -121,116 +142,68 @@ class XML2Tidy:
                 result[tag] = value
         return result
 
-    def json_meta_file(self, taxonomy_base, json_meta_file):
-        namespaces = {
-            "xbrli": "http://www.xbrl.org/2003/instance",
-            "xbrll": "http://www.xbrl.org/2003/linkbase",
-            "xlink": "http://www.w3.org/1999/xlink",
-            "xsi": "http://www.w3.org/2001/XMLSchema-instance",
-            "gl-cor": "http://www.xbrl.org/int/gl/cor/2025-12-01",
-            "gl-muc": "http://www.xbrl.org/int/gl/muc/2025-12-01",
-            "gl-bus": "http://www.xbrl.org/int/gl/bus/2025-12-01",
-            "gl-usk": "http://www.xbrl.org/int/gl/usk/2025-12-01",
-            "gl-ehm": "http://www.xbrl.org/int/gl/ehm/2025-12-01",
-            "gl-taf": "http://www.xbrl.org/int/gl/taf/2025-12-01",
-            "gl-srcd": "http://www.xbrl.org/int/gl/srcd/2025-12-01",
-            "gl-plt": "http://www.xbrl.org/int/gl/plt/2025-12-01",
-            "iso4217": "http://www.xbrl.org/2003/iso4217",
-            "iso639": "http://www.xbrl.org/2005/iso639",
-            "ns0": "http://example.com",
-        }
-        palettes = [
-            "case-c",
-            "case-c-b",
-            "case-c-b-m",
-            "case-c-b-m-u",
-            "case-c-b-m-u-e",
-            "case-c-b-m-u-e-t",
-            "case-c-b-m-u-e-t-s",
-            "case-c-b-m-u-t",
-            "case-c-b-m-u-t-s",
-            "case-c-b-t",
-            "case-c-t",
-        ]
+    def column_metadata(self, dimension_fields, non_dimension_fields):
+        """
+        Precomputes the xBRL-CSV column metadata once per conversion.
+        Fields are prefixed with "_" (e.g. gl-cor_entryHeader); CSV columns use the local name.
+        """
+        self.key_columns = []
+        for field in dimension_fields:
+            self.key_columns.append(
+                Column(field.split("_", 1)[-1], dimension=f"gl-plt:d_{field[3:]}")
+            )
+        self.fact_columns = []
+        self.modules = set()
+        for field in non_dimension_fields:
+            module, _, name = field.partition("_")
+            self.modules.add(module[3:4])  # gl-cor -> c, gl-bus -> b ...
+            column = Column(name, concept=f"{module}:{name}")
+            if self.datatype_map.get(f"{module}:{name}", "").endswith("monetaryItemType"):
+                column.unit = f"iso4217:{self.currency.upper()}"
+            self.fact_columns.append(column)
+
+    def document_info(self, taxonomy_base):
+        namespaces = dict(self.namespaces)
+        namespaces["ns0"] = "http://example.com"
         for prefix in self.unique_prefixes:
             namespaces[prefix] = f"http://www.{prefix}"
-        json_meta = {
-            "documentInfo": {
-                "documentType": "https://xbrl.org/2021/xbrl-csv",
-                "namespaces": namespaces,
-            },
-            "tableTemplates": {
-                "xbrl-gl_template": {
-                    "dimensions": {
-                        "period": "2025-05-17T00:00:00",
-                        "entity": "ns0:Example Co.",
-                    },
-                    "columns": {},
-                }
-            },
-            "tables": {"xbrl-gl_table": {"template": "xbrl-gl_template"}},
-        }
-
-        dimensions = [f.replace(":", "_") for f in self.dimension_fields]
-        properties = [f.replace(":", "_") for f in self.non_dimension_fields]
-
-        modules = set()
-        for x in properties:
-            modules.add(x[3 : x.index("_")][0])
         matching = [
-            p for p in palettes if set(p.removeprefix("case-").split("-")) == modules
+            p for p in PALETTES
+            if set(p.removeprefix("case-").split("-")) == self.modules
         ]
         self.debug_print(matching)
         if 1 == len(matching):
-            taxonomy = f"../gl-{matching[0]}/plt/gl-plt-oim-2025-12-01.xsd"
-            json_meta["documentInfo"]["taxonomy"] = [taxonomy]
+            taxonomy = f"../gl-{matching[0]}/plt/gl-plt-oim-{self.version}.xsd"
         else:
-            taxonomy = (
-                f"{taxonomy_base}/gl-case-c-b-m-u-e-t-s/plt/gl-plt-oim-2025-12-01.xsd"
-            )
-
-        for dimension in dimensions:
-            dimension_name = dimension[3:]
-            dimension_column = dimension.split("_", 1)[-1]
-            json_meta["tableTemplates"]["xbrl-gl_template"]["dimensions"][
-                f"gl-plt:d_{dimension_name}"
-            ] = f"${dimension_column}"
-            json_meta["tableTemplates"]["xbrl-gl_template"]["columns"][
-                dimension_column
-            ] = {}
-
-        for property in properties:
-            property_name = property[1 + property.index("_") :]
-            property_module = property[: property.index("_")]
-            if self.datatype_map[property.replace("_", ":")].endswith(
-                "monetaryItemType"
-            ):
-                json_meta["tableTemplates"]["xbrl-gl_template"]["columns"][
-                    property_name
-                ] = {
-                    "dimensions": {
-                        "concept": f"{property_module}:{property_name}",
-                        "unit": f"iso4217:{self.currency.upper()}",
-                    }
-                }
-            else:
-                json_meta["tableTemplates"]["xbrl-gl_template"]["columns"][
-                    property_name
-                ] = {"dimensions": {"concept": f"{property_module}:{property_name}"}}
+            taxonomy = f"{taxonomy_base}/gl-case-c-b-m-u-e-t-s/plt/gl-plt-oim-{self.version}.xsd"
+        return {
+            "documentType": oim_csv.XBRL_CSV,
+            "namespaces": namespaces,
+            "taxonomy": [taxonomy],
+        }
 
-        csv_file = json_meta_file[1 + json_meta_file.rindex(os.sep) :].replace(
-            "json", "csv"
+    def json_meta_file(self, taxonomy_base, json_meta_file, rows):
+        """Writes the tidy rows as xBRL-CSV table(s) and the JSON metadata file"""
+        if self.split:
+            tables = oim_csv.split_tables(rows, self.key_columns, self.fact_columns)
+        else:
+            tables = oim_csv.single_table(rows, self.key_columns + self.fact_columns)
+        # a failed CSV / JSON write (disk, permission, worker) is not caught here: the caller gets the error
+        csv_files = oim_csv.write_report(
+            self.output_file,
+            json_meta_file,
+            self.document_info(taxonomy_base),
+            tables,
+            "xbrl-gl",
+            dimensions={"period": "2025-05-17T00:00:00", "entity": "ns0:Example Co."},
+            chunk_rows=self.chunk_rows,
+            workers=self.workers,
+            encoding=self.encoding,
+            json_encoding=self.encoding,
         )
-        json_meta["tables"]["xbrl-gl_table"]["url"] = csv_file
-
-        try:
-            with open(json_meta_file, "w", encoding=self.encoding) as file:
-                json.dump(json_meta, file, ensure_ascii=False, indent=4)
-            self.trace_print(
-                f"JSON file '{json_meta_file}' has been created successfully."
-            )
-        except Exception as e:
-            print(f"An error occurred while creating the JSON file: {e}")
+        for csv_file in csv_files:
+            self.trace_print(f"CSV file {csv_file}")
+        self.trace_print(f"JSON file '{json_meta_file}' has been created successfully.")
         self.trace_print(f"JSON meta file {json_meta_file}")
 
         print("** END **")
@@ -478,29 +451,22 @@ class XML2Tidy:
             if f not in dimensions and f in used_fields
         ]
 
-        # These fields are used in json_meta_file()
-        fieldnames = dimension_fields + non_dimension_fields
-        local_fieldnames = [f.split("_", 1)[-1] for f in fieldnames]
-        # Write to CSV file (this will create the file if it doesn't exist)
-        with open(self.output_file, mode="w", newline="", encoding=self.encoding) as f:
-            writer = csv.DictWriter(f, fieldnames=local_fieldnames)
-            writer.writeheader()
-            for row in merged_records:
-                # Check if any of the fieldnames are included in the row
-                if not any(
-                    f in [k.replace(":", "_") for k in row.keys()]
-                    for f in non_dimension_fields
-                ):
-                    continue  # Skip if none
-                # Convert key to local name also in output row
-                # local_row = {k.split(":", 1)[-1]: v for k, v in row.items()}
-                local_row = {k.split(":", 1)[-1]: v for k, v in row.items() if k.split(":", 1)[-1] in local_fieldnames}
-                writer.writerow(local_row)
-
-        print(f"Tidy CSV written to: {self.output_file}")
+        # Column metadata used in json_meta_file()
+        self.column_metadata(dimension_fields, non_dimension_fields)
+        local_fieldnames = {c.name for c in self.key_columns + self.fact_columns}
+        fact_fields = {c.name for c in self.fact_columns}
+        rows = []
+        for row in merged_records:
+            # Convert key to local name also in output row
+            local_row = {k.split(":", 1)[-1]: v for k, v in row.items()}
+            # Skip if none of the fact columns are included in the row
+            if fact_fields.isdisjoint(local_row):
+                continue
+            rows.append({k: v for k, v in local_row.items() if k in local_fieldnames})
 
         json_meta_file = f"{self.output_file[:-4]}.json"
-        self.json_meta_file("../OIM-CSV/XBRL-GL-2025", json_meta_file)
+        self.json_meta_file("../OIM-CSV/XBRL-GL-2025", json_meta_file, rows)
+        print(f"Tidy CSV written to: {self.output_file}")
 
 
 def main():
@@ -528,6 +494,23 @@ def main():
         default="utf-8-sig",
         help="File encoding (default: utf-8-sig)",
     )
+    parser.add_argument(
+        "--split-tables",
+        action="store_true",
+        help="Write one xBRL-CSV table per dimension (header, entryHeader, entryDetail ...)",
+    )
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=0,
+        help="Maximum rows per CSV file, 0 = no chunking (default: 0)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of processes writing the CSV files (default: CPU count)",
+    )
     parser.add_argument("-v", "--verbose", action="store_true")
     parser.add_argument("-d", "--debug", action="store_true")
 
@@ -541,6 +524,9 @@ def main():
         encoding=args.encoding,
         trace=args.verbose,
         debug=args.debug,
+        split=args.split_tables,
+        chunk_rows=max(0, args.chunk_rows),
+        workers=args.workers,
     )
 
     converter.convert()
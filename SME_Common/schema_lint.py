@@ -19,15 +19,21 @@ schema_lint.py
 
 使い方（例）:
     python schema_lint.py input.csv
+    python schema_lint.py a.csv b.csv c.csv --combined lint_combined_report.csv
+
+ルールは RULES に登録された関数で、各ルールを列単位（pandas の str.contains / str.fullmatch）
+で評価する。複数ファイルはプロセスプールで並列に検証する。
 
 出力:
     input_lint_report.csv  … 行ごとの指摘一覧
     input_lint_summary.txt … 指摘件数のサマリとヒント
+    lint_combined_report.csv … 複数指定時、全ファイルの指摘一覧（先頭列がファイル名）
 """
 
-import sys
+import argparse
 import re
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 # ====== 利用者向け設定（必要に応じて編集） =====================================
@@ -102,13 +108,6 @@ def smart_map_columns(df: pd.DataFrame):
         mapping[internal] = found
     return mapping
 
-def get_val(row, mapping, key, default=""):
-    col = mapping.get(key)
-    if col is None:
-        return default
-    v = row.get(col, default)
-    return "" if pd.isna(v) else str(v)
-
 def detect_kind(s: str):
     if not s:
         return ""
@@ -118,6 +117,13 @@ def detect_kind(s: str):
             return k
     return s2  # そのまま返す（未知の種別を可視化）
 
+def detect_kinds(kind_raw: pd.Series):
+    """detect_kind を列単位で適用（先に定義されたキーワードを優先）"""
+    kinds = kind_raw.str.strip()
+    for k, pat in reversed(list(KIND_KEYWORDS.items())):
+        kinds = kinds.mask(kinds.str.contains(pat, case=False, regex=True), k)
+    return kinds
+
 def normalize_name(s: str):
     if not s:
         return ""
@@ -127,123 +133,212 @@ def normalize_name(s: str):
     base = re.sub(r"\\s+", " ", base)
     return base
 
+def normalize_names(names: pd.Series):
+    """normalize_name を列単位で適用"""
+    return (
+        names.str.strip()
+        .str.replace(r"\\.\d+$", "", regex=True)
+        .str.replace(r"\\s+", " ", regex=True)
+    )
+
+def lint_columns(df: pd.DataFrame, mapping):
+    """
+    ルールが参照する列を文字列（欠損は ""）に揃えた DataFrame を作る。
+    line 列が無い場合は 1 始まりの行番号。
+    """
+    def column(key):
+        col = mapping.get(key)
+        if col is None:
+            return pd.Series("", index=df.index, dtype=object)
+        return df[col].fillna("").astype(str)
+
+    frame = pd.DataFrame({
+        "line": column("line") if mapping.get("line") else (df.index + 1).astype(str),
+        "kind": detect_kinds(column("kind")),
+        "name": column("name"),
+        "ename": column("ename"),
+        "level": column("level"),
+        "mult": column("multiplicity"),
+        "desc": column("description"),
+    }, index=df.index)
+    frame["KIND"] = frame["kind"].str.upper()
+    frame["mult_ns"] = frame["mult"].str.replace(" ", "", regex=False)
+    return frame
+
+# ====== ルール登録 ===========================================================
+# 各ルールは lint_columns() の DataFrame を受け取り、行ごとの指摘文（指摘なしは None）の
+# Series を返す。RULES への登録順が、同じ行の中での指摘の並び順とサマリの並び順になる。
+# ルールを追加する場合は @lint_rule("サマリ名") を付けた関数を定義する。
+
+RULES = []
+
+def lint_rule(bucket):
+    def register(func):
+        RULES.append((bucket, func))
+        return func
+    return register
+
+def when(mask, msg):
+    return pd.Series(msg, index=mask.index, dtype=object).where(mask, None)
+
+def first_match(frame, rules, test):
+    """rules を順に評価し、行ごとに最初に一致したルールの指摘文を返す（ループの break と同じ）"""
+    result = pd.Series(None, index=frame.index, dtype=object)
+    for rule in rules:
+        mask = test(rule) & result.isna()
+        result = result.mask(mask, rule[-1])
+    return result
+
+ONE_ONE_PAT = r"1\\..(1|1{1})"
+
+# 1) level 未設定
+@lint_rule("level空欄")
+def rule_level_empty(frame):
+    return when(frame["level"].str.strip() == "", "階層（level）が空です。自動生成や解析に支障が出ます。")
+
+# 2) ASBIE の 1..1 強制が多い
+@lint_rule("ASBIE_1..1")
+def rule_asbie_one(frame):
+    mask = (frame["KIND"] == "ASBIE") & frame["mult_ns"].str.fullmatch(ONE_ONE_PAT)
+    return when(mask, "ASBIE の多重度が 1..1 です。必須化の妥当性を再確認してください。")
+
+# 3) SC の必須矛盾：親が 0..* / 0..1 等のとき SC=1..1 だと矛盾
+#    親は直前の非SC行（種別が空の行は飛ばす）を ffill で求める
+@lint_rule("SC必須矛盾")
+def rule_sc_parent(frame):
+    is_sc = frame["KIND"] == "SC"
+    # 親の位置（数値）を ffill して多重度を引く。親が 1 行も無い（種別列なし・空欄・全行 SC）
+    # 場合も parent_mult は文字列の列のまま（多重度そのものを ffill すると float に落ちる）
+    parent_pos = pd.Series(range(len(frame)), index=frame.index).where(~is_sc & (frame["kind"] != "")).ffill()
+    has_parent = parent_pos.notna()
+    parent_mult = pd.Series(
+        frame["mult"].to_numpy()[parent_pos.fillna(0).astype(int).to_numpy()] if len(frame) else [],
+        index=frame.index, dtype=object,
+    ).where(has_parent, "")
+    parent_min = parent_mult.where(
+        ~parent_mult.str.contains("..", regex=False),
+        parent_mult.str.replace(" ", "", regex=False).str.split("..", n=1, regex=False).str[0],
+    )
+    mask = (
+        is_sc
+        & has_parent
+        & parent_min.str.startswith("0")
+        & frame["mult_ns"].str.fullmatch(ONE_ONE_PAT)
+    )
+    return when(mask, "親BBIEが任意(0..x)だが、子SCが 1..1（必須）です。矛盾の可能性。")
+
+# 4) ABIE の重複（正規化名）：2 回目に現れた行で 1 回だけ報告
+@lint_rule("ABIE重複")
+def rule_abie_duplicate(frame):
+    result = pd.Series(None, index=frame.index, dtype=object)
+    abie = frame.loc[frame["KIND"] == "ABIE", ["line", "name"]]
+    if abie.empty:
+        return result
+    base = normalize_names(abie["name"])
+    groups = abie.groupby(base, sort=False)["line"]
+    second = groups.cumcount() == 1
+    lines = groups.transform("first") + "," + abie["line"]
+    msg = "ABIE 名の重複（基底名）: '" + base + "' が複数行 " + lines + " に出現。統合検討を。"
+    result[msg[second].index] = msg[second]
+    return result
+
+# 5) URL/URI の混在
+@lint_rule("URL_URI")
+def rule_url(frame):
+    mask = frame["name"].str.contains(URL_URI_PAT, regex=True)
+    return when(mask, "名称に 'URL' が含まれています。URI への統一を検討してください。")
+
+# 6) 誤字・用語ブレ
+@lint_rule("誤字表記ブレ")
+def rule_term_fix(frame):
+    rules = [(pat, f"表記ゆれ/誤記の可能性: '{pat.pattern}' → '{fix}' を検討。") for pat, fix in TERM_FIX_LIST]
+    return first_match(
+        frame, rules,
+        lambda rule: frame["name"].str.contains(rule[0], regex=True) | frame["desc"].str.contains(rule[0], regex=True)
+    )
+
+# 7) Allowance/Charge と true/false の取り違え
+@lint_rule("A/C真偽")
+def rule_allowance_charge(frame):
+    rules = [(kw_pat, tf_pat, f"Allowance/Charge 判定の真偽が不自然です: {msg}") for kw_pat, tf_pat, msg in ALLOWANCE_CHARGE_TRUE_FALSE_HINT]
+    return first_match(
+        frame, rules,
+        lambda rule: frame["desc"].str.contains(rule[0], regex=True) & frame["desc"].str.contains(rule[1], regex=True)
+    )
+
+# 8) 添付周りのミスマッチ
+@lint_rule("添付ミスマッチ")
+def rule_attach(frame):
+    rules = [(name_pat, desc_pat, f"添付関連の名称と説明が不一致の可能性: {msg}") for name_pat, desc_pat, msg in ATTACH_HEURISTICS]
+    return first_match(
+        frame, rules,
+        lambda rule: frame["name"].str.contains(rule[0], regex=True) & frame["desc"].str.contains(rule[1], regex=True)
+    )
+
+# 9) コード値「0」のみ・意味未記載
+@lint_rule("説明0のみ")
+def rule_desc_zero(frame):
+    mask = frame["desc"].str.fullmatch(r"\\s*0\\s*")
+    return when(mask, "説明が '0' のみで意味が不明確です。コード表と意味の紐付けを明記してください。")
+
+# =============================================================================
+
+REPORT_COLUMNS = ["行", "指摘", "種別", "項目名"]
+
+def lint_dataframe(df: pd.DataFrame):
+    """
+    全ルールを列単位で評価し、指摘一覧（行順・ルール登録順）とルールごとの件数を返す。
+    """
+    frame = lint_columns(df, smart_map_columns(df))
+    position = pd.Series(range(len(frame)), index=frame.index)
+    parts = []
+    counts = {}
+    for order, (bucket, rule) in enumerate(RULES):
+        messages = rule(frame)
+        hit = messages.notna()
+        counts[bucket] = int(hit.sum())
+        if counts[bucket]:
+            parts.append(pd.DataFrame({
+                "position": position[hit],
+                "order": order,
+                "行": frame.loc[hit, "line"],
+                "指摘": messages[hit],
+                "種別": frame.loc[hit, "kind"],
+                "項目名": frame.loc[hit, "name"],
+            }))
+    if not parts:
+        return pd.DataFrame(columns=REPORT_COLUMNS), counts
+    issues = pd.concat(parts).sort_values(["position", "order"], kind="stable")
+    return issues[REPORT_COLUMNS].reset_index(drop=True), counts
+
 def run_lint(input_path: str):
+    out_report, out_summary, _ = lint_file(input_path)
+    return out_report, out_summary
+
+def lint_file(input_path: str):
+    """run_lint の本体。個別レポートを書き出し、(レポート, サマリ, 指摘一覧) を返す。"""
     p = Path(input_path)
     if not p.exists():
         print(f"入力ファイルが見つかりません: {input_path}")
-        return None, None
+        return None, None, None
 
     try:
         df = pd.read_csv(p, dtype=str, encoding="utf-8-sig")
     except UnicodeDecodeError:
         df = pd.read_csv(p, dtype=str)  # フォールバック
 
-    mapping = smart_map_columns(df)
-
-    # レポート行の蓄積
-    issues = []
-
-    # 直前の BBIE を親として SC の必須矛盾をチェックするためのスタック
-    last_non_sc = None  # (index, kind, multiplicity)
-
-    # ABIE の重複（正規化名ベース）
-    seen_abie_names = {}
-
-    for idx, row in df.iterrows():
-        line = get_val(row, mapping, "line", default=str(idx + 1))
-        kind_raw = get_val(row, mapping, "kind")
-        kind = detect_kind(kind_raw)
-        name = get_val(row, mapping, "name")
-        ename = get_val(row, mapping, "ename")
-        level = get_val(row, mapping, "level")
-        mult = get_val(row, mapping, "multiplicity")
-        desc = get_val(row, mapping, "description")
-
-        # 1) level 未設定
-        if level.strip() == "":
-            issues.append((line, "階層（level）が空です。自動生成や解析に支障が出ます。", kind, name))
-
-        # 2) ASBIE の 1..1 強制が多い
-        if kind.upper() == "ASBIE" and re.fullmatch(r"1\\..(1|1{1})", mult.replace(" ", "")):
-            issues.append((line, "ASBIE の多重度が 1..1 です。必須化の妥当性を再確認してください。", kind, name))
-
-        # 3) SC の必須矛盾：親が 0..* / 0..1 等のとき SC=1..1 だと矛盾
-        if kind.upper() == "SC":
-            if last_non_sc:
-                parent_idx, parent_kind, parent_mult = last_non_sc
-                parent_min = parent_mult.replace(" ", "").split("..")[0] if ".." in parent_mult else parent_mult
-                if parent_min.startswith("0") and re.fullmatch(r"1\\..(1|1{1})", mult.replace(" ", "")):
-                    issues.append((line, "親BBIEが任意(0..x)だが、子SCが 1..1（必須）です。矛盾の可能性。", kind, name))
-        else:
-            # SC 以外が来たら「最後に見た非SC」を更新
-            if kind:
-                last_non_sc = (idx, kind, mult)
-
-        # 4) ABIE の重複（正規化名）
-        if kind.upper() == "ABIE":
-            base = normalize_name(name)
-            seen_abie_names.setdefault(base, []).append(line)
-            if len(seen_abie_names[base]) == 2:
-                lines = ",".join(seen_abie_names[base])
-                issues.append((line, f"ABIE 名の重複（基底名）: '{base}' が複数行 {lines} に出現。統合検討を。", kind, name))
-
-        # 5) URL/URI の混在
-        if URL_URI_PAT.search(name):
-            issues.append((line, "名称に 'URL' が含まれています。URI への統一を検討してください。", kind, name))
-
-        # 6) 誤字・用語ブレ
-        for pat, fix in TERM_FIX_LIST:
-            if pat.search(name) or pat.search(desc):
-                issues.append((line, f"表記ゆれ/誤記の可能性: '{pat.pattern}' → '{fix}' を検討。", kind, name))
-                break
-
-        # 7) Allowance/Charge と true/false の取り違え
-        for kw_pat, tf_pat, msg in ALLOWANCE_CHARGE_TRUE_FALSE_HINT:
-            if kw_pat.search(desc) and tf_pat.search(desc):
-                issues.append((line, f"Allowance/Charge 判定の真偽が不自然です: {msg}", kind, name))
-                break
-
-        # 8) 添付周りのミスマッチ
-        for name_pat, desc_pat, msg in ATTACH_HEURISTICS:
-            if name_pat.search(name) and desc_pat.search(desc):
-                issues.append((line, f"添付関連の名称と説明が不一致の可能性: {msg}", kind, name))
-                break
-
-        # 9) コード値「0」のみ・意味未記載
-        if re.fullmatch(r"\\s*0\\s*", desc or ""):
-            issues.append((line, "説明が '0' のみで意味が不明確です。コード表と意味の紐付けを明記してください。", kind, name))
+    rep_df, buckets = lint_dataframe(df)
 
     # 結果の保存
     out_report = p.with_name(p.stem + "_lint_report.csv")
     out_summary = p.with_name(p.stem + "_lint_summary.txt")
 
-    if issues:
-        rep_df = pd.DataFrame(issues, columns=["行", "指摘", "種別", "項目名"])
-        rep_df.to_csv(out_report, index=False, encoding="utf-8-sig")
-    else:
-        rep_df = pd.DataFrame(columns=["行", "指摘", "種別", "項目名"])
-        rep_df.to_csv(out_report, index=False, encoding="utf-8-sig")
-
-    # サマリ作成（安全なカウント）
-    def count_contains(keyword):
-        return sum(1 for x in issues if keyword in x[1])
-
-    buckets = {
-        "level空欄": count_contains("階層（level）が空"),
-        "ASBIE_1..1": count_contains("ASBIE の多重度が 1..1"),
-        "SC必須矛盾": count_contains("子SCが 1..1"),
-        "ABIE重複": count_contains("ABIE 名の重複"),
-        "URL_URI": count_contains("URI への統一"),
-        "誤字表記ブレ": count_contains("表記ゆれ/誤記"),
-        "A/C真偽": count_contains("Allowance/Charge 判定"),
-        "添付ミスマッチ": count_contains("添付関連"),
-        "説明0のみ": count_contains("説明が '0' のみ"),
-    }
+    rep_df.to_csv(out_report, index=False, encoding="utf-8-sig")
 
     with open(out_summary, "w", encoding="utf-8") as f:
         f.write("=== Lintサマリ ===\\n")
         f.write(f"ファイル: {p.name}\\n")
-        f.write(f"総指摘件数: {len(issues)}\\n\\n")
+        f.write(f"総指摘件数: {len(rep_df)}\\n\\n")
         for k, v in buckets.items():
             f.write(f"- {k}: {v}\\n")
         f.write("\\n== ヒント ==\\n")
@@ -253,14 +348,38 @@ def run_lint(input_path: str):
         f.write("4) SC の必須矛盾は直前の非SC行を親とみなす簡易判定です。厳密な親子関係がある場合は列を追加してください。\\n")
         f.write("5) URL→URI の統一、誤字（決裁→決済、寧歳→明細など）は組織の記述規約に合わせて TERM_FIX_LIST を調整してください。\\n")
 
-    return str(out_report), str(out_summary)
+    return str(out_report), str(out_summary), rep_df
+
+def run_lint_many(input_paths, combined_path="lint_combined_report.csv", workers=None):
+    """
+    複数のCSVを並列に検証し、個別レポートに加えて全ファイルの指摘を 1 つの CSV にまとめる。
+    """
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for input_path, (out_report, _, rep_df) in zip(input_paths, pool.map(lint_file, input_paths)):
+            if rep_df is None:
+                continue
+            print(f"{input_path}: {len(rep_df)} 件 → {out_report}")
+            rep_df.insert(0, "ファイル", Path(input_path).name)
+            results.append(rep_df)
+    combined = pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=["ファイル"] + REPORT_COLUMNS)
+    combined.to_csv(combined_path, index=False, encoding="utf-8-sig")
+    print(f"総指摘件数: {len(combined)} → {combined_path}")
+    return combined_path
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("使い方: python schema_lint.py 入力CSV")
+    parser = argparse.ArgumentParser(description="項目定義CSVの Lint")
+    parser.add_argument("input_csv", nargs="*", help="入力CSV（複数指定すると並列に検証し、結合レポートも出力）")
+    parser.add_argument("--combined", default="lint_combined_report.csv", help="結合レポートの出力先（複数指定時）")
+    parser.add_argument("--workers", type=int, default=None, help="プロセス数（既定: CPU 数）")
+    args = parser.parse_args()
+    if not args.input_csv:
+        print("使い方: python schema_lint.py 入力CSV [入力CSV ...] [--combined 結合レポート.csv]")
+    elif 1 == len(args.input_csv):
+        run_lint(args.input_csv[0])
     else:
-        run_lint(sys.argv[1])
+        run_lint_many(args.input_csv, args.combined, args.workers)
 
 
         
@@ -38,8 +38,11 @@ import os
 import re, unicodedata
 import csv
 import copy
+from functools import lru_cache
 from typing import Any, Mapping
 
+from common.uncefact_library import load_library
+
 DEBUG = True
 TRACE = True
 SME_COMMON = True
@@ -319,6 +322,7 @@ def get_den(row):
         den = row.get("name14","").strip()
     return l, den
 
+@lru_cache(maxsize=None)
 def normalize_text(text):
     # remove_words = "(CIILB_|CIIL_|CIIH_|CI_|Applicable|Defined|Specified|Supply Chain|Additional|Including|Included|Processing|Details)"
     remove_words = r"<Hdr>|<Lin>"
@@ -336,6 +340,7 @@ def normalize_text(text):
         _text = _text.replace("Text", "")
     return _text
 
+@lru_cache(maxsize=None)
 def split_camel_case(text):
     if not text:
         return ""
@@ -353,6 +358,7 @@ def remove_duplicates(word_list):
             result.append(word)
     return result
 
+@lru_cache(maxsize=None)
 def add_missing_prefix_words(prefix_word, name_word):
     prefix_list = [normalize_text(text) for text in prefix_word.split()]
     name_list = [normalize_text(text) for text in name_word.split()]
@@ -366,81 +372,47 @@ def get_name(data, path_list, level):
     # sequence = data["sequence"]
     acronym = data["acronym"]
     den = data["DEN"]
+    # 同じパス（6 階層）・DEN・レベルの組は何度も現れるので結果をキャッシュする
+    return derive_name(tuple(path_list[:6]), den, level, "ASMA"==acronym)
 
-    _1st_prefix = split_camel_case(path_list[0])
-    _2nd_prefix = split_camel_case(path_list[1])
-    _3rd_prefix = split_camel_case(path_list[2])
-    _4th_prefix = split_camel_case(path_list[3])
-    _5th_prefix = split_camel_case(path_list[4])
-    _6th_prefix = split_camel_case(path_list[5])
-
-    _1st_text = normalize_text(
-        add_missing_prefix_words(_1st_prefix, den) if 1 == level else _1st_prefix
-    )
-    _2nd_text = normalize_text(
-        add_missing_prefix_words(_2nd_prefix, den) if 2 == level else _2nd_prefix
-    )
-    _3rd_text = normalize_text(
-        add_missing_prefix_words(
-            add_missing_prefix_words(_2nd_prefix, _3rd_prefix), den
-        )
-        if 3 == level
-        else _3rd_prefix
-    )
-    _4th_text = normalize_text(
-        add_missing_prefix_words(
-            add_missing_prefix_words(_3rd_prefix, _4th_prefix), den
-        )
-        if 4 == level
-        else _4th_prefix
-    )
-    _5th_text = normalize_text(
-        add_missing_prefix_words(
-            add_missing_prefix_words(
-                add_missing_prefix_words(_3rd_prefix, _4th_prefix), _5th_prefix
-            ),
-            den,
-        )
-        if 5==level
-        else ""
-    )
-    _6th_text = normalize_text(
-        add_missing_prefix_words(
-            add_missing_prefix_words(
-                add_missing_prefix_words(
-                    add_missing_prefix_words(_3rd_prefix, _4th_prefix), _5th_prefix
-                ),
-                _6th_prefix,
-            ),
-            den,
-        )
-        if level > 5
-        else ""
-    )
+def prefix_chain(prefixes, level):
+    """
+    レベル 3 以降の名前の元になる接頭語の連結
+    level 3: 2nd+3rd, 4: 3rd+4th, 5: 3rd+4th+5th, 6 以上: 3rd+4th+5th+6th
+    add_missing_prefix_words がキャッシュされているため、共通の前半部分は再計算しない
+    """
+    if 3==level:
+        return add_missing_prefix_words(prefixes[1], prefixes[2])
+    chain = add_missing_prefix_words(prefixes[2], prefixes[3])
+    if level > 4:
+        chain = add_missing_prefix_words(chain, prefixes[4])
+    if level > 5:
+        chain = add_missing_prefix_words(chain, prefixes[5])
+    return chain
+
+@lru_cache(maxsize=None)
+def derive_name(path, den, level, is_asma):
+    prefixes = [split_camel_case(path_name) for path_name in path]
 
     if 1==level:
-        name = _1st_text
+        name = normalize_text(add_missing_prefix_words(prefixes[0], den))
+    elif is_asma:
+        # ASMA はひとつ下の階層の接頭語をそのまま使う
+        if 2==level:
+            name = normalize_text(prefixes[2])
+        elif 3==level:
+            name = normalize_text(prefixes[3])
+        elif level > 5:
+            name = normalize_text(add_missing_prefix_words(prefix_chain(prefixes, level), den))
+        else:
+            name = ""
     else:
-        if acronym in ["ASMA"]:
-            if 2==level:
-                name = _3rd_text
-            elif 3==level:
-                name = _4th_text
-            elif 4==level:
-                name = _5th_text
-            else:
-                name = _6th_text
+        if 2==level:
+            name = normalize_text(add_missing_prefix_words(prefixes[1], den))
+        elif level > 2:
+            name = normalize_text(add_missing_prefix_words(prefix_chain(prefixes, level), den))
         else:
-            if 2==level:
-                name = _2nd_text
-            elif 3==level:
-                name = _3rd_text
-            elif 4==level:
-                name = _4th_text
-            elif 5==level:
-                name = _5th_text
-            else:
-                name = _6th_text
+            name = ""
 
     if name.startswith("Agreement"):
         _name = name[9:]
@@ -818,11 +790,6 @@ def main():
     global unid_map, bsm_records, lhm_records, mbie_dict_den, bsm_dict
     global LIFO_list, LHM_model, object_class_dict
 
-    mbie_file =         os.path.join(base_dir,"MBIEs24A.csv")
-    abie_mapping_file = os.path.join(base_dir,"D23B_abie_mapping.csv")
-    qdt_file =          os.path.join(base_dir,"D23B_qDT.csv")
-    tded_file =         os.path.join(base_dir,"TDED.csv")
-
     # DATE = "09-22"
     DATE = "09-01"
     in_file = os.path.join(base_dir,f"sme_common{DATE}.csv")
@@ -832,121 +799,19 @@ def main():
     bsm_file = os.path.join(base_dir,f"SME_common{DATE}_BSM.csv")
     lhm_file = os.path.join(base_dir,f"SME_common{DATE}_LHM.csv")
 
-    REMOVE_CHARS = r"[_\u3000\n\r\(\)\[\]\-\s\.]*" # regex class of characters to remove
-
-    # Nr,UNID,Acronym,DEN,Definition,Publication comments,Object Class Term Qualifier(s),Object Class Term,Property Term Qualifier(s),Property Term,Datatype Qualifier(s),Representation Term,Qualified Data Type UID,Associated Object Class Term Qualifier(s),Associated Object Class,Business Term(s),Usage Rule(s),Sequence Number,Occurrence Min,Occurrence Max,Context Categories,Example(s),Version,Ref Library Version,Submitter Name,Ref Component UN ID,Unique submitter ID,CR Status Date,CR Status,Library Maintenance Comment,TDED,Submitted Definition,Submitter Comment,Submitted DEN,Publication Refs -- Source,Short Name
-    trace_print(f'\n-- Parse {mbie_file} --')
-    with open(mbie_file, mode="r", newline="", encoding="utf-8-sig") as file:
-        reader = csv.DictReader(file)  # Uses first row as keys
-        for row in reader:
-            acronym = row["Acronym"]
-            if "END"==acronym:
-                break
-
-            nr = row["Nr"]
-            nr = int(nr) if nr.isdigit() else 0
-            sequence = row.get("Sequence Number","")
-            sequence = int(sequence) if sequence.isdigit() else 0
-
-            unid = row["UNID"]
-            den = row["DEN"]
-
-            class_term_qualifier = row.get("Object Class Term Qualifier(s)","").strip()
-            class_term = row.get("Object Class Term","").strip()
-            if class_term_qualifier:
-                class_term = f'{class_term_qualifier}_ {class_term}'
-            property_term_qualifier = row.get("Property Term Qualifier(s)","").strip()
-            property_term = row.get("Property Term","").strip()
-            if property_term_qualifier:
-                property_term = f'{property_term_qualifier}_ {property_term}'
-            datatype_qualifier = row.get("Datatype Qualifier(s)","").strip()
-            representation_term = row.get("Representation Term","").strip()
-            if datatype_qualifier:
-                representation_term = f'{datatype_qualifier}_ {representation_term}'
-            associated_class_qualifier = row['Associated Object Class Term Qualifier(s)'].strip()
-            associated_class_term = row['Associated Object Class'].strip()
-            if associated_class_qualifier:
-                associated_class_term = f"{associated_class_qualifier}_ {associated_class_term}"
-
-            multiplicity = ""
-            occurence_min = row.get("Occurrence Min","")
-            occurence_max = row.get("Occurrence Max","")
-            if "unbounded"==occurence_max:
-                occurence_max = "n"
-            if occurence_min and occurence_max:
-                multiplicity = f"{occurence_min}..{occurence_max}"
-
-            if acronym in ["BBIE","SC"]:
-                property_type = "Attribute"
-                element = normalize_text(f'{property_term} {row.get("Representation Term","").strip()}')
-            elif "ASBIE"==acronym:
-                property_type = "Composition"
-                element = normalize_text(f'{property_term} {row.get("Associated Object Class","").strip()}')
-            else:
-                property_type = "Class"
-                element = normalize_text(class_term)
-
-            code_list = ""
-            if len(row["TDED"]) > 0:
-                tded = re.sub(REMOVE_CHARS, "", row["TDED"])
-                code_list = 'TDED{}'.format(tded)
-
-            data = {
-                "mbie_nr": nr,
-                "acronym": acronym,
-                "property_type": property_type,
-                "class_term": class_term,
-                "property_term": property_term,
-                "representation_term": representation_term,
-                "code_list": code_list,
-                "associated_class": associated_class_term,
-                "element": element,
-                "DEN": den,
-                "sequence": sequence if "Class"!=property_type else "",
-                "multiplicity": multiplicity,
-                "definition": row.get("Definition",""),
-                "short_name": row.get("Short Name",""),
-                "UNID": unid,
-                "TDED": row.get("TDED",""),#if representation_term.endswith("Code") else "",
-                "submitted_definition": row.get("Submitted Definition",""),
-            }
-            mbie_dict[unid] = data
-            mbie_dict_den[den] = data
-
-    mbie_ja_file = os.path.join(base_dir,"MBIEs24A_ja.csv")
-    #  UNID,short_name,short_name_ja,definition,definition_ja
-    trace_print(f'\n-- Parse {mbie_ja_file} --')
-    with open(mbie_ja_file, mode="r", newline="", encoding="utf-8-sig") as file_ja:
-        reader = csv.DictReader(file_ja)  # Uses first row as keys
-        for row in reader:
-            unid = row.get("UNID","")
-            mbie_translate_ja[unid] = row
-
-    # "Version","UNID","Acronym","Dictionary Entry Name","ObjectClassQualifierTerm","ObjectClassTerm","Cardinality","PropertyTerm","PrimaryRepresentationTerm","XML datatype","AssociatedObjectClassQualifierTerm","AssociatedObjectClassTerm","XML element name","Definition"
-    trace_print(f'\n-- Parse {abie_mapping_file} --')
-    with open(abie_mapping_file, mode="r", newline="", encoding="utf-8-sig") as file_abie:
-        reader = csv.DictReader(file_abie)  # Uses first row as keys
-        for row in reader:
-            unid = row.get("UNID","")
-            abie_mapping[unid] = row
-            den = row.get("Dictionary Entry Name","")
-            abie_mapping_den[den] = row
-
-    # "XML datatype", "D23B", "UNTDID"
-    trace_print(f'\n-- Parse {qdt_file} --')
-    with open(qdt_file, mode="r", newline="", encoding="utf-8-sig") as file_qdt:
-        reader = csv.DictReader(file_qdt)  # Uses first row as keys
-        for row in reader:
-            xml_datatype = row.get("XML datatype","")
-            qdt_dict[xml_datatype] = row
-
-    # "Code", "URL", "Code name", "Desc", "Repr", "Note"
-    trace_print(f'\n-- Parse {tded_file} --')
-    with open(tded_file, mode="r", newline="", encoding="utf-8-sig") as file_tded:
-        reader = csv.DictReader(file_tded)  # Uses first row as keys
-        for row in reader:
-            code = row.get("Code","")
-            tded_dict[code] = row
+    # MBIEs24A.csv, MBIEs24A_ja.csv, D23B_abie_mapping.csv, D23B_qDT.csv, TDED.csv
+    # 解析結果は base_dir/.cache にキャッシュされ、CSV が更新されたときだけ読み直す
+    trace_print(f'\n-- Load UN/CEFACT library {base_dir} --')
+    library = load_library(base_dir)
+    _mbie_dict, _mbie_dict_den = library.mbie_dicts()
+    mbie_dict.update(_mbie_dict)
+    mbie_dict_den.update(_mbie_dict_den)
+    mbie_translate_ja.update(library.mbie_translate_ja())
+    _abie_mapping, _abie_mapping_den = library.abie_mapping_dicts()
+    abie_mapping.update(_abie_mapping)
+    abie_mapping_den.update(_abie_mapping_den)
+    qdt_dict.update(library.qdt_dict())
+    tded_dict.update(library.tded_dict())
 
     def row_to_fsm_data(row):
         """row(IN_FIELDS) から FSMM フィールドだけを抜き出し、空文字で初期化→strip して詰める"""
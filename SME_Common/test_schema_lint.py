@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+test_schema_lint.py
+
+schema_lint.lint_dataframe の回帰テスト。
+SC 必須矛盾ルール（rule_sc_parent）は親になる非SC行が 1 行も無いとき
+（種別列なし・種別が空欄・全行 SC）にも例外を出さずに評価できること。
+
+使い方:
+    python -m pytest -q SME_Common/test_schema_lint.py
+"""
+import os
+import sys
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import schema_lint
+
+
+def lint(columns):
+    df = pd.DataFrame(columns, dtype=str)
+    return schema_lint.lint_dataframe(df)
+
+
+class TestSCParent(unittest.TestCase):
+    def assert_no_sc_issue(self, columns):
+        issues, counts = lint(columns)
+        self.assertEqual(0, counts["SC必須矛盾"])
+        # 他のルールは従来どおり評価される（level 空欄は全行）
+        self.assertEqual(len(columns["Name"]), counts["level空欄"])
+        return issues
+
+    def test_kind_column_missing(self):
+        self.assert_no_sc_issue({
+            "Name": ["請求書", "金額"],
+            "Multiplicity": ["0..1", "1..1"],
+            "Level": ["", ""],
+        })
+
+    def test_kind_blank(self):
+        self.assert_no_sc_issue({
+            "Kind": ["", ""],
+            "Name": ["請求書", "金額"],
+            "Multiplicity": ["0..1", "1..1"],
+            "Level": ["", ""],
+        })
+
+    def test_all_sc(self):
+        self.assert_no_sc_issue({
+            "Kind": ["SC", "SC"],
+            "Name": ["通貨コード", "単位コード"],
+            "Multiplicity": ["1..1", "0..1"],
+            "Level": ["", ""],
+        })
+
+    def test_parent_is_last_non_sc(self):
+        # ONE_ONE_PAT は 1..1 の表記そのままの正規表現（"1\..1" に一致）
+        one = "1\\..1"
+        issues, counts = lint({
+            "Kind": ["SC", "BBIE", "SC", "", "SC", "BBIE", "SC"],
+            "Name": ["a", "b", "c", "d", "e", "f", "g"],
+            "Multiplicity": [one, "0..1", one, "1..1", one, "1..1", one],
+        })
+        self.assertEqual(2, counts["SC必須矛盾"])
+        self.assertEqual(["c", "e"], issues.loc[issues["指摘"].str.contains("子SC"), "項目名"].tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -24,3 +24,5 @@ python xbrl-gl-2026/test/generate_codelist_taxonomy.py --csv XBRL-GL-2026/TEST/g
 
 python xbrl-gl-2026/test/generate_codelist_taxonomy.py --csv XBRL-GL-2026/TEST/gl/gen/pool/untdid7143-d24a.csv --out xbrl-gl-2026/test/gl/gen/pool --num 7143  --release d24a --title "Item type identification code" --lang en
 
+REM all code lists (unchanged lists are skipped)
+python XBRL-GL-2026/UNECE/generate_codelist_taxonomy.py --manifest XBRL-GL-2026/UNECE/codelist_manifest.csv
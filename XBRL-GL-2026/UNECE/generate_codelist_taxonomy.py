@@ -12,14 +12,28 @@ Generate an XBRL code list taxonomy (aligned pool) from a CSV list:
 Optionally generate one or more selection profiles (subsets) that reuse the SAME domain head (A pattern):
 - sel/<selectionCode>/<...>.xsd
 - sel/<selectionCode>/<...>-def.xml
+
+Batch mode (--manifest) generates every code list of a release from a manifest CSV in a process pool.
+Lists whose source CSV, selection file and parameters are unchanged since the last run are skipped
+(hashes are kept in .codelist_state.json next to the manifest; --force regenerates all).
+codelist_manifest.csv writes under build/ (not committed): the checked-in gl/gen taxonomy is referenced
+by gl/document etc. and is only updated by copying reviewed files from build/.
+
+Example:
+python XBRL-GL-2026/UNECE/generate_codelist_taxonomy.py --manifest XBRL-GL-2026/UNECE/codelist_manifest.csv
 """
 
 from __future__ import annotations
 
 import argparse
 import csv
+import hashlib
+import json
 import os
 import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dataclasses import dataclass
 from typing import List, Dict, Optional, Tuple
 
@@ -30,9 +44,41 @@ from typing import List, Dict, Optional, Tuple
 
 NCNAME_RE = re.compile(r"[^A-Za-z0-9_.-]")
 
+STATE_FILE = ".codelist_state.json"
+STATE_VERSION = "1"  # bump when the generated XML changes, so that --manifest regenerates all lists
+
 def ensure_dir(path: str) -> None:
     os.makedirs(path, exist_ok=True)
 
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+class LineWriter:
+    """
+    Writes lines to a file as they are produced, separated by "\n" (no newline after the last line),
+    i.e. the same bytes as f.write("\n".join(lines)) without holding the whole document in memory.
+    """
+    def __init__(self, path: str):
+        self.f = open(path, "w", encoding="utf-8")
+        self.first = True
+
+    def append(self, line: str) -> None:
+        if self.first:
+            self.first = False
+        else:
+            self.f.write("\n")
+        self.f.write(line)
+
+    def __enter__(self) -> "LineWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.f.close()
+
 def xml_escape(s: str) -> str:
     return (s.replace("&", "&amp;")
              .replace("<", "&lt;")
@@ -172,129 +218,120 @@ def write_aligned_pool(
     # XSD
     role_uri = f"{ns}/role/{role_slug}"
     role_id = f'role_{role_slug.replace("-","_")}'
-    xsd_lines: List[str] = []
-    xsd_lines.append( '<?xml version="1.0" encoding="UTF-8"?>')
-    xsd_lines.append( '<xs:schema')
-    xsd_lines.append( '  xmlns:xs="http://www.w3.org/2001/XMLSchema" ')
-    xsd_lines.append( '  xmlns:xbrli="http://www.xbrl.org/2003/instance"')
-    xsd_lines.append( '  xmlns:link="http://www.xbrl.org/2003/linkbase"')
-    xsd_lines.append( '  xmlns:xlink="http://www.w3.org/1999/xlink" ')
-    xsd_lines.append(f'  xmlns:{prefix}="{ns}"')
-    xsd_lines.append(f'  targetNamespace="{ns}"')
-    xsd_lines.append(f'  elementFormDefault="qualified" attributeFormDefault="unqualified">')
-    xsd_lines.append("")
-    xsd_lines.append( '  <xs:import namespace="http://www.xbrl.org/2003/instance" schemaLocation="http://www.xbrl.org/2003/xbrl-instance-2003-12-31.xsd"/>')
-    xsd_lines.append( '  <xs:import namespace="http://www.xbrl.org/2003/linkbase" schemaLocation="http://www.xbrl.org/2003/xbrl-linkbase-2003-12-31.xsd"/>')
-    xsd_lines.append( '  <xs:annotation>')
-    xsd_lines.append( '    <xs:appinfo>')
-    xsd_lines.append(f'      <!-- UNTDID {num}: {xml_escape(title)} (release {release}) aligned pool -->')
-    xsd_lines.append(f'      <!-- Member naming convention: _<code> (QName {prefix}:_<code> etc.) -->')
-    xsd_lines.append( '      <!-- linkbase -->')
-    xsd_lines.append(f'      <link:linkbaseRef xlink:type="simple" xlink:href="{def_name}" ')
-    xsd_lines.append( '                        xlink:arcrole="http://www.w3.org/1999/xlink/properties/linkbase"/>')
-    xsd_lines.append(f'      <link:linkbaseRef xlink:type="simple" xlink:href="{lab_name}" ')
-    xsd_lines.append( '                        xlink:arcrole="http://www.w3.org/1999/xlink/properties/linkbase"/>')
-    xsd_lines.append( '      <!-- ELR -->')
-    xsd_lines.append(f'      <link:roleType roleURI="{role_uri}" id="{role_id}">')
-    xsd_lines.append(f'        <link:definition>{xml_escape(title)} (UNTDID {num}, {release})</link:definition>')
-    xsd_lines.append( '        <link:usedOn>link:definitionLink</link:usedOn>')
-    xsd_lines.append( '        <link:usedOn>link:labelLink</link:usedOn>')
-    xsd_lines.append( '      </link:roleType>')
-    xsd_lines.append( '    </xs:appinfo>')
-    xsd_lines.append( '  </xs:annotation>')
-    xsd_lines.append("")
-    xsd_lines.append( '  <!-- Domain head (abstract) -->')
-    xsd_lines.append(f'  <xs:element name="{domain_head}" id="{domain_head}" abstract="true"')
-    xsd_lines.append( '    substitutionGroup="xbrli:item" type="xbrli:stringItemType" xbrli:periodType="instant"/>')
-    xsd_lines.append( "")
-    xsd_lines.append( "  <!-- Members (all codes) -->")
-    for it in items:
-        xsd_lines.append(f'  <xs:element name="{it.local}" id="{it.local}" substitutionGroup="xbrli:item"')
-        xsd_lines.append( '              type="xbrli:stringItemType" xbrli:periodType="instant"/>')
-    xsd_lines.append("")
-    xsd_lines.append("</xs:schema>")
-
     file = os.path.join(out_dir, xsd_name).replace(os.sep,'/')
-    with open(file, "w", encoding="utf-8") as f:
-        f.write("\n".join(xsd_lines))
+    with LineWriter(file) as xsd_lines:
+        xsd_lines.append( '<?xml version="1.0" encoding="UTF-8"?>')
+        xsd_lines.append( '<xs:schema')
+        xsd_lines.append( '  xmlns:xs="http://www.w3.org/2001/XMLSchema" ')
+        xsd_lines.append( '  xmlns:xbrli="http://www.xbrl.org/2003/instance"')
+        xsd_lines.append( '  xmlns:link="http://www.xbrl.org/2003/linkbase"')
+        xsd_lines.append( '  xmlns:xlink="http://www.w3.org/1999/xlink" ')
+        xsd_lines.append(f'  xmlns:{prefix}="{ns}"')
+        xsd_lines.append(f'  targetNamespace="{ns}"')
+        xsd_lines.append(f'  elementFormDefault="qualified" attributeFormDefault="unqualified">')
+        xsd_lines.append("")
+        xsd_lines.append( '  <xs:import namespace="http://www.xbrl.org/2003/instance" schemaLocation="http://www.xbrl.org/2003/xbrl-instance-2003-12-31.xsd"/>')
+        xsd_lines.append( '  <xs:import namespace="http://www.xbrl.org/2003/linkbase" schemaLocation="http://www.xbrl.org/2003/xbrl-linkbase-2003-12-31.xsd"/>')
+        xsd_lines.append( '  <xs:annotation>')
+        xsd_lines.append( '    <xs:appinfo>')
+        xsd_lines.append(f'      <!-- UNTDID {num}: {xml_escape(title)} (release {release}) aligned pool -->')
+        xsd_lines.append(f'      <!-- Member naming convention: _<code> (QName {prefix}:_<code> etc.) -->')
+        xsd_lines.append( '      <!-- linkbase -->')
+        xsd_lines.append(f'      <link:linkbaseRef xlink:type="simple" xlink:href="{def_name}" ')
+        xsd_lines.append( '                        xlink:arcrole="http://www.w3.org/1999/xlink/properties/linkbase"/>')
+        xsd_lines.append(f'      <link:linkbaseRef xlink:type="simple" xlink:href="{lab_name}" ')
+        xsd_lines.append( '                        xlink:arcrole="http://www.w3.org/1999/xlink/properties/linkbase"/>')
+        xsd_lines.append( '      <!-- ELR -->')
+        xsd_lines.append(f'      <link:roleType roleURI="{role_uri}" id="{role_id}">')
+        xsd_lines.append(f'        <link:definition>{xml_escape(title)} (UNTDID {num}, {release})</link:definition>')
+        xsd_lines.append( '        <link:usedOn>link:definitionLink</link:usedOn>')
+        xsd_lines.append( '        <link:usedOn>link:labelLink</link:usedOn>')
+        xsd_lines.append( '      </link:roleType>')
+        xsd_lines.append( '    </xs:appinfo>')
+        xsd_lines.append( '  </xs:annotation>')
+        xsd_lines.append("")
+        xsd_lines.append( '  <!-- Domain head (abstract) -->')
+        xsd_lines.append(f'  <xs:element name="{domain_head}" id="{domain_head}" abstract="true"')
+        xsd_lines.append( '    substitutionGroup="xbrli:item" type="xbrli:stringItemType" xbrli:periodType="instant"/>')
+        xsd_lines.append( "")
+        xsd_lines.append( "  <!-- Members (all codes) -->")
+        for it in items:
+            xsd_lines.append(f'  <xs:element name="{it.local}" id="{it.local}" substitutionGroup="xbrli:item"')
+            xsd_lines.append( '              type="xbrli:stringItemType" xbrli:periodType="instant"/>')
+        xsd_lines.append("")
+        xsd_lines.append("</xs:schema>")
     print(f"Aligned pool xsd written to: {file}")
 
     # Definition linkbase (domain-member)
-    def_lines: List[str] = []
-    def_lines.append( '<?xml version="1.0" encoding="UTF-8"?>')
-    def_lines.append( '<link:linkbase')
-    def_lines.append( '  xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"')
-    def_lines.append( '  xmlns:link="http://www.xbrl.org/2003/linkbase"')
-    def_lines.append( '  xmlns:xlink="http://www.w3.org/1999/xlink"')
-    def_lines.append( '  xsi:schemaLocation="http://www.xbrl.org/2003/linkbase')
-    def_lines.append( '                      http://www.xbrl.org/2003/xbrl-linkbase-2003-12-31.xsd">')
-    def_lines.append( '  <!-- ELR -->')
-    def_lines.append(f'  <link:roleRef roleURI="{role_uri}" xlink:type="simple"')
-    def_lines.append(f'                xlink:href="{xsd_name}#{role_id}"/>')
-    def_lines.append( '  <!-- EE1 -->')
-    def_lines.append( '  <link:arcroleRef arcroleURI="http://xbrl.org/int/dim/arcrole/domain-member" xlink:type="simple"')
-    def_lines.append( '                   xlink:href="http://www.xbrl.org/2005/xbrldt-2005.xsd#domain-member"/>')
-    def_lines.append("")
-    def_lines.append(f'  <link:definitionLink xlink:type="extended" xlink:role="{role_uri}">')
-    def_lines.append(f'    <link:loc xlink:type="locator" xlink:href="{xsd_name}#{domain_head}" xlink:label="dom"/>')
-    # locators
-    for idx, it in enumerate(items, start=1):
-        c = sanitise_code_for_ncname(it.code)
-        def_lines.append(f'    <link:loc xlink:type="locator" xlink:href="{xsd_name}#{it.local}" xlink:label="{c}"/>')
-    def_lines.append("")
-    # arcs
-    for idx, it in enumerate(items, start=1):
-        c = sanitise_code_for_ncname(it.code)
-        def_lines.append( '    <link:definitionArc xlink:type="arc" xlink:arcrole="http://xbrl.org/int/dim/arcrole/domain-member"')
-        def_lines.append(f'                        xlink:from="dom" xlink:to="{c}" order="{idx}"/>')
-    def_lines.append("  </link:definitionLink>")
-    def_lines.append("")
-    def_lines.append("</link:linkbase>")
-
     file = os.path.join(out_dir, def_name).replace(os.sep,'/')
-    with open(file, "w", encoding="utf-8") as f:
-        f.write("\n".join(def_lines))
+    with LineWriter(file) as def_lines:
+        def_lines.append( '<?xml version="1.0" encoding="UTF-8"?>')
+        def_lines.append( '<link:linkbase')
+        def_lines.append( '  xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"')
+        def_lines.append( '  xmlns:link="http://www.xbrl.org/2003/linkbase"')
+        def_lines.append( '  xmlns:xlink="http://www.w3.org/1999/xlink"')
+        def_lines.append( '  xsi:schemaLocation="http://www.xbrl.org/2003/linkbase')
+        def_lines.append( '                      http://www.xbrl.org/2003/xbrl-linkbase-2003-12-31.xsd">')
+        def_lines.append( '  <!-- ELR -->')
+        def_lines.append(f'  <link:roleRef roleURI="{role_uri}" xlink:type="simple"')
+        def_lines.append(f'                xlink:href="{xsd_name}#{role_id}"/>')
+        def_lines.append( '  <!-- EE1 -->')
+        def_lines.append( '  <link:arcroleRef arcroleURI="http://xbrl.org/int/dim/arcrole/domain-member" xlink:type="simple"')
+        def_lines.append( '                   xlink:href="http://www.xbrl.org/2005/xbrldt-2005.xsd#domain-member"/>')
+        def_lines.append("")
+        def_lines.append(f'  <link:definitionLink xlink:type="extended" xlink:role="{role_uri}">')
+        def_lines.append(f'    <link:loc xlink:type="locator" xlink:href="{xsd_name}#{domain_head}" xlink:label="dom"/>')
+        # locators
+        for idx, it in enumerate(items, start=1):
+            c = sanitise_code_for_ncname(it.code)
+            def_lines.append(f'    <link:loc xlink:type="locator" xlink:href="{xsd_name}#{it.local}" xlink:label="{c}"/>')
+        def_lines.append("")
+        # arcs
+        for idx, it in enumerate(items, start=1):
+            c = sanitise_code_for_ncname(it.code)
+            def_lines.append( '    <link:definitionArc xlink:type="arc" xlink:arcrole="http://xbrl.org/int/dim/arcrole/domain-member"')
+            def_lines.append(f'                        xlink:from="dom" xlink:to="{c}" order="{idx}"/>')
+        def_lines.append("  </link:definitionLink>")
+        def_lines.append("")
+        def_lines.append("</link:linkbase>")
     print(f"Aligned pool def written to: {file}")
 
     # Label linkbase
-    lab_lines: List[str] = []
-    lab_lines.append( '<?xml version="1.0" encoding="UTF-8"?>')
-    lab_lines.append( '<link:linkbase')
-    lab_lines.append( '  xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"')
-    lab_lines.append( '  xmlns:link="http://www.xbrl.org/2003/linkbase"')
-    lab_lines.append( '  xmlns:xlink="http://www.w3.org/1999/xlink"')
-    lab_lines.append( '  xsi:schemaLocation="http://www.xbrl.org/2003/linkbase')
-    lab_lines.append( '                      http://www.xbrl.org/2003/xbrl-linkbase-2003-12-31.xsd">')
-    lab_lines.append( '  <!-- ELR -->')
-    lab_lines.append(f'  <link:roleRef roleURI="{role_uri}" xlink:type="simple"')
-    lab_lines.append(f'                xlink:href="{xsd_name}#{role_id}"/>')
-    lab_lines.append( '')
-    lab_lines.append( '  <link:labelLink xlink:type="extended" xlink:role="http://www.xbrl.org/2003/role/link">')
-    lab_lines.append(f'    <link:loc xlink:type="locator" xlink:href="{xsd_name}#{domain_head}" xlink:label="dom"/>')
-    lab_lines.append(f'    <link:label xlink:type="resource" xlink:label="lab_dom"')
-    lab_lines.append(f'                xlink:role="http://www.xbrl.org/2003/role/label" xml:lang="{lang}">{xml_escape(title)}</link:label>')
-    lab_lines.append( '    <link:labelArc xlink:type="arc" xlink:arcrole="http://www.xbrl.org/2003/arcrole/concept-label" xlink:from="dom" xlink:to="lab_dom"/>')
-    lab_lines.append( "")
-
-    for idx, it in enumerate(items, start=1):
-        loc = f"_{idx}"
-        lab = f"lab{it.local}"
-        doc = f"doc{it.local}"
-        label_text = f"{it.code} {it.name}".strip()
-        lab_lines.append(f'    <link:loc xlink:type="locator" xlink:href="{xsd_name}#{it.local}" xlink:label="{loc}"/>')
-        lab_lines.append(f'    <link:label xlink:type="resource" xlink:label="{lab}" xlink:role="http://www.xbrl.org/2003/role/label" xml:lang="{lang}">{xml_escape(label_text)}</link:label>')
-        lab_lines.append(f'    <link:labelArc xlink:type="arc" xlink:arcrole="http://www.xbrl.org/2003/arcrole/concept-label" xlink:from="{loc}" xlink:to="{lab}"/>')
-        if it.description:
-            lab_lines.append(f'    <link:label xlink:type="resource" xlink:label="{doc}" xlink:role="http://www.xbrl.org/2003/role/documentation" xml:lang="{lang}">{xml_escape(it.description)}</link:label>')
-            lab_lines.append(f'    <link:labelArc xlink:type="arc" xlink:arcrole="http://www.xbrl.org/2003/arcrole/concept-label" xlink:from="{loc}" xlink:to="{doc}"/>')
-        lab_lines.append("")
-    lab_lines.append("  </link:labelLink>")
-    lab_lines.append("")
-    lab_lines.append("</link:linkbase>")
-
     file = os.path.join(out_dir, lab_name).replace(os.sep,'/')
-    with open(file, "w", encoding="utf-8") as f:
-        f.write("\n".join(lab_lines))
+    with LineWriter(file) as lab_lines:
+        lab_lines.append( '<?xml version="1.0" encoding="UTF-8"?>')
+        lab_lines.append( '<link:linkbase')
+        lab_lines.append( '  xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"')
+        lab_lines.append( '  xmlns:link="http://www.xbrl.org/2003/linkbase"')
+        lab_lines.append( '  xmlns:xlink="http://www.w3.org/1999/xlink"')
+        lab_lines.append( '  xsi:schemaLocation="http://www.xbrl.org/2003/linkbase')
+        lab_lines.append( '                      http://www.xbrl.org/2003/xbrl-linkbase-2003-12-31.xsd">')
+        lab_lines.append( '  <!-- ELR -->')
+        lab_lines.append(f'  <link:roleRef roleURI="{role_uri}" xlink:type="simple"')
+        lab_lines.append(f'                xlink:href="{xsd_name}#{role_id}"/>')
+        lab_lines.append( '')
+        lab_lines.append( '  <link:labelLink xlink:type="extended" xlink:role="http://www.xbrl.org/2003/role/link">')
+        lab_lines.append(f'    <link:loc xlink:type="locator" xlink:href="{xsd_name}#{domain_head}" xlink:label="dom"/>')
+        lab_lines.append(f'    <link:label xlink:type="resource" xlink:label="lab_dom"')
+        lab_lines.append(f'                xlink:role="http://www.xbrl.org/2003/role/label" xml:lang="{lang}">{xml_escape(title)}</link:label>')
+        lab_lines.append( '    <link:labelArc xlink:type="arc" xlink:arcrole="http://www.xbrl.org/2003/arcrole/concept-label" xlink:from="dom" xlink:to="lab_dom"/>')
+        lab_lines.append( "")
+
+        for idx, it in enumerate(items, start=1):
+            loc = f"_{idx}"
+            lab = f"lab{it.local}"
+            doc = f"doc{it.local}"
+            label_text = f"{it.code} {it.name}".strip()
+            lab_lines.append(f'    <link:loc xlink:type="locator" xlink:href="{xsd_name}#{it.local}" xlink:label="{loc}"/>')
+            lab_lines.append(f'    <link:label xlink:type="resource" xlink:label="{lab}" xlink:role="http://www.xbrl.org/2003/role/label" xml:lang="{lang}">{xml_escape(label_text)}</link:label>')
+            lab_lines.append(f'    <link:labelArc xlink:type="arc" xlink:arcrole="http://www.xbrl.org/2003/arcrole/concept-label" xlink:from="{loc}" xlink:to="{lab}"/>')
+            if it.description:
+                lab_lines.append(f'    <link:label xlink:type="resource" xlink:label="{doc}" xlink:role="http://www.xbrl.org/2003/role/documentation" xml:lang="{lang}">{xml_escape(it.description)}</link:label>')
+                lab_lines.append(f'    <link:labelArc xlink:type="arc" xlink:arcrole="http://www.xbrl.org/2003/arcrole/concept-label" xlink:from="{loc}" xlink:to="{doc}"/>')
+            lab_lines.append("")
+        lab_lines.append("  </link:labelLink>")
+        lab_lines.append("")
+        lab_lines.append("</link:linkbase>")
     print(f"Aligned pool lab written to: {file}")
 
     # Review CSV
@@ -336,158 +373,155 @@ def write_shared(
     xsd_name = f"{selection_code}-{release}-shr.xsd"
     def_name = f"{selection_code}-{release}-shr-def.xml"
     # XSD
-    xsd: List[str] = []
-    xsd.append( '<?xml version="1.0" encoding="UTF-8"?>')
-    xsd.append( '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema"')
-    xsd.append( '  xmlns:link="http://www.xbrl.org/2003/linkbase"')
-    xsd.append( '  xmlns:xlink="http://www.w3.org/1999/xlink"')
-    xsd.append(f'  xmlns:{prefix_base}="{base_ns}"')
-    xsd.append(f'  xmlns:{prefix_shared}="{shared_ns}"')
-    xsd.append(f'  targetNamespace="{shared_ns}"')
-    xsd.append( '  elementFormDefault="qualified" attributeFormDefault="unqualified">')
-    # xsd.append(f'  <xs:include schemaLocation="{base_xsd}"/>')
-    xsd.append(f'  <xs:import namespace="{base_ns}"')
-    xsd.append(f'             schemaLocation="{base_xsd}"/>')
-    xsd.append( '  <xs:annotation>')
-    xsd.append( '    <xs:appinfo>')
-    xsd.append(f'      <!-- Selection profile for UNTDID {num} ({release}): {selection_code} -->')
-    xsd.append(f'      <!-- Reuses base domain head: {prefix_base}:{domain_head} -->')
-    xsd.append( "      <!-- Linkbase -->")
-    xsd.append(f'      <link:linkbaseRef xlink:href="{def_name}" xlink:type="simple"')
-    xsd.append( '                        xlink:arcrole="http://www.w3.org/1999/xlink/properties/linkbase"/>')
-    xsd.append( "      <!-- ELR -->")
-    xsd.append(f'      <link:roleType roleURI="{shared_role_uri}"')
-    xsd.append(f'                     id="{shared_role_id}">')
-    xsd.append(f'        <link:definition>UNTDID {num} selection: {selection_code}</link:definition>')
-    xsd.append( '         <link:usedOn>link:definitionLink</link:usedOn>')
-    xsd.append( '      </link:roleType>')
-    xsd.append( '    </xs:appinfo>')
-    xsd.append( '  </xs:annotation>')
-    xsd.append( "</xs:schema>")
-
     file = os.path.join(shared_dir, xsd_name).replace(os.sep,'/')
-    with open(file, "w", encoding="utf-8") as f:
-        f.write("\n".join(xsd))
+    with LineWriter(file) as xsd:
+        xsd.append( '<?xml version="1.0" encoding="UTF-8"?>')
+        xsd.append( '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema"')
+        xsd.append( '  xmlns:link="http://www.xbrl.org/2003/linkbase"')
+        xsd.append( '  xmlns:xlink="http://www.w3.org/1999/xlink"')
+        xsd.append(f'  xmlns:{prefix_base}="{base_ns}"')
+        xsd.append(f'  xmlns:{prefix_shared}="{shared_ns}"')
+        xsd.append(f'  targetNamespace="{shared_ns}"')
+        xsd.append( '  elementFormDefault="qualified" attributeFormDefault="unqualified">')
+        # xsd.append(f'  <xs:include schemaLocation="{base_xsd}"/>')
+        xsd.append(f'  <xs:import namespace="{base_ns}"')
+        xsd.append(f'             schemaLocation="{base_xsd}"/>')
+        xsd.append( '  <xs:annotation>')
+        xsd.append( '    <xs:appinfo>')
+        xsd.append(f'      <!-- Selection profile for UNTDID {num} ({release}): {selection_code} -->')
+        xsd.append(f'      <!-- Reuses base domain head: {prefix_base}:{domain_head} -->')
+        xsd.append( "      <!-- Linkbase -->")
+        xsd.append(f'      <link:linkbaseRef xlink:href="{def_name}" xlink:type="simple"')
+        xsd.append( '                        xlink:arcrole="http://www.w3.org/1999/xlink/properties/linkbase"/>')
+        xsd.append( "      <!-- ELR -->")
+        xsd.append(f'      <link:roleType roleURI="{shared_role_uri}"')
+        xsd.append(f'                     id="{shared_role_id}">')
+        xsd.append(f'        <link:definition>UNTDID {num} selection: {selection_code}</link:definition>')
+        xsd.append( '         <link:usedOn>link:definitionLink</link:usedOn>')
+        xsd.append( '      </link:roleType>')
+        xsd.append( '    </xs:appinfo>')
+        xsd.append( '  </xs:annotation>')
+        xsd.append( "</xs:schema>")
     print(f"Shared xsd written to: {file}")
 
     # Definition linkbase (same domain head, selection ELR)
     # Note: member IDs are in base schema: #_<code_sanitised>
     codes = [c.strip() for c in allowed_codes if c.strip()]
-    defl: List[str] = []
-    defl.append( '<?xml version="1.0" encoding="UTF-8"?>')
-    defl.append( '<link:linkbase')
-    defl.append( '  xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"')
-    defl.append( '  xmlns:link="http://www.xbrl.org/2003/linkbase"')
-    defl.append( '  xmlns:xlink="http://www.w3.org/1999/xlink"')
-    defl.append( '  xsi:schemaLocation="http://www.xbrl.org/2003/linkbase')
-    defl.append( '                      http://www.xbrl.org/2003/xbrl-linkbase-2003-12-31.xsd">')
-    defl.append( '  <!-- ELR -->')
-    defl.append(f'  <link:roleRef roleURI="{shared_role_uri}" xlink:type="simple"')
-    defl.append(f'                xlink:href="{shared_xsd}#{shared_role_id}"/>')
-    defl.append( '  <!-- EE1 -->')
-    defl.append( '  <link:arcroleRef arcroleURI="http://xbrl.org/int/dim/arcrole/domain-member" xlink:type="simple"')
-    defl.append( '                   xlink:href="http://www.xbrl.org/2005/xbrldt-2005.xsd#domain-member"/>')
-    defl.append( "")
-    defl.append(f'  <link:definitionLink xlink:type="extended" xlink:role="{shared_role_uri}">')
-    defl.append(f'    <link:loc xlink:type="locator" xlink:href="{base_xsd}#{domain_head}" xlink:label="dom"/>')
-
-    # locators
-    for i, c in enumerate(codes, start=1):
-        local = member_local_name(c)
-        defl.append(f'    <link:loc xlink:type="locator" xlink:href="{base_xsd}#{local}" xlink:label="{c}"/>')
-    defl.append("")
-    # arcs
-    for i, c in enumerate(codes, start=1):
-        defl.append( '    <link:definitionArc xlink:type="arc" xlink:arcrole="http://xbrl.org/int/dim/arcrole/domain-member"')
-        defl.append(f'                        xlink:from="dom" xlink:to="{c}" order="{i}"/>')
-
-    defl.append("  </link:definitionLink>")
-    defl.append("")
-    defl.append("</link:linkbase>")
-
     file = os.path.join(shared_dir, def_name).replace(os.sep,'/')
-    with open(file, "w", encoding="utf-8") as f:
-        f.write("\n".join(defl))
+    with LineWriter(file) as defl:
+        defl.append( '<?xml version="1.0" encoding="UTF-8"?>')
+        defl.append( '<link:linkbase')
+        defl.append( '  xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"')
+        defl.append( '  xmlns:link="http://www.xbrl.org/2003/linkbase"')
+        defl.append( '  xmlns:xlink="http://www.w3.org/1999/xlink"')
+        defl.append( '  xsi:schemaLocation="http://www.xbrl.org/2003/linkbase')
+        defl.append( '                      http://www.xbrl.org/2003/xbrl-linkbase-2003-12-31.xsd">')
+        defl.append( '  <!-- ELR -->')
+        defl.append(f'  <link:roleRef roleURI="{shared_role_uri}" xlink:type="simple"')
+        defl.append(f'                xlink:href="{shared_xsd}#{shared_role_id}"/>')
+        defl.append( '  <!-- EE1 -->')
+        defl.append( '  <link:arcroleRef arcroleURI="http://xbrl.org/int/dim/arcrole/domain-member" xlink:type="simple"')
+        defl.append( '                   xlink:href="http://www.xbrl.org/2005/xbrldt-2005.xsd#domain-member"/>')
+        defl.append( "")
+        defl.append(f'  <link:definitionLink xlink:type="extended" xlink:role="{shared_role_uri}">')
+        defl.append(f'    <link:loc xlink:type="locator" xlink:href="{base_xsd}#{domain_head}" xlink:label="dom"/>')
+
+        # locators
+        for i, c in enumerate(codes, start=1):
+            local = member_local_name(c)
+            defl.append(f'    <link:loc xlink:type="locator" xlink:href="{base_xsd}#{local}" xlink:label="{c}"/>')
+        defl.append("")
+        # arcs
+        for i, c in enumerate(codes, start=1):
+            defl.append( '    <link:definitionArc xlink:type="arc" xlink:arcrole="http://xbrl.org/int/dim/arcrole/domain-member"')
+            defl.append(f'                        xlink:from="dom" xlink:to="{c}" order="{i}"/>')
+
+        defl.append("  </link:definitionLink>")
+        defl.append("")
+        defl.append("</link:linkbase>")
     print(f"Shared def written to: {file}")
 
     return shared_role_uri, def_name
 
 
 # ----------------------------
-# Main
+# Code list job (one UNTDID list)
 # ----------------------------
 
-def main() -> None:
-    PARSE = False
-    if PARSE:
-        ap = argparse.ArgumentParser(description="Generate XBRL code list taxonomy from CSV")
-        ap.add_argument("--csv", required=True, help="Input CSV with columns for code,name,description")
-        ap.add_argument("--out", required=True, help="Output directory root (e.g., XBRL-GL-2026/TEST/gl/gen/pool)")
-        ap.add_argument("--num", required=True, help="UNTDID element number (e.g., 1001, 1225)")
-        ap.add_argument("--release", default="d24a", help="Release tag used in filenames (default: d24a)")
-        ap.add_argument("--ns", default=None, help="Namespace URI (default: http://www.xbrl.org/int/gl/2026-12-31/gen/pool/uncl_<num>)")
-        ap.add_argument("--title", required=True, help="Human title for the list, e.g. 'Document name code'")
-        ap.add_argument("--lang", default="en", help="Label language (default: en)")
-
-        ap.add_argument("--code-col", default="code", help="CSV column name for code (default: code)")
-        ap.add_argument("--name-col", default="name", help="CSV column name for name (default: name)")
-        ap.add_argument("--desc-col", default="description", help="CSV column name for description (default: description)")
-
-        ap.add_argument("--shared_root", default="XBRL-GL-2026/TEST/gl/gen/shared", help="Root directory for selection definition")
-        # selections: repeatable
-        ap.add_argument("--selection",
-                        help="Selection definition: selectionCode=path_to_codes_file (txt or CSV with code column). "
-                             "Example: --selection invoice-basic=invoice-basic-codes.txt")
-
-        args = ap.parse_args()
-
-        csv = args.csv.strip()
-        out = args.out.strip()
-        num = args.num.strip()
-        release = args.release.strip().lower()
-        title = args.title.strip()
-
-        code_col = args.code_col.strip()
-        name_col = args.name_col.strip()
-        desc_col = args.desc_col.strip()
-
-        lang = args.lang.strip()
-
-        shared_root = args.shared_root.strip()
-        if args.selection:
-            selection = args.selection.strip()
-        else:
-            selection = None
-    else:
-        lang = "en"
-        num = "5305" # "1001"
-        release = "d23a"
-        csv = f"XBRL-GL-2026/TEST/gl/gen/pool/untdid{num}-{release}.csv"
-        out = "XBRL-GL-2026/TEST/gl/gen/pool"
-        title = "Duty or tax or fee category code" # "Document name code"
-        code_col = "code"
-        name_col = "name"
-        desc_col = "description"
-        shared_root = "XBRL-GL-2026/TEST/gl/gen/shared"
-        prefix = f"uncl_{num}"
-        selection = f"{prefix}={shared_root}/{prefix}-{release}.txt"
+@dataclass
+class CodeListJob:
+    csv: str
+    out: str
+    num: str
+    release: str
+    title: str
+    lang: str = "en"
+    code_col: str = "code"
+    name_col: str = "name"
+    desc_col: str = "description"
+    shared_root: str = "XBRL-GL-2026/TEST/gl/gen/shared"
+    selection: Optional[str] = None  # selectionCode=path
+
+    @property
+    def prefix(self) -> str:
+        return f"uncl_{self.num}"
+
+    @property
+    def key(self) -> str:
+        return f"{self.prefix}-{self.release}"
+
+    def outputs_exist(self) -> bool:
+        out_dir = os.path.join(self.out, self.prefix)
+        return all(os.path.isfile(os.path.join(out_dir, f"{self.key}{suffix}")) for suffix in (".xsd", "-def.xml", "-lab.xml"))
+
+    def selection_path(self) -> Optional[str]:
+        if not self.selection:
+            return None
+        if "=" not in self.selection:
+            raise ValueError(f"Invalid --selection value: {self.selection}. Use selectionCode=path")
+        return self.selection.split("=", 1)[1].strip()
+
+    def digest(self) -> str:
+        """
+        Hash of the source CSV, the selection file and the parameters.
+        The list is regenerated only when this value changes (see run_batch).
+        """
+        h = hashlib.sha256()
+        h.update(STATE_VERSION.encode())
+        for name in ("num", "release", "title", "lang", "code_col", "name_col", "desc_col", "out", "shared_root", "selection"):
+            h.update(f"|{name}={getattr(self, name)}".encode("utf-8"))
+        h.update(file_digest(self.csv).encode())
+        sel_path = self.selection_path()
+        if sel_path:
+            h.update(file_digest(sel_path).encode())
+        return h.hexdigest()
+
+
+def generate_codelist(job: CodeListJob, selection_codes: Optional[Tuple[str, ...]] = None) -> str:
+    """
+    Generate the aligned pool (and the selection profile if any) for one code list. Returns job.key.
+    selection_codes: the codes of job.selection already read by the caller (run_batch); read here if None.
+    """
+    num = job.num
+    release = job.release
+    title = job.title
+    prefix = job.prefix
 
     # Aligned pool location
-    out_dir = os.path.join(out, prefix).replace(os.sep,'/')
+    out_dir = os.path.join(job.out, prefix).replace(os.sep,'/')
     ensure_dir(out_dir)
 
     xsd_name = f"{prefix}-{release}.xsd"
     def_name = f"{prefix}-{release}-def.xml"
     lab_name = f"{prefix}-{release}-lab.xml"
 
-    prefix = f"uncl_{num}"
     ns = f"http://www.xbrl.org/int/gl/2026-12-31/gen/{prefix}"
     shared_ns = f"http://www.xbrl.org/int/gl/2026-12-31/gen/shared/{prefix}"
     terms = title.split(" ")
     role_slug = "-".join([x[0].lower() + x[1:] for x in terms]) # "document-name-code"
     domain_head = f'{LC3(title)}Domain' # "documentNameCodeDomain"
 
-    items = read_codes(csv, code_col, name_col, desc_col)
+    items = read_codes(job.csv, job.code_col, job.name_col, job.desc_col)
 
     write_aligned_pool(
         out_dir=out_dir,
@@ -501,22 +535,19 @@ def main() -> None:
         xsd_name=xsd_name,
         def_name=def_name,
         lab_name=lab_name,
-        lang=lang,
+        lang=job.lang,
         items=items,
     )
 
     # Selections (A pattern: same domain head; different ELR)
-    if selection:
-        ensure_dir(shared_root)
+    if job.selection:
+        ensure_dir(job.shared_root)
 
-        if "=" not in selection:
-            raise ValueError(f"Invalid --selection value: {selection}. Use selectionCode=path")
-        sel_code, sel_path = selection.split("=", 1)
-        sel_code = sel_code.strip()
-        sel_path = sel_path.strip()
-        allowed_codes = read_selection_codes(sel_path)
+        sel_path = job.selection_path()
+        sel_code = job.selection.split("=", 1)[0].strip()
+        allowed_codes = list(read_selection_codes(sel_path) if selection_codes is None else selection_codes)
 
-        shared_dir = os.path.join(shared_root, sel_code).replace(os.sep,'/')
+        shared_dir = os.path.join(job.shared_root, sel_code).replace(os.sep,'/')
         # Pool XSD relative path from shared dir
         base_xsd = os.path.relpath(os.path.join(out_dir, xsd_name), shared_dir).replace(os.sep, "/")
 
@@ -542,8 +573,248 @@ def main() -> None:
     role_uri = f"{ns}/role/{role_slug}"
     print(f"Base ELR: {role_uri}")
 
-    if selection:
+    if job.selection:
         print(f"Selections written under: {shared_dir.replace(os.sep,'/')}")
 
+    return job.key
+
+
+# ----------------------------
+# Batch (manifest of code lists)
+# ----------------------------
+
+MANIFEST_COLUMNS = ["num", "release", "title", "csv", "out", "lang", "shared_root", "selection",
+                    "code_col", "name_col", "desc_col"]
+
+def read_manifest(path: str, defaults: Dict[str, str]) -> List[CodeListJob]:
+    """
+    Manifest CSV: one code list per row.
+        num,release,title,csv,out,lang,shared_root,selection[,code_col,name_col,desc_col]
+    Empty cells take the command line value (defaults). Rows whose num starts with '#' are skipped.
+    Relative paths (csv, out, shared_root, selection path) are resolved from the manifest directory.
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+
+    def resolve(p: str) -> str:
+        if not p or os.path.isabs(p):
+            return p
+        return os.path.relpath(os.path.join(base_dir, p)).replace(os.sep, "/")
+
+    jobs: List[CodeListJob] = []
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        missing = [c for c in ("num", "title") if c not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"Manifest missing required columns: {missing}. Found: {reader.fieldnames}")
+        for row in reader:
+            num = (row.get("num") or "").strip()
+            if not num or num.startswith("#"):
+                continue
+            values = {c: (row.get(c) or "").strip() or defaults.get(c, "") for c in MANIFEST_COLUMNS}
+            release = values["release"].lower() or "d24a"
+            selection = values["selection"] or None
+            if selection and "=" in selection:
+                sel_code, sel_path = selection.split("=", 1)
+                selection = f"{sel_code.strip()}={resolve(sel_path.strip())}"
+            jobs.append(CodeListJob(
+                csv=resolve(values["csv"] or f"untdid{num}-{release}.csv"),
+                out=resolve(values["out"]),
+                num=num,
+                release=release,
+                title=values["title"],
+                lang=values["lang"] or "en",
+                code_col=values["code_col"] or "code",
+                name_col=values["name_col"] or "name",
+                desc_col=values["desc_col"] or "description",
+                shared_root=resolve(values["shared_root"]),
+                selection=selection,
+            ))
+    return jobs
+
+
+def load_state(path: str) -> Dict[str, str]:
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}  # 壊れた状態ファイルは全件再生成
+
+
+def save_state(path: str, state: Dict[str, str]) -> None:
+    ensure_dir(os.path.dirname(path) or ".")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def run_batch(jobs: List[CodeListJob], state_file: Optional[str] = None,
+              workers: Optional[int] = None, force: bool = False) -> Tuple[List[str], List[str], List[Tuple[str, str]]]:
+    """
+    Generate every code list in jobs, skipping lists whose digest (source CSV, selection file
+    and parameters) is unchanged since the last run. A failed list is reported and dropped from
+    the state, so it is generated again on the next run; the state is saved even if the run stops.
+    Returns (generated keys, skipped keys, [(failed key, error)]).
+    """
+    state = {} if force or not state_file else load_state(state_file)
+    generated: List[str] = []
+    failed: List[Tuple[str, str]] = []
+
+    def done(job: CodeListJob, digest: str, error: Optional[Exception]) -> None:
+        if error is None:
+            state[job.key] = digest
+            generated.append(job.key)
+        else:
+            state.pop(job.key, None)
+            failed.append((job.key, f"{type(error).__name__}: {error}"))
+            print(f"  failed: {job.key}: {error}", file=sys.stderr)
+
+    todo: List[Tuple[CodeListJob, str]] = []
+    skipped: List[str] = []
+    for job in jobs:
+        try:
+            digest = job.digest()
+        except (OSError, ValueError) as e:
+            done(job, "", e)  # missing source CSV / selection file
+            continue
+        if state.get(job.key) == digest and job.outputs_exist():
+            skipped.append(job.key)
+        else:
+            todo.append((job, digest))
+
+    # selection files shared by several lists are read once here and passed to the workers
+    selections: Dict[str, Tuple[str, ...]] = {}
+
+    def selection_codes(job: CodeListJob) -> Optional[Tuple[str, ...]]:
+        try:
+            sel_path = job.selection_path()
+            if sel_path and sel_path not in selections:
+                selections[sel_path] = tuple(read_selection_codes(sel_path))
+            return selections.get(sel_path) if sel_path else None
+        except (OSError, ValueError):
+            return None  # generate_codelist reads it again and the error is reported for the list
+
+    try:
+        if len(todo) > 1 and workers != 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    pool.submit(generate_codelist, job, selection_codes(job)): (job, digest)
+                    for job, digest in todo
+                }
+                for future in as_completed(futures):
+                    job, digest = futures[future]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        done(job, digest, e)
+                    else:
+                        done(job, digest, None)
+        else:
+            for job, digest in todo:
+                try:
+                    generate_codelist(job, selection_codes(job))
+                except Exception as e:
+                    done(job, digest, e)
+                else:
+                    done(job, digest, None)
+    finally:
+        if state_file:
+            save_state(state_file, state)
+    return generated, skipped, failed
+
+
+# ----------------------------
+# Main
+# ----------------------------
+
+def main() -> None:
+    PARSE = len(sys.argv) > 1
+    if PARSE:
+        ap = argparse.ArgumentParser(description="Generate XBRL code list taxonomy from CSV")
+        ap.add_argument("--csv", help="Input CSV with columns for code,name,description")
+        ap.add_argument("--out", help="Output directory root (e.g., XBRL-GL-2026/TEST/gl/gen/pool)")
+        ap.add_argument("--num", help="UNTDID element number (e.g., 1001, 1225)")
+        ap.add_argument("--release", default="d24a", help="Release tag used in filenames (default: d24a)")
+        ap.add_argument("--ns", default=None, help="Namespace URI (default: http://www.xbrl.org/int/gl/2026-12-31/gen/pool/uncl_<num>)")
+        ap.add_argument("--title", help="Human title for the list, e.g. 'Document name code'")
+        ap.add_argument("--lang", default="en", help="Label language (default: en)")
+
+        ap.add_argument("--code-col", default="code", help="CSV column name for code (default: code)")
+        ap.add_argument("--name-col", default="name", help="CSV column name for name (default: name)")
+        ap.add_argument("--desc-col", default="description", help="CSV column name for description (default: description)")
+
+        ap.add_argument("--shared_root", default="XBRL-GL-2026/TEST/gl/gen/shared", help="Root directory for selection definition")
+        # selections: repeatable
+        ap.add_argument("--selection",
+                        help="Selection definition: selectionCode=path_to_codes_file (txt or CSV with code column). "
+                             "Example: --selection invoice-basic=invoice-basic-codes.txt")
+
+        # batch mode
+        ap.add_argument("--manifest", help="Manifest CSV listing all code lists (num,release,title,csv,out,lang,shared_root,selection)")
+        ap.add_argument("--workers", type=int, default=None, help="Number of processes for --manifest (default: CPU count)")
+        ap.add_argument("--state", default=None, help=f"State file with the source hashes (default: <manifest dir>/{STATE_FILE})")
+        ap.add_argument("--force", action="store_true", help="Regenerate every list even if the source is unchanged")
+
+        args = ap.parse_args()
+
+        if args.manifest:
+            defaults = {
+                "release": args.release.strip().lower(),
+                "out": (args.out or "").strip(),
+                "lang": args.lang.strip(),
+                "shared_root": args.shared_root.strip(),
+                "code_col": args.code_col.strip(),
+                "name_col": args.name_col.strip(),
+                "desc_col": args.desc_col.strip(),
+            }
+            jobs = read_manifest(args.manifest, defaults)
+            state_file = args.state or os.path.join(os.path.dirname(os.path.abspath(args.manifest)), STATE_FILE)
+            start = time.perf_counter()
+            generated, skipped, failed = run_batch(jobs, state_file, args.workers, args.force)
+            print(f"Code lists: {len(generated)} generated, {len(skipped)} unchanged, {len(failed)} failed "
+                  f"({time.perf_counter() - start:.2f}s)")
+            for key in skipped:
+                print(f"  unchanged: {key}")
+            if failed:
+                sys.exit(1)
+            return
+
+        missing = [f"--{name}" for name in ("csv", "out", "num", "title") if not getattr(args, name)]
+        if missing:
+            ap.error(f"the following arguments are required: {', '.join(missing)} (or --manifest)")
+
+        job = CodeListJob(
+            csv=args.csv.strip(),
+            out=args.out.strip(),
+            num=args.num.strip(),
+            release=args.release.strip().lower(),
+            title=args.title.strip(),
+            lang=args.lang.strip(),
+            code_col=args.code_col.strip(),
+            name_col=args.name_col.strip(),
+            desc_col=args.desc_col.strip(),
+            shared_root=args.shared_root.strip(),
+            selection=args.selection.strip() if args.selection else None,
+        )
+    else:
+        num = "5305" # "1001"
+        release = "d23a"
+        shared_root = "XBRL-GL-2026/TEST/gl/gen/shared"
+        prefix = f"uncl_{num}"
+        job = CodeListJob(
+            csv=f"XBRL-GL-2026/TEST/gl/gen/pool/untdid{num}-{release}.csv",
+            out="XBRL-GL-2026/TEST/gl/gen/pool",
+            num=num,
+            release=release,
+            title="Duty or tax or fee category code", # "Document name code"
+            lang="en",
+            shared_root=shared_root,
+            selection=f"{prefix}={shared_root}/{prefix}-{release}.txt",
+        )
+
+    generate_codelist(job)
+
 if __name__ == "__main__":
     main()
@@ -36,10 +36,11 @@ import argparse
 import sys
 import csv
 import re
-import copy
 from collections import OrderedDict
 from collections.abc import Mapping, Sequence
 
+from common.uncefact_library import load_csv_rows
+
 def abbreviate_term(term: str, max_len: int = 6) -> str:
     """
     Abbreviates each word in the input term according to the following rules:
@@ -223,6 +224,7 @@ class Processor:
         self.current_class = None
         self.class_num = None
         self.abstract_classes = set()
+        self.superclass_chains = {}
 
         self.LIFO_list = []
         self.FSM_list = []
@@ -372,6 +374,38 @@ class Processor:
             + extra
         )
 
+    @staticmethod
+    def copy_record(record, properties=True):
+        """
+        Copy a class/property record (replacement for copy.deepcopy).
+
+        Property records are flat (str/int values); only a class record carries a nested
+        'properties' dict, so a two-level copy is an exact deep copy.
+        With properties=False the class is copied with an empty 'properties' dict.
+        """
+        _record = dict(record)
+        if "properties" in record:
+            _record["properties"] = (
+                {k: dict(v) for k, v in record["properties"].items()} if properties else {}
+            )
+        return _record
+
+    def superclass_chain(self, class_term: str):
+        """
+        Superclass terms of class_term, computed once per term:
+            "Apple_ Banana_ Orange" -> ("Banana_ Orange", "Orange")
+        Each step strips the leading prefix up to and including "_ " (raw remainder, not .strip()).
+        """
+        chain = self.superclass_chains.get(class_term)
+        if chain is None:
+            chain = []
+            term = class_term
+            while "_" in term:
+                term = term[2 + term.index("_"):]
+                chain.append(term)
+            chain = self.superclass_chains[class_term] = tuple(chain)
+        return chain
+
     def getproperty_term(self, record):
         """
         Formats the property term based on its type and associated class.
@@ -621,9 +655,8 @@ class Processor:
             if 'Class' in property_type:
                 class_term = record['class_term'].strip()
                 if class_term in self.object_class_dict:
-                    d1 = copy.deepcopy(self.object_class_dict[class_term])
-                    del d1['properties']
-                    d2 = copy.deepcopy(record)
+                    d1 = {k: v for k, v in self.object_class_dict[class_term].items() if 'properties'!=k}
+                    d2 = dict(record)
                     for item in self.deep_diff(d1, d2):
                         if 'sequence'!=item[0]:
                             self.trace_print(f"object_class_dict[{class_term}'] defines {item} differently.")
@@ -636,7 +669,7 @@ class Processor:
                     continue
                 if p_term in self.object_class_dict[class_term]['properties']:
                     d1 = self.object_class_dict[class_term]['properties'][p_term]
-                    d2 = copy.deepcopy(record)
+                    d2 = dict(record)
                     for item in self.deep_diff(d1, d2):
                         if 'sequence'!=item[0]:
                             self.trace_print(f"object_class_dict['{class_term}']['properties']['{p_term}'] defines {item} differently.")
@@ -712,7 +745,7 @@ class Processor:
                 }
                 if len(_class["properties"])!=len(_properties):
                     _class["properties"] = _properties
-                superclass = copy.deepcopy(_class)
+                superclass = self.copy_record(_class)
                 break
             if sup_class_term in self.object_class_dict:
                 _class = self.object_class_dict[sup_class_term]
@@ -723,7 +756,7 @@ class Processor:
                 }
                 if len(_class["properties"])!=len(_properties):
                     _class["properties"] = _properties
-                superclass = copy.deepcopy(_class)
+                superclass = self.copy_record(_class)
                 break
         # If nothing matched, normalise to blank.
         if not sup_class_term or (
@@ -857,20 +890,6 @@ class Processor:
 
             return OrderedDict(sorted(d.items(), key=key_fn))
 
-        def _superclass_chain(class_term: str, SELF=False):
-            """
-            Yield superclass terms by repeatedly stripping the leading prefix up to and including "_ ":
-                term = term[2 + term.index("_"):]
-            until no underscore remains.
-
-            Note: this yields the raw remainder (not .strip()).
-            """
-            term = class_term
-            if SELF: yield term  # include itself first
-            while "_" in term:
-                term = term[2 + term.index("_"):]
-                yield term
-
         def _ensure_abstract_class(
             superclass_term: str, object_class: dict, N: int
         ) -> int:
@@ -881,7 +900,9 @@ class Processor:
             if superclass_term in self.abstract_class_dict:
                 return N
 
-            superclass = copy.deepcopy(object_class)
+            # The aggregated properties are filled by _merge_properties_into_abstract,
+            # so the class properties are not copied here.
+            superclass = self.copy_record(object_class, properties=False)
             module = object_class["module"]
             if "Abstract Class" not in module:
                 superclass["module"] = f"Abstract Class({module})"
@@ -891,9 +912,6 @@ class Processor:
             superclass["class_term"] = superclass_term
             superclass["id"] = f"{self.module_code}{str(N).zfill(4)}"
 
-            # Initialise container for aggregated properties.
-            superclass["properties"] = {}
-
             if superclass_term not in self.abstract_class_dict:
                 self.abstract_class_dict[superclass_term] = superclass
                 self.debug_print(f"{superclass['id']} self.abstract_class_dict['{superclass_term}']")
@@ -912,7 +930,9 @@ class Processor:
             - If a property already exists (by p_term), increment 'inherited'.
             - Append the incoming definition as a new line only when it differs from the last line.
             - If the property does not exist yet, add it with inherited=1.
-            - Copy each property before editing to avoid mutating the source dictionaries.
+            - Copy each property before editing to avoid mutating the source dictionaries
+              (copy-on-write: the source properties are shared, only the merged copy is edited).
+            - Existing property ids are looked up by p_term in sup_props.
             """
             if superclass_term in self.abstract_class_dict:
                 superclass = self.abstract_class_dict[superclass_term]
@@ -920,21 +940,18 @@ class Processor:
             else:
                 return N
 
-            class_id = [x['id'] for x in sup_props.values()]
-            if len(class_id) > 0:
-                class_id = class_id[0][:6]
+            if sup_props:
+                class_id = next(iter(sup_props.values()))['id'][:6]
             else:
                 class_id = f"{self.module_code}{str(N).zfill(4)}"
 
             for p_term, prop0 in properties.items():
                 if mult_max(prop0.get("multiplicity", "")) == "0":
                     continue
-                prop = copy.deepcopy(prop0)  # Do not mutate the source property object.
+                prop = dict(prop0)  # Do not mutate the source property object.
                 prop["class_term"] = superclass_term
                 module = prop["module"]
                 p_term = self.getproperty_term(prop)
-                prop_module = re.findall(r"'([^']*)'", prop['module'])
-                sup_module = re.findall(r"'([^']*)'", superclass['module'])
                 if "Abstract Class" not in module:
                     prop["module"] = f"Abstract Class({module})"
                 else:
@@ -952,8 +969,7 @@ class Processor:
                     sup_props[p_term] = prop
                     sup_props[p_term]["inherited"] = 1
                 else:
-                    prop_id = [v["id"] for k, v in sup_props.items() if p_term == k][0]
-                    prop["id"] = prop_id
+                    prop["id"] = sup_props[p_term]["id"]
                     sup_props[p_term]["inherited"] += 1
 
                 sup_prop = sup_props[p_term]
@@ -997,10 +1013,10 @@ class Processor:
         for class_term, object_class in self.object_class_dict.items():
             # Classes with class term containing "_" participate in the superclass chain.
             if "_" in class_term:
-                # Take properties from the current object_class.
-                properties = copy.deepcopy(object_class["properties"])
+                # Take properties from the current object_class (copied per property on merge).
+                properties = object_class["properties"]
                 # Build/merge abstract classes for every superclass term in the chain.
-                for superclass_term in _superclass_chain(class_term):
+                for superclass_term in self.superclass_chain(class_term):
                     N = _ensure_abstract_class(superclass_term, object_class, N)
                     N = _merge_properties_into_abstract(
                         superclass_term, properties, N, True
@@ -1008,11 +1024,11 @@ class Processor:
             # Classes that belongs to "In All Contexts" participate in the superclass chain.
             elif "In All Contexts" == object_class["module"]:
                 # Always take properties from the current object_class.
-                properties = copy.deepcopy(object_class["properties"])
+                properties = object_class["properties"]
                 if len(properties) < 3:
                     continue
-                # Build/merge abstract classes for every superclass term in the chain.
-                for superclass_term in _superclass_chain(class_term, True):
+                # Build/merge abstract classes for every superclass term in the chain (including itself first).
+                for superclass_term in (class_term,) + self.superclass_chain(class_term):
                     N = _ensure_abstract_class(superclass_term, object_class, N)
                     N = _merge_properties_into_abstract(
                         superclass_term, properties, N, True
@@ -1041,22 +1057,17 @@ class Processor:
             del self.abstract_class_dict[class_term]
 
         for class_term, object_class in self.object_class_dict.items():
-            properties = copy.deepcopy(object_class["properties"])
-            for _, property in properties.items():
+            for _, property in object_class["properties"].items():
                 property_term = property["property_term"]
                 associated_class = property["associated_class"]
                 if associated_class:
-                    a_class = [
-                        k
-                        for k in self.object_class_dict.keys()
-                        if k == associated_class
-                    ]
-                    if len(a_class) > 0:
-                        as_class = a_class[0]
+                    if associated_class in self.object_class_dict:
+                        as_class = associated_class
                     else:
                         as_class, _ = self.check_if_specialized(associated_class)
                     if len(as_class) > 0:
                         if associated_class != as_class:
+                            property = dict(property)
                             property["property_term"] = (
                                 f'{property_term}_ {associated_class.replace(as_class,"").strip()[:-1]}'
                             )
@@ -1077,7 +1088,7 @@ class Processor:
         self.FSM_list = []
         for class_term, object_class in self.abstract_class_dict.items():
             self.debug_print(f"-- {class_term}")
-            properties = copy.deepcopy(object_class['properties'])
+            properties = object_class['properties']
 
             self.FSM_list.append(object_class)
 
@@ -1106,10 +1117,10 @@ class Processor:
                 specialized['associated_class'] = sup_class_term
                 specialized['multiplicity'] = '1'
 
-                specialized_props = copy.deepcopy(specialized.get("properties", {}))
+                specialized_props = specialized.get("properties", {})  # already copied by check_if_specialized
                 self.FSM_list.append(specialized)
 
-            properties = copy.deepcopy(object_class['properties'])
+            properties = {p_term: dict(prop) for p_term, prop in object_class['properties'].items()}
             # 1) assign inherited flags first
             for p_term, prop in properties.items():
                 if specialized_props:
@@ -1135,7 +1146,7 @@ class Processor:
                 # 1) assign inherited flags first
                 for p_term, s_prop in specialized_props.items():
                     if p_term not in properties:
-                        prop = copy.deepcopy(s_prop)
+                        prop = dict(s_prop)
                         prop["class_term"] = class_term
                         prop["inherited"] = "Prohibited"
                         prop["multiplicity"] = "0"
@@ -1176,10 +1187,10 @@ class Processor:
         """
         self.object_class_dict = {}
         self.trace_print(f"** READ {self.bie_file}")
-        with open(self.bie_file, encoding=self.encoding, newline='') as f:
-            reader = csv.DictReader(f, fieldnames=self.bie_header)
-            self.trace_print(f"** Process record STEP 1.")
-            self.process_record1(reader)
+        # csv.DictReader と同じ行を、BIE CSV が変わらない限りキャッシュから読み込む
+        reader = iter(load_csv_rows(self.bie_file, self.bie_header, encoding=self.encoding))
+        self.trace_print(f"** Process record STEP 1.")
+        self.process_record1(reader)
 
         self.trace_print(f"** Process record STEP 2.")
         self.process_record2()
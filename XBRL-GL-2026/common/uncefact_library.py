@@ -0,0 +1,311 @@
+"""
+uncefact_library.py
+Shared loader for the UN/CEFACT dictionaries used by the SME_Common tools
+(MBIEs24A.csv, MBIEs24A_ja.csv, D23B_abie_mapping.csv, D23B_qDT.csv, TDED.csv)
+and for the BIE CSV read by XBRL-GL-2026/bie_to_fsm.py.
+
+The CSV files are parsed once into compact records (__slots__ / tuples) and
+pickled to a cache directory. The cache file name contains the SHA-256 of every
+input file, so an edited CSV is re-parsed automatically and a stale cache is
+never used. Each call returns fresh dicts, because the tools update the
+records (multiplicity etc.) while they build a model.
+
+CCL_schema_analize.py and D24A_schema_analize.py do not use this loader: they
+read no MBIE/qDT CSV, they parse the ReusableAggregateBusinessInformationEntity
+XSD and write D23B_abie_mapping.csv / D23A_abie_mapping.csv, i.e. one of the
+inputs above. A regenerated mapping file has a new SHA-256, so the cache is
+rebuilt on the next load.
+
+The same module is kept in SME_Common/common/ and XBRL-GL-2026/common/ (each
+folder imports its own common package); the two files must stay identical.
+
+MIT License
+
+(c) 2023-2025 SAMBUICHI, Nobuyuki (Sambuichi Professional Engineers Office)
+"""
+import csv
+import glob
+import hashlib
+import os
+import pickle
+import re
+
+CACHE_VERSION = 1
+CACHE_DIR = ".cache"
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def load_cached(name, paths, builder, cache_dir=None):
+    """
+    builder(*paths) の結果を cache_dir/<name>-<入力ファイルのハッシュ>.pickle にキャッシュする。
+    入力ファイルが変わればハッシュが変わるため、古いキャッシュは使われず削除される。
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(paths[0])), CACHE_DIR)
+    key = hashlib.sha256(
+        "|".join([str(CACHE_VERSION)] + [file_digest(path) for path in paths]).encode()
+    ).hexdigest()[:16]
+    cache_file = os.path.join(cache_dir, f"{name}-{key}.pickle")
+    if os.path.isfile(cache_file):
+        try:
+            with open(cache_file, "rb") as f:
+                return pickle.load(f)
+        except Exception:
+            pass  # 壊れたキャッシュは作り直す
+    result = builder(*paths)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        for stale in glob.glob(os.path.join(cache_dir, f"{name}-*.pickle")):
+            os.remove(stale)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass  # 書き込めない場合はキャッシュせずに続行
+    return result
+
+def normalize_text(text):
+    # sme_prepare.normalize_text と同じ規則
+    remove_words = r"<Hdr>|<Lin>"
+    REMOVE_CHARS = " ._/()-"
+    _text = re.sub(remove_words, "", text).translate(
+        str.maketrans("", "", REMOVE_CHARS)
+    )
+    if _text.endswith("IdentificationIdentifier"):
+        _text = _text.replace("IdentificationIdentifier", "ID")
+    elif _text.endswith("IdentificationID"):
+        _text = _text.replace("IdentificationID", "ID")
+    elif _text.endswith("Identifier"):
+        _text = _text.replace("Identifier", "ID")
+    elif _text.endswith("Text"):
+        _text = _text.replace("Text", "")
+    return _text
+
+class MBIERecord:
+    """One MBIEs24A.csv row with the qualifier strings, element name and multiplicity already derived."""
+    __slots__ = (
+        "mbie_nr",
+        "acronym",
+        "property_type",
+        "class_term",
+        "property_term",
+        "representation_term",
+        "code_list",
+        "associated_class",
+        "element",
+        "DEN",
+        "sequence",
+        "multiplicity",
+        "definition",
+        "short_name",
+        "UNID",
+        "TDED",
+        "submitted_definition",
+    )
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields[name])
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+def row_dict(header, row):
+    # csv.DictReader と同じ: 不足列は None、余分な列は None キーにリストで入れる
+    width = len(header)
+    d = dict(zip(header, row))
+    if len(row) < width:
+        for key in header[len(row):]:
+            d[key] = None
+    elif len(row) > width:
+        d[None] = list(row[width:])
+    return d
+
+class CsvTable:
+    """CSV rows as tuples sharing one header (dict rows are built on request)."""
+    __slots__ = ("header", "rows")
+
+    def __init__(self, header, rows):
+        self.header = tuple(header)
+        self.rows = rows
+
+    def dicts(self):
+        header = self.header
+        return [row_dict(header, row) for row in self.rows]
+
+    def index(self, column):
+        # {column の値: 行 dict}（同じ値は後の行で上書き、csv.DictReader でのループと同じ）
+        return {row.get(column, ""): row for row in self.dicts()}
+
+def read_table(path, encoding="utf-8-sig"):
+    with open(path, mode="r", newline="", encoding=encoding) as file:
+        reader = csv.reader(file)
+        header = next(reader, [])
+        rows = [tuple(row) for row in reader if row]
+    return CsvTable(header, rows)
+
+def build_mbie(mbie_file):
+    # Nr,UNID,Acronym,DEN,Definition,Publication comments,Object Class Term Qualifier(s),Object Class Term,Property Term Qualifier(s),Property Term,Datatype Qualifier(s),Representation Term,Qualified Data Type UID,Associated Object Class Term Qualifier(s),Associated Object Class,Business Term(s),Usage Rule(s),Sequence Number,Occurrence Min,Occurrence Max,Context Categories,Example(s),Version,Ref Library Version,Submitter Name,Ref Component UN ID,Unique submitter ID,CR Status Date,CR Status,Library Maintenance Comment,TDED,Submitted Definition,Submitter Comment,Submitted DEN,Publication Refs -- Source,Short Name
+    REMOVE_CHARS = r"[_\u3000\n\r\(\)\[\]\-\s\.]*" # regex class of characters to remove
+    records = []
+    with open(mbie_file, mode="r", newline="", encoding="utf-8-sig") as file:
+        reader = csv.DictReader(file)  # Uses first row as keys
+        for row in reader:
+            acronym = row["Acronym"]
+            if "END"==acronym:
+                break
+
+            nr = row["Nr"]
+            nr = int(nr) if nr.isdigit() else 0
+            sequence = row.get("Sequence Number","")
+            sequence = int(sequence) if sequence.isdigit() else 0
+
+            class_term_qualifier = row.get("Object Class Term Qualifier(s)","").strip()
+            class_term = row.get("Object Class Term","").strip()
+            if class_term_qualifier:
+                class_term = f'{class_term_qualifier}_ {class_term}'
+            property_term_qualifier = row.get("Property Term Qualifier(s)","").strip()
+            property_term = row.get("Property Term","").strip()
+            if property_term_qualifier:
+                property_term = f'{property_term_qualifier}_ {property_term}'
+            datatype_qualifier = row.get("Datatype Qualifier(s)","").strip()
+            representation_term = row.get("Representation Term","").strip()
+            if datatype_qualifier:
+                representation_term = f'{datatype_qualifier}_ {representation_term}'
+            associated_class_qualifier = row['Associated Object Class Term Qualifier(s)'].strip()
+            associated_class_term = row['Associated Object Class'].strip()
+            if associated_class_qualifier:
+                associated_class_term = f"{associated_class_qualifier}_ {associated_class_term}"
+
+            multiplicity = ""
+            occurence_min = row.get("Occurrence Min","")
+            occurence_max = row.get("Occurrence Max","")
+            if "unbounded"==occurence_max:
+                occurence_max = "n"
+            if occurence_min and occurence_max:
+                multiplicity = f"{occurence_min}..{occurence_max}"
+
+            if acronym in ["BBIE","SC"]:
+                property_type = "Attribute"
+                element = normalize_text(f'{property_term} {row.get("Representation Term","").strip()}')
+            elif "ASBIE"==acronym:
+                property_type = "Composition"
+                element = normalize_text(f'{property_term} {row.get("Associated Object Class","").strip()}')
+            else:
+                property_type = "Class"
+                element = normalize_text(class_term)
+
+            code_list = ""
+            if len(row["TDED"]) > 0:
+                tded = re.sub(REMOVE_CHARS, "", row["TDED"])
+                code_list = 'TDED{}'.format(tded)
+
+            records.append(MBIERecord(
+                mbie_nr=nr,
+                acronym=acronym,
+                property_type=property_type,
+                class_term=class_term,
+                property_term=property_term,
+                representation_term=representation_term,
+                code_list=code_list,
+                associated_class=associated_class_term,
+                element=element,
+                DEN=row["DEN"],
+                sequence=sequence if "Class"!=property_type else "",
+                multiplicity=multiplicity,
+                definition=row.get("Definition",""),
+                short_name=row.get("Short Name",""),
+                UNID=row["UNID"],
+                TDED=row.get("TDED",""),#if representation_term.endswith("Code") else "",
+                submitted_definition=row.get("Submitted Definition",""),
+            ))
+    return records
+
+class UNCEFACTLibrary:
+    __slots__ = ("mbie", "mbie_ja", "abie_mapping", "qdt", "tded")
+
+    def __init__(self, mbie, mbie_ja, abie_mapping, qdt, tded):
+        self.mbie = mbie
+        self.mbie_ja = mbie_ja
+        self.abie_mapping = abie_mapping
+        self.qdt = qdt
+        self.tded = tded
+
+    def mbie_dicts(self):
+        """(mbie_dict: UNID -> data, mbie_dict_den: DEN -> data) 両方の辞書は同じ dict を共有する"""
+        mbie_dict = {}
+        mbie_dict_den = {}
+        for record in self.mbie:
+            data = record.as_dict()
+            mbie_dict[record.UNID] = data
+            mbie_dict_den[record.DEN] = data
+        return mbie_dict, mbie_dict_den
+
+    def mbie_translate_ja(self):
+        #  UNID,short_name,short_name_ja,definition,definition_ja
+        return self.mbie_ja.index("UNID")
+
+    def abie_mapping_dicts(self):
+        """(abie_mapping: UNID -> row, abie_mapping_den: Dictionary Entry Name -> row)"""
+        abie_mapping = {}
+        abie_mapping_den = {}
+        for row in self.abie_mapping.dicts():
+            abie_mapping[row.get("UNID","")] = row
+            abie_mapping_den[row.get("Dictionary Entry Name","")] = row
+        return abie_mapping, abie_mapping_den
+
+    def qdt_dict(self):
+        # "XML datatype", "D23B", "UNTDID"
+        return self.qdt.index("XML datatype")
+
+    def tded_dict(self):
+        # "Code", "URL", "Code name", "Desc", "Repr", "Note"
+        return self.tded.index("Code")
+
+def build_library(mbie_file, mbie_ja_file, abie_mapping_file, qdt_file, tded_file):
+    return UNCEFACTLibrary(
+        build_mbie(mbie_file),
+        read_table(mbie_ja_file),
+        read_table(abie_mapping_file),
+        read_table(qdt_file),
+        read_table(tded_file),
+    )
+
+def load_library(
+        base_dir,
+        mbie_file="MBIEs24A.csv",
+        mbie_ja_file="MBIEs24A_ja.csv",
+        abie_mapping_file="D23B_abie_mapping.csv",
+        qdt_file="D23B_qDT.csv",
+        tded_file="TDED.csv",
+        cache_dir=None
+    ):
+    """MBIE / ABIE mapping / qDT / TDED の辞書をキャッシュ経由で読み込む"""
+    paths = [os.path.join(base_dir, name) for name in (mbie_file, mbie_ja_file, abie_mapping_file, qdt_file, tded_file)]
+    return load_cached("uncefact_library", paths, build_library, cache_dir)
+
+def load_csv_rows(path, fieldnames, encoding="utf-8-sig", cache_dir=None):
+    """
+    csv.DictReader(f, fieldnames=fieldnames) と同じ dict 行のリストをキャッシュ経由で返す。
+    （先頭行も含む。不足列は None）
+    """
+    def build(path):
+        with open(path, encoding=encoding, newline='') as f:
+            return [tuple(row) for row in csv.reader(f) if row]
+    name = re.sub(r"[^0-9A-Za-z_\-]", "_", f"rows_{os.path.basename(path)}_{encoding}")
+    rows = load_cached(name, [path], build, cache_dir)
+    fieldnames = tuple(fieldnames)
+    return [row_dict(fieldnames, row) for row in rows]
@@ -1,3 +1,17 @@
+"""
+発注データ（tidy PO CSV）から伝票ごとのテスト用 PDF を作成する。
+
+    python data/gen_slip_pdf_from_tidyPO.py [csv_file] [--out-dir DIR] [--workers N] [--merged FILE] [--no-split]
+
+- フォント（NotoSansCJK の TTC）の登録はプロセスごとに 1 回だけ行う
+- groupby('伝票') のグループを複数件ずつまとめてプロセスプールで描画する
+- --merged を指定すると全伝票を 1 つの PDF（1 伝票 1 ページ）にも出力する
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 from reportlab.pdfgen import canvas
 from reportlab.pdfbase.ttfonts import TTFont
@@ -6,39 +20,87 @@ from reportlab.lib.pagesizes import A4
 
 # Load the CSV data
 csv_file = 'data/_PCA/try/generated_invoice_from_PO.csv'  # Replace with the correct file path
-df = pd.read_csv(csv_file, encoding='utf-8-sig')
+font_name = 'NotoSansCJK'
+font_path = 'data/Font/NotoSansCJK-VF.ttf.ttc'
 
-# Function to create PDFs per slip
-def create_pdf(file_path, slip_data):
-    # Create a canvas object with the specified file path and page size
-    c = canvas.Canvas(file_path, pagesize=A4)
+# Columns used on a slip
+header_columns = ['伝票', '発注先名', '発注日']
+item_columns = ['商品名', '数量', '単位', '発注金額']
 
-    # Register the Japanese font
-    pdfmetrics.registerFont(TTFont('NotoSansCJK', 'data/Font/NotoSansCJK-VF.ttf.ttc'))
+def register_fonts():
+    # Register the Japanese font once per process (parsing the TTC is expensive)
+    if font_name not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(font_name, font_path))
 
+def draw_slip(c, slip_data):
     # Set the title and draw it on the PDF
-    c.setFont("NotoSansCJK", 12)
+    c.setFont(font_name, 12)
     c.drawString(100, 800, f"伝票番号: {slip_data['伝票'].iloc[0]}")
     c.drawString(100, 780, f"発注先名: {slip_data['発注先名'].iloc[0]}")
     c.drawString(100, 760, f"発注日: {slip_data['発注日'].iloc[0]}")
 
     # List the details of the items in the slip
     text = c.beginText(100, 740)
-    text.setFont("NotoSansCJK", 10)
+    text.setFont(font_name, 10)
 
-    # Add the item details
-    for index, row in slip_data.iterrows():
-        item_line = f"{row['商品名']} - 数量: {row['数量']} {row['単位']} - 金額: {row['発注金額']}円"
-        text.textLine(item_line)
+    # Add the item details (column arrays instead of iterrows)
+    for name, quantity, unit, amount in zip(*(slip_data[column].tolist() for column in item_columns)):
+        text.textLine(f"{name} - 数量: {quantity} {unit} - 金額: {amount}円")
 
     c.drawText(text)
 
+# Function to create PDFs per slip
+def create_pdf(file_path, slip_data):
+    register_fonts()
+    # Create a canvas object with the specified file path and page size
+    c = canvas.Canvas(file_path, pagesize=A4)
+    draw_slip(c, slip_data)
     # Save the PDF file
     c.save()
 
-# Group the data by '伝票' and generate separate PDFs
-for slip_number, slip_data in df.groupby('伝票'):
-    file_path = f"slip_{slip_number}.pdf"
-    create_pdf(file_path, slip_data)
+def render_slips(slips, out_dir):
+    """Worker: render a chunk of (slip_number, slip_data) into separate PDFs"""
+    for slip_number, slip_data in slips:
+        create_pdf(os.path.join(out_dir, f"slip_{slip_number}.pdf"), slip_data)
+    return len(slips)
+
+def render_merged(slips, file_path):
+    """Worker: render all slips into one PDF, one slip per page"""
+    register_fonts()
+    c = canvas.Canvas(file_path, pagesize=A4)
+    for _, slip_data in slips:
+        draw_slip(c, slip_data)
+        c.showPage()
+    c.save()
+    return len(slips)
+
+def generate_slips(df, out_dir='.', workers=None, merged=None, split=True, chunk_size=100):
+    # Group the data by '伝票' and generate separate PDFs
+    slips = list(df[header_columns + item_columns].groupby('伝票'))
+    chunks = [slips[i:i + chunk_size] for i in range(0, len(slips), chunk_size)]
+    if split:
+        os.makedirs(out_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        if merged:
+            futures.append(pool.submit(render_merged, slips, merged))
+        if split:
+            futures += [pool.submit(render_slips, chunk, out_dir) for chunk in chunks]
+        for future in futures:
+            future.result()
+    return len(slips)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate slip PDFs from a tidy PO CSV')
+    parser.add_argument('csv_file', nargs='?', default=csv_file)
+    parser.add_argument('--out-dir', default='.', help='directory for slip_<伝票>.pdf')
+    parser.add_argument('--workers', type=int, default=None, help='number of processes (default: CPU count)')
+    parser.add_argument('--merged', help='also write all slips into this single PDF')
+    parser.add_argument('--no-split', action='store_true', help='do not write one PDF per slip')
+    parser.add_argument('--chunk-size', type=int, default=100, help='slips per worker task')
+    args = parser.parse_args()
 
-print("PDF generation completed.")
+    start = time.perf_counter()
+    df = pd.read_csv(args.csv_file, encoding='utf-8-sig')
+    count = generate_slips(df, args.out_dir, args.workers, args.merged, not args.no_split, max(1, args.chunk_size))
+    print(f"PDF generation completed. {count} slips in {time.perf_counter() - start:.2f}s")